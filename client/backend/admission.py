@@ -0,0 +1,358 @@
+"""
+Admission control in front of the expensive calls (LLM, DeepFace, pyttsx3).
+
+Two layers:
+
+    rate limits   a token bucket per (endpoint, session): RATE_LIMITS lists
+                  "endpoint=rate/burst" rules (tokens per second / bucket
+                  size). Over the limit -> RateLimited (429 + Retry-After).
+    gates         bounded concurrency per resource ("llm", "vision", "tts"):
+                  at most ADMIT_<NAME>_CONCURRENCY calls run, up to
+                  ADMIT_<NAME>_QUEUE wait in priority order for at most
+                  ADMIT_<NAME>_WAIT_MS; beyond that callers are shed with
+                  Overloaded (503 + Retry-After).
+
+Priority comes from the request context (`with priority(CRITICAL): ...`).
+CRITICAL callers, e.g. a session that just sent a crisis message, skip the
+queue and are never shed; HIGH callers are served before NORMAL ones.
+
+Rate limits are off unless RATE_LIMITS is set, e.g.
+"chat=1/10,diagnosis=1/10,speak=2/10,analyze_frame=15/30". Buckets are keyed
+by client_key(): the client's session id, or its address when it sends none
+or one of SHARED_SESSION_IDS (fixed ids the bundled frontend sends for every
+user). X-Forwarded-For is only believed from TRUSTED_PROXIES.
+
+Buckets live in memory (per process) or, with RATE_LIMIT_BACKEND=sqlite, in
+a shared WAL-mode SQLite table (RATE_LIMIT_DB) so every worker enforces the
+same limit. Gates are per process, like the model and TTS engines they guard.
+"""
+import contextvars
+import heapq
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+CRITICAL, HIGH, NORMAL = 0, 1, 2
+
+DEFAULT_RATE_LIMITS = ""  # opt-in; see the module docstring for an example
+SHARED_SESSION_IDS = {s.strip() for s in os.getenv("SHARED_SESSION_IDS", "default-session,web-session").split(",")
+                      if s.strip()}
+TRUSTED_PROXIES = {s.strip() for s in os.getenv("TRUSTED_PROXIES", "").split(",") if s.strip()}
+DEFAULT_GATES = {
+    # name: (concurrency, queue, wait seconds)
+    "llm": (32, 128, 15.0),
+    "vision": (16, 32, 5.0),
+    "tts": (2, 8, 10.0),
+}
+
+
+class AdmissionError(RuntimeError):
+    status = 503
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimited(AdmissionError):
+    status = 429
+
+
+class Overloaded(AdmissionError):
+    status = 503
+
+
+_priority = contextvars.ContextVar("admission_priority", default=NORMAL)
+
+
+@contextmanager
+def priority(level: int):
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+# ---------------------------------------------------------------------------
+# Token buckets
+# ---------------------------------------------------------------------------
+class MemoryBuckets:
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0, now: float = None) -> tuple:
+        """
+        (allowed, seconds until `cost` tokens are available).
+        """
+        now = now or time.time()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+
+class SQLiteBuckets:
+    """
+    Buckets in a table shared by every worker; each take() is one
+    BEGIN IMMEDIATE transaction, so concurrent workers never double-spend.
+    """
+
+    def __init__(self, path: str, idle_ttl: float = 3600.0):
+        self.path = path
+        self.idle_ttl = idle_ttl
+        self._local = threading.local()
+        self._takes = 0
+        self._conn().execute("""
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0, now: float = None) -> tuple:
+        now = now or time.time()
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+                tokens = burst if row is None else min(burst, row[0] + max(0.0, now - row[1]) * rate)
+                allowed = tokens >= cost
+                if allowed:
+                    tokens -= cost
+                conn.execute("INSERT OR REPLACE INTO rate_buckets VALUES (?, ?, ?)", (key, tokens, now))
+                self._takes += 1
+                if self._takes % 1000 == 0:
+                    conn.execute("DELETE FROM rate_buckets WHERE updated < ?", (now - self.idle_ttl,))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            # Fail open: a broken limiter must not take the service down.
+            print("⚠️ Rate limit check failed:", str(e))
+            return True, 0.0
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+
+def parse_rules(spec: str) -> dict:
+    """
+    "chat=1/10,speak=2/10" -> {"chat": (1.0, 10.0), "speak": (2.0, 10.0)}
+    """
+    rules = {}
+    for item in (spec or "").split(","):
+        if not item.strip():
+            continue
+        name, _, value = item.partition("=")
+        rate, _, burst = value.partition("/")
+        rules[name.strip()] = (float(rate), float(burst or rate))
+    return rules
+
+
+class RateLimiter:
+    def __init__(self, rules: dict, backend=None):
+        self.rules = rules
+        self.backend = backend or MemoryBuckets()
+        self.limited = 0
+
+    def check(self, endpoint: str, key: str, cost: float = 1.0):
+        """
+        Spend `cost` tokens from (endpoint, key)'s bucket or raise RateLimited.
+        Endpoints without a rule, and CRITICAL callers, are not limited.
+        """
+        rule = self.rules.get(endpoint)
+        if rule is None or current_priority() == CRITICAL:
+            return
+        rate, burst = rule
+        allowed, wait = self.backend.take(f"{endpoint}:{key}", rate, burst, min(cost, burst))
+        if not allowed:
+            self.limited += 1
+            raise RateLimited(f"Too many {endpoint} requests; slow down.", max(1, math.ceil(wait)))
+
+
+def per_client_session(session_id) -> bool:
+    """
+    True if `session_id` identifies one client (not missing or shared).
+    """
+    return bool(session_id) and session_id not in SHARED_SESSION_IDS
+
+
+def client_key(session_id=None) -> str:
+    """
+    Rate-limit key for the current Flask request: the session id if it is
+    per client, else the client address. Behind a reverse proxy listed in
+    TRUSTED_PROXIES the address is the right-most untrusted X-Forwarded-For
+    entry; otherwise the header is ignored, since clients can set it.
+    """
+    if per_client_session(session_id):
+        return session_id
+    from flask import request
+    addr = request.remote_addr
+    if addr in TRUSTED_PROXIES:
+        for hop in reversed(request.headers.get("X-Forwarded-For", "").split(",")):
+            hop = hop.strip()
+            if hop and hop not in TRUSTED_PROXIES:
+                return hop
+    return addr or "unknown"
+
+# ---------------------------------------------------------------------------
+# Concurrency gates
+# ---------------------------------------------------------------------------
+class Gate:
+    """
+    At most `limit` holders at once; up to `max_queue` waiters, served in
+    priority order (FIFO within a priority), each for at most `wait` seconds.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int, wait: float):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.wait = wait
+        self.running = 0
+        self._waiters = []  # heap of [priority, seq, event, granted]
+        self._queued = 0
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._hold = 0.05  # EWMA of seconds a slot is held, for Retry-After
+        self.counts = {"admitted": 0, "waited": 0, "shed": 0, "timed_out": 0}
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self._hold * (self._queued + 1) / self.limit))
+
+    def acquire(self, level: int = None):
+        level = current_priority() if level is None else level
+        with self._lock:
+            if self.running < self.limit or level == CRITICAL:
+                self.running += 1
+                self.counts["admitted"] += 1
+                return
+            if self._queued >= self.max_queue:
+                self.counts["shed"] += 1
+                raise Overloaded(f"{self.name} is busy; try again shortly.", self._retry_after())
+            waiter = [level, self._seq, threading.Event(), False]
+            self._seq += 1
+            heapq.heappush(self._waiters, waiter)
+            self._queued += 1
+            self.counts["waited"] += 1
+        waiter[2].wait(self.wait)
+        with self._lock:
+            if waiter[3]:
+                return
+            waiter[2] = None  # cancelled; skipped when popped
+            self._queued -= 1
+            self.counts["timed_out"] += 1
+            raise Overloaded(f"{self.name} is busy; try again shortly.", self._retry_after())
+
+    def release(self, held: float = None):
+        with self._lock:
+            if held is not None:
+                self._hold = 0.9 * self._hold + 0.1 * held
+            while self._waiters:
+                waiter = heapq.heappop(self._waiters)
+                if waiter[2] is not None:
+                    waiter[3] = True  # the slot passes straight to the waiter
+                    self._queued -= 1
+                    self.counts["admitted"] += 1
+                    waiter[2].set()
+                    return
+            self.running -= 1
+
+    @contextmanager
+    def slot(self, level: int = None):
+        self.acquire(level)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"limit": self.limit, "running": self.running, "queued": self._queued,
+                    "max_queue": self.max_queue, **self.counts}
+
+
+_gates = {}
+_limiter = None
+_lock = threading.Lock()
+
+
+def gate(name: str) -> Gate:
+    """
+    Process-wide gate for a resource, sized from ADMIT_<NAME>_CONCURRENCY,
+    ADMIT_<NAME>_QUEUE and ADMIT_<NAME>_WAIT_MS.
+    """
+    with _lock:
+        g = _gates.get(name)
+        if g is None:
+            limit, queue, wait = DEFAULT_GATES.get(name, (8, 32, 10.0))
+            prefix = f"ADMIT_{name.upper()}_"
+            g = _gates[name] = Gate(name, int(os.getenv(prefix + "CONCURRENCY", str(limit))),
+                                    int(os.getenv(prefix + "QUEUE", str(queue))),
+                                    float(os.getenv(prefix + "WAIT_MS", str(wait * 1000))) / 1000)
+        return g
+
+
+def limiter() -> RateLimiter:
+    """
+    Process-wide rate limiter configured from RATE_LIMITS, RATE_LIMIT_BACKEND
+    ("memory" or "sqlite") and RATE_LIMIT_DB.
+    """
+    global _limiter
+    with _lock:
+        if _limiter is None:
+            backend = None
+            if os.getenv("RATE_LIMIT_BACKEND", "memory") == "sqlite":
+                backend = SQLiteBuckets(os.getenv("RATE_LIMIT_DB", "ratelimits.db"))
+            _limiter = RateLimiter(parse_rules(os.getenv("RATE_LIMITS", DEFAULT_RATE_LIMITS)), backend)
+        return _limiter
+
+
+def error_response(e: AdmissionError):
+    from flask import jsonify
+    resp = jsonify({"error": str(e), "retry_after": e.retry_after})
+    resp.status_code = e.status
+    resp.headers["Retry-After"] = str(e.retry_after)
+    return resp
+
+
+def init_app(app):
+    """
+    Turn uncaught AdmissionErrors into 429/503 + Retry-After and add
+    /admission_stats.
+    """
+    app.register_error_handler(AdmissionError, error_response)
+
+    @app.route("/admission_stats", methods=["GET"])
+    def admission_stats():
+        from flask import jsonify
+        with _lock:
+            gates = dict(_gates)
+        return jsonify({"rate_limited": limiter().limited, "gates": {n: g.stats() for n, g in gates.items()}})
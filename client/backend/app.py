@@ -1,11 +1,23 @@
-from flask import Flask, request, jsonify, send_file, after_this_request
+from flask import Blueprint, Flask, Response, request, jsonify
 from flask_cors import CORS
-import os, requests, re, sqlite3
+import os
+import threading
+import time
 from datetime import datetime
 from dotenv import load_dotenv
-import pyttsx3
-import tempfile
-import threading
+
+from emotion_lexicon import DEFAULT_LEXICON
+from crisis import DEFAULT_MATCHER as CRISIS_MATCHER
+from session_store import SessionStore, SQLiteSessionBackend
+from llm_client import get_client
+from llm_cache import cache_for, get_cache
+from sse import SSE_HEADERS, sse_event
+from context_window import ContextWindow
+from tts import ENCODINGS, AudioCache, TTSService
+from mood_analytics import MoodAnalytics
+import admission
+import emotion_store
+import telemetry
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Setup
@@ -16,29 +28,57 @@ MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")  # keep this only on the server!
 if not MISTRAL_API_KEY:
     raise RuntimeError("MISTRAL_API_KEY not found. Create backend/.env with MISTRAL_API_KEY=...")
 
-app = Flask(__name__)
-CORS(app)
+# Routes live on `bp`: `app` at the bottom serves it alone, gateway.py mounts
+# it next to the diagnosis and vision services.
+bp = Blueprint("chat", __name__)
+CORS(bp)
+telemetry.init_app(bp, "chat", routes=False)  # request ids, stage timings
+
+# Per-session token buckets for /chat and /speak (RATE_LIMITS, see admission.py).
+LIMITER = admission.limiter()
+# After a crisis message the session's requests skip rate limits and queues.
+CRISIS_PRIORITY_SECONDS = float(os.getenv("CRISIS_PRIORITY_MINUTES", "30")) * 60
+
+MAX_TURNS = 16  # keep at most N turns verbatim; older ones are folded into the summary
+
+# History is fitted to a token budget; older turns become a rolling summary.
+CONTEXT = ContextWindow(
+    budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200")),
+    summary_budget=int(os.getenv("CONTEXT_SUMMARY_TOKENS", "200")),
+    max_messages=MAX_TURNS * 2,
+    cache_marker=os.getenv("PROMPT_CACHE_MARKER") == "1",
+)
 
-# In-memory store: { session_id: {"history": [...], "mood_counts": {...}} }
-MEMORY = {}
-MAX_TURNS = 16  # keep last N turns for context to avoid long payloads
+# Session store: { session_id: {"history": [...], "summary": "", "mood_counts": {...}, "crisis_at": ts} }
+# Bounded LRU/TTL cache in front of SQLite (SESSION_DB=""  -> memory only).
+SESSION_DB = os.getenv("SESSION_DB", "sessions.db")
+SESSIONS = SessionStore(
+    lambda: {"history": [], "summary": "", "history_tokens": 0,
+             "mood_counts": {"happy":0, "sad":0, "angry":0, "anxious":0, "neutral":0},
+             "crisis_at": None},
+    backend=SQLiteSessionBackend(SESSION_DB) if SESSION_DB else None,
+    max_sessions=int(os.getenv("SESSION_CACHE_SIZE", "1000")),
+    ttl=float(os.getenv("SESSION_TTL", "3600")),
+    freshness=float(os.getenv("SESSION_FRESHNESS_MS", "500")) / 1000,
+)
+
+# Time-windowed mood aggregates per session (text moods + facial emotions),
+# updated per event; mood_counts above stays as the lifetime tally.
+MOOD_ANALYTICS = MoodAnalytics(
+    max_sessions=int(os.getenv("SESSION_CACHE_SIZE", "1000")),
+    ring_size=int(os.getenv("MOOD_RING_SIZE", "256")),
+    window_events=int(os.getenv("MOOD_WINDOW_EVENTS", "20")),
+    window_minutes=float(os.getenv("MOOD_WINDOW_MINUTES", "30")),
+    half_life_minutes=float(os.getenv("MOOD_HALF_LIFE_MINUTES", "10")),
+    bucket_minutes=float(os.getenv("MOOD_BUCKET_MINUTES", "5")),
+    trend_buckets=int(os.getenv("MOOD_TREND_BUCKETS", "48")),
+    face_weight=float(os.getenv("MOOD_FACE_WEIGHT", "0.4")),
+    face_interval=float(os.getenv("MOOD_FACE_INTERVAL", "10")),
+)
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Emotion detection (improved) + crisis detection
 # ──────────────────────────────────────────────────────────────────────────────
-EMOTION_KEYWORDS = {
-    "happy":   ["happy", "joy", "excited", "glad", "cheerful", "grateful", "content", "fantastic", "great", "smile", "love"],
-    "sad":     ["sad", "down", "depressed", "unhappy", "lonely", "tearful", "hopeless", "cry", "miserable", "blue"],
-    "angry":   ["angry", "mad", "furious", "annoyed", "irritated", "rage", "pissed", "hate", "frustrated"],
-    "anxious": ["anxious", "worried", "nervous", "tense", "panic", "stressed", "overwhelmed", "scared", "afraid"],
-    "neutral": []
-}
-
-CRISIS_PATTERNS = [
-    r"\bkill myself\b", r"\bsuicide\b", r"\bsuicidal\b", r"\bend it all\b", r"\bself[-\s]?harm\b",
-    r"\bcutting\b", r"\bI don’t want to live\b", r"\bI don't want to live\b", r"\bI want to die\b"
-]
-
 CRISIS_RESPONSE = (
     "I'm really sorry you're feeling this way, and I'm glad you told me. "
     "You deserve immediate, real support. If you're in danger or planning to harm yourself, "
@@ -51,237 +91,379 @@ CRISIS_RESPONSE = (
     "but a trained professional can offer immediate help."
 )
 
+# Sent when the LLM is unreachable (including while its circuit breaker is open).
+FALLBACK_REPLY = (
+    "Thanks for sharing that. I'm having trouble connecting right now, "
+    "but I’m here to support you. You might try a brief grounding exercise: "
+    "look around and name 5 things you can see, 4 you can feel, 3 you can hear, "
+    "2 you can smell, and 1 you can taste. Would you like to continue talking?"
+)
+
 def detect_emotion(text: str) -> str:
     """
-    Improved detection: uses regex word boundaries so partial matches
-    (e.g. 'gladsome' triggering 'sad') are avoided.
+    Dominant emotion from a single tokenize-and-lookup pass over the message
+    (see emotion_lexicon.py). Word boundaries are still respected, so
+    'gladsome' does not count as 'glad'.
+    """
+    return DEFAULT_LEXICON.classify(text)
+
+def score_emotions(text: str) -> dict:
+    """
+    Keyword hit counts for every emotion in emotion_lexicon.EMOTION_KEYWORDS.
+    """
+    return DEFAULT_LEXICON.scores(text)
+
+def crisis_match(text: str):
+    """
+    The crisis pattern found in `text`, or None (see crisis.py).
     """
-    t = text.lower()
-    for emotion, words in EMOTION_KEYWORDS.items():
-        for w in words:
-            if re.search(rf"\b{re.escape(w)}\b", t):
-                return emotion
-    return "neutral"
+    return CRISIS_MATCHER.match(text)
 
 def is_crisis(text: str) -> bool:
-    t = text.lower()
-    return any(re.search(pat, t) for pat in CRISIS_PATTERNS)
+    return crisis_match(text) is not None
 
 # ──────────────────────────────────────────────────────────────────────────────
-# Memory helpers (unchanged)
+# Memory helpers
 # ──────────────────────────────────────────────────────────────────────────────
-def get_session(session_id: str):
-    if session_id not in MEMORY:
-        MEMORY[session_id] = {
-            "history": [],
-            "mood_counts": {"happy":0, "sad":0, "angry":0, "anxious":0, "neutral":0}
-        }
-    return MEMORY[session_id]
+def get_session(session_id: str, create: bool = True):
+    """
+    Session dict for `session_id`. Read-only callers pass create=False so
+    unknown ids get an empty view instead of a new stored session.
+    """
+    sess = SESSIONS.get(session_id, create=create)
+    return sess if sess is not None else SESSIONS.factory()
 
+# Writes go through SESSIONS.update, which re-applies the change if another
+# worker saved the session in between.
 def append_history(session_id: str, role: str, content: str):
-    sess = get_session(session_id)
-    sess["history"].append({
+    ts = datetime.utcnow().isoformat()
+    # Counts the message's tokens once; folds the oldest turns into the
+    # summary when the history outgrows CONTEXT's budget.
+    SESSIONS.update(session_id, lambda sess: CONTEXT.add(sess, {
         "role": role,
         "content": content,
-        "ts": datetime.utcnow().isoformat()
-    })
-    # Trim to last MAX_TURNS*2 (user+assistant per turn)
-    if len(sess["history"]) > MAX_TURNS * 2:
-        sess["history"] = sess["history"][-MAX_TURNS*2:]
+        "ts": ts
+    }))
 
 def increment_mood(session_id: str, mood: str):
-    sess = get_session(session_id)
-    if mood not in sess["mood_counts"]:
-        sess["mood_counts"][mood] = 0
-    sess["mood_counts"][mood] += 1
+    def bump(sess):
+        sess["mood_counts"][mood] = sess["mood_counts"].get(mood, 0) + 1
+    SESSIONS.update(session_id, bump)
+    MOOD_ANALYTICS.record_text(session_id, mood)
+
+def mark_crisis(session_id: str):
+    now = time.time()
+    SESSIONS.update(session_id, lambda sess: sess.update(crisis_at=now))
+
+def admission_priority(session_id: str) -> int:
+    """
+    CRITICAL for CRISIS_PRIORITY_SECONDS after the session's last crisis
+    message, NORMAL otherwise. Shared ids (admission.SHARED_SESSION_IDS) never
+    get priority: one user's crisis would lift everyone on that id.
+    """
+    if not admission.per_client_session(session_id):
+        return admission.NORMAL
+    crisis_at = get_session(session_id, create=False).get("crisis_at")
+    if crisis_at and time.time() - crisis_at < CRISIS_PRIORITY_SECONDS:
+        return admission.CRITICAL
+    return admission.NORMAL
+
+# Static prefix of every request; keep it unchanged so providers can cache it.
+PERSONA = (
+    "You are a compassionate mental health support companion. "
+    "Your purpose is to listen with empathy and gently support users "
+    "who are experiencing emotional or mental health struggles. "
+    "Talk in a way that replicates human speech like a supportive friend. Maintain the context of your responses."
+    "Never provide recipes, technical instructions, or unrelated advice. "
+    "If the user asks for unrelated content, kindly acknowledge once, then redirect back to their feelings. "
+    "Keep responses short (2–4 sentences)and under 40-50 words, varied in wording, and avoid repeating the same advice. "
+    "If the user says 'stop' or asks to end, respect their boundary and respond briefly with kindness. "
+    "Provide reassurance and coping suggestions only when relevant. "
+    "Include the professional disclaimer only once at the start of the chat."
+)
 
-def build_messages(session_id: str, user_message: str):
+def build_messages(session_id: str, user_message: str = None):
     """
-    Build a Mistral-compatible message list with system prompt + short-term memory.
+    Build a Mistral-compatible message list: persona, rolling summary of
+    older turns, then the token-budgeted history. The current user message is
+    normally already in history (chat() appends it first); it is only added
+    here when it is not.
     """
-    persona = (
-        "You are a compassionate mental health support companion. "
-        "Your purpose is to listen with empathy and gently support users "
-        "who are experiencing emotional or mental health struggles. "
-        "Talk in a way that replicates human speech like a supportive friend. Maintain the context of your responses."
-        "Never provide recipes, technical instructions, or unrelated advice. "
-        "If the user asks for unrelated content, kindly acknowledge once, then redirect back to their feelings. "
-        "Keep responses short (2–4 sentences)and under 40-50 words, varied in wording, and avoid repeating the same advice. "
-        "If the user says 'stop' or asks to end, respect their boundary and respond briefly with kindness. "
-        "Provide reassurance and coping suggestions only when relevant. "
-        "Include the professional disclaimer only once at the start of the chat."
-    )
-
-    # Pull short-term memory
     sess = get_session(session_id)
-    recent_history = [{"role": h["role"], "content": h["content"]} for h in sess["history"][-MAX_TURNS*2:]]
-    messages = [{"role": "system", "content": persona}]
-    messages.extend(recent_history)
-    messages.append({"role": "user", "content": user_message})
+    messages = CONTEXT.messages(sess, PERSONA)
+    if user_message and messages[-1] != {"role": "user", "content": user_message}:
+        messages.append({"role": "user", "content": user_message})
     return messages
 
 # ──────────────────────────────────────────────────────────────────────────────
-# Mistral call (unchanged)
+# Mistral call (pooled keep-alive client with retries + circuit breaker)
 # ──────────────────────────────────────────────────────────────────────────────
-def call_mistral(messages, temperature=0.7, model="mistral-tiny"):
-    url = "https://api.mistral.ai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {MISTRAL_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    payload = {"model": model, "messages": messages, "temperature": temperature}
-    resp = requests.post(url, headers=headers, json=payload, timeout=45)
-    if resp.status_code != 200:
-        raise RuntimeError(f"Mistral API error {resp.status_code}: {resp.text}")
-    data = resp.json()
-    return data["choices"][0]["message"]["content"].strip()
+def call_mistral(messages, temperature=0.7, model="mistral-tiny", cache=None):
+    if cache is not None:
+        return cache.chat(get_client("mistral"), messages, model=model, temperature=temperature)
+    return get_client("mistral").chat(messages, model=model, temperature=temperature)
+
+def stream_mistral(messages, temperature=0.7, model="mistral-tiny", cache=None):
+    if cache is not None:
+        return cache.stream_chat(get_client("mistral"), messages, model=model, temperature=temperature)
+    return get_client("mistral").stream_chat(messages, model=model, temperature=temperature)
+
+def stream_reply(session_id: str, emotion: str, tokens=None, messages=None, level=admission.NORMAL):
+    """
+    SSE response for /chat/stream: a `meta` event with the emotion, one `token`
+    event per delta, then `done` with the full reply. Either relays `messages`
+    to Mistral or replays fixed `tokens` (already stored in history).
+
+    Streamed replies are appended to history when the stream ends, including
+    when the client disconnects mid-way (the partial reply is kept). If the
+    LLM gate sheds the call, an `error` event carries `retry_after`.
+    """
+    def generate():
+        parts = []
+        started = time.perf_counter()
+        try:
+            yield sse_event({"emotion": emotion}, "meta")
+            try:
+                with admission.priority(level):
+                    for token in (tokens if tokens is not None else stream_mistral(messages, cache=cache_for("chat"))):
+                        if not parts and tokens is None:
+                            telemetry.observe_stage("llm_first_token", time.perf_counter() - started)
+                        parts.append(token)
+                        yield sse_event({"token": token}, "token")
+            except admission.AdmissionError as e:
+                if parts:
+                    raise
+                yield sse_event({"error": str(e), "retry_after": e.retry_after}, "error")
+                return
+            except Exception:
+                if parts:
+                    raise
+                parts.append(FALLBACK_REPLY)
+                yield sse_event({"token": FALLBACK_REPLY}, "token")
+            yield sse_event({"reply": "".join(parts).strip(), "emotion": emotion}, "done")
+        except Exception as e:
+            yield sse_event({"error": str(e)}, "error")
+        finally:
+            reply = "".join(parts).strip()
+            if tokens is None and reply:
+                append_history(session_id, "assistant", reply)
+
+    return Response(telemetry.in_request_context(generate()), mimetype="text/event-stream", headers=SSE_HEADERS)
 
 # ──────────────────────────────────────────────────────────────────────────────
 # Routes (chat/history/moods/reset/root/speak/emotion) - only chat updated
 # ──────────────────────────────────────────────────────────────────────────────
-@app.route("/chat", methods=["POST"])
+@bp.route("/chat", methods=["POST"])
+@bp.route("/chat/stream", methods=["POST"])
 def chat():
+    """
+    Body: { "message": "...", "session_id": "..." }
+    Streams the reply as SSE on /chat/stream or /chat?stream=1.
+    """
     try:
         body = request.get_json(force=True) or {}
         user_message = (body.get("message") or "").strip()
         session_id = (body.get("session_id") or "default-session").strip()
+        stream = request.path.endswith("/stream") or request.args.get("stream") == "1"
 
         if not user_message:
             return jsonify({"error": "Missing 'message'"}), 400
 
         # Crisis check
-        if is_crisis(user_message):
+        with telemetry.span("crisis"):
+            crisis = is_crisis(user_message)
+        if crisis:
+            mark_crisis(session_id)
             emotion = "sad"
             increment_mood(session_id, emotion)
             append_history(session_id, "user", user_message)
             append_history(session_id, "assistant", CRISIS_RESPONSE)
+            if stream:
+                return stream_reply(session_id, emotion, tokens=[CRISIS_RESPONSE])
             return jsonify({"reply": CRISIS_RESPONSE, "emotion": emotion})
 
+        level = admission_priority(session_id)
+        with admission.priority(level):
+            LIMITER.check("chat", admission.client_key(session_id))
+
         # Emotion detection
-        emotion = detect_emotion(user_message)
-        increment_mood(session_id, emotion)
+        with telemetry.span("emotion"):
+            emotion = detect_emotion(user_message)
+        with telemetry.span("session"):
+            increment_mood(session_id, emotion)
+            append_history(session_id, "user", user_message)
 
         # Build messages
-        append_history(session_id, "user", user_message)
-        messages = build_messages(session_id, user_message)
+        with telemetry.span("build_messages"):
+            messages = build_messages(session_id, user_message)
+
+        if stream:
+            return stream_reply(session_id, emotion, messages=messages, level=level)
 
         # Call Mistral
         try:
-            reply = call_mistral(messages)
+            with telemetry.span("llm"), admission.priority(level):
+                reply = call_mistral(messages, cache=cache_for("chat"))
+        except admission.AdmissionError:
+            raise
         except Exception:
-            reply = (
-                "Thanks for sharing that. I'm having trouble connecting right now, "
-                "but I’m here to support you. You might try a brief grounding exercise: "
-                "look around and name 5 things you can see, 4 you can feel, 3 you can hear, "
-                "2 you can smell, and 1 you can taste. Would you like to continue talking?"
-            )
+            reply = FALLBACK_REPLY
 
         append_history(session_id, "assistant", reply)
         return jsonify({"reply": reply, "emotion": emotion})
 
+    except admission.AdmissionError as e:
+        return admission.error_response(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/history", methods=["GET"])
+@bp.route("/history", methods=["GET"])
 def history():
     session_id = (request.args.get("session_id") or "default-session").strip()
-    sess = get_session(session_id)
-    return jsonify({"session_id": session_id, "turns": sess["history"]})
+    sess = get_session(session_id, create=False)
+    turns = [{"role": m["role"], "content": m["content"]} for m in sess["history"]]
+    return jsonify({"session_id": session_id, "turns": turns})
 
 
-@app.route("/moods", methods=["GET"])
+@bp.route("/moods", methods=["GET"])
 def moods():
     session_id = (request.args.get("session_id") or "default-session").strip()
-    sess = get_session(session_id)
+    sess = get_session(session_id, create=False)
     return jsonify(sess["mood_counts"])
 
 
-@app.route("/reset", methods=["POST"])
+@bp.route("/moods/summary", methods=["GET"])
+def moods_summary():
+    """
+    Rolling-window, decayed and face-fused moods for ?session_id=
+    (see mood_analytics.py).
+    """
+    session_id = (request.args.get("session_id") or "default-session").strip()
+    return jsonify(MOOD_ANALYTICS.summary(session_id))
+
+
+@bp.route("/moods/trend", methods=["GET"])
+def moods_trend():
+    """
+    ?session_id=&buckets=12  mood counts and valence per time bucket, oldest first.
+    """
+    session_id = (request.args.get("session_id") or "default-session").strip()
+    try:
+        buckets = max(int(request.args.get("buckets", 12)), 1)
+    except ValueError:
+        return jsonify({"error": "buckets must be an integer"}), 400
+    return jsonify(MOOD_ANALYTICS.trend(session_id, buckets))
+
+
+@bp.route("/reset", methods=["POST"])
 def reset():
     body = request.get_json(force=True) or {}
     session_id = (body.get("session_id") or "default-session").strip()
-    MEMORY[session_id] = {"history": [], "mood_counts": {"happy":0, "sad":0, "angry":0, "anxious":0, "neutral":0}}
+    SESSIONS.reset(session_id)
+    MOOD_ANALYTICS.reset(session_id)
     return jsonify({"ok": True, "session_id": session_id})
 
 
-@app.route("/", methods=["GET"])
+@bp.route("/cache_stats", methods=["GET"])
+def cache_stats():
+    return jsonify(get_cache().stats())
+
+
+@bp.route("/", methods=["GET"])
 def root():
-    return jsonify({"ok": True, "service": "Calmana Agent API", "endpoints": ["/chat", "/history", "/moods", "/reset"]})
+    return jsonify({"ok": True, "service": "Calmana Agent API", "endpoints": ["/chat", "/chat/stream", "/history", "/moods", "/moods/summary", "/moods/trend", "/reset", "/admission_stats"]})
 
 # ──────────────────────────────────────────────────────────────────────────────
-# /speak route (pyttsx3) - moved above app.run so route is registered.
-# It writes a temp WAV, sends it, and deletes the file after sending.
+# /speak route (pyttsx3 via tts.TTSService: warm engine pool + audio cache)
 # ──────────────────────────────────────────────────────────────────────────────
+TTS = TTSService(AudioCache(
+    max_bytes=int(os.getenv("TTS_CACHE_MB", "32")) << 20,
+    spill_dir=os.getenv("TTS_CACHE_DIR", "tts_cache") or None,
+    spill_max_bytes=int(os.getenv("TTS_CACHE_DISK_MB", "256")) << 20,
+))
+
+def prerender_canned_replies():
+    try:
+        TTS.warm()
+        TTS.prerender([CRISIS_RESPONSE, FALLBACK_REPLY])
+        print("✅ Canned TTS replies pre-rendered.")
+    except Exception as e:
+        print("⚠️ TTS pre-render failed:", str(e))
+
+if os.getenv("TTS_PRERENDER", "1") == "1":
+    threading.Thread(target=prerender_canned_replies, daemon=True).start()
 
 
-@app.route("/speak", methods=["POST"])
+@bp.route("/speak", methods=["GET", "POST"])
 def speak():
     """
-    Body: { "text": "hello there", "gender": "male"|"female" }
-    Returns: WAV audio file
+    Body (or query string): { "text": "hello there", "gender": "male"|"female",
+                              "format": "wav"|"opus"|"mp3", "stream": false }
+    Returns: audio; supports Range requests for replay. With stream=1 the WAV
+    is sent sentence by sentence as it is synthesized.
     """
     try:
-        body = request.get_json(force=True) or {}
+        body = request.get_json(silent=True) or request.args
         text = (body.get("text") or "").strip()
-        gender = body.get("gender", "female").lower()
+        gender = (body.get("gender") or "female").lower()
+        fmt = (body.get("format") or "wav").lower()
+        stream = str(body.get("stream", "")).lower() in ("1", "true")
 
         if not text:
             return jsonify({"error": "Missing 'text'"}), 400
+        if fmt != "wav" and fmt not in ENCODINGS:
+            return jsonify({"error": f"Unsupported format '{fmt}'"}), 400
+        LIMITER.check("speak", admission.client_key(body.get("session_id") or request.headers.get("X-Session-ID")))
+
+        if stream and fmt == "wav":
+            return Response(TTS.speak_stream(text, gender), mimetype="audio/wav")
 
-        tmpfile = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-        tmp_path = tmpfile.name
-        tmpfile.close()
-
-        def tts_worker(text_to_speak, path, gender_choice):
-            engine = pyttsx3.init()
-            voices = engine.getProperty("voices")
-            if gender_choice == "male":
-                for v in voices:
-                    if "male" in v.name.lower():
-                        engine.setProperty("voice", v.id)
-                        break
-            else:
-                for v in voices:
-                    if "female" in v.name.lower():
-                        engine.setProperty("voice", v.id)
-                        break
-            engine.save_to_file(text_to_speak, path)
-            engine.runAndWait()
-
-        # Run TTS in a separate thread
-        t = threading.Thread(target=tts_worker, args=(text, tmp_path, gender))
-        t.start()
-        t.join()
-
-        @after_this_request
-        def cleanup(response):
-            try: os.remove(tmp_path)
-            except Exception: pass
-            return response
-
-        return send_file(tmp_path, mimetype="audio/wav", as_attachment=False, conditional=True)
+        if fmt == "wav":
+            audio, mimetype = TTS.speak(text, gender), "audio/wav"
+        else:
+            audio, mimetype = TTS.speak_encoded(text, gender, fmt), ENCODINGS[fmt][0]
+        resp = Response(audio, mimetype=mimetype)
+        return resp.make_conditional(request, accept_ranges=True, complete_length=len(audio))
 
+    except admission.AdmissionError as e:
+        return admission.error_response(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-@app.route("/emotion", methods=["GET"])
+# Same database fg.py writes; latest_emotions is keyed by session.
+EMOTION_DB = os.getenv("EMOTION_DB", "emotions.db")
+emotion_store.init_db(EMOTION_DB)
+EMOTION_READS = emotion_store.read_pool(EMOTION_DB, size=2)
+
+# Facial readings committed by fg.py feed the mood analytics as they arrive.
+if os.getenv("MOOD_FACE_FUSION", "1") == "1":
+    MOOD_ANALYTICS.follow(emotion_store.feed(EMOTION_DB, poll_interval=float(os.getenv("FEED_POLL_MS", "100")) / 1000))
+
+@bp.route("/emotion", methods=["GET"])
 def get_emotion():
     try:
-        conn = sqlite3.connect("emotion_data.db")
-        cursor = conn.cursor()
-        cursor.execute("SELECT emotion, confidence FROM emotions ORDER BY timestamp DESC LIMIT 1")
-        row = cursor.fetchone()
-        conn.close()
-
-        if row:
-            return jsonify({"emotion": row[0], "confidence": row[1]})
+        session_id = request.headers.get("X-Session-ID") or request.args.get("session_id")
+        with EMOTION_READS.connection() as conn:
+            latest = emotion_store.latest(conn, session_id)
+
+        if latest:
+            return jsonify({"emotion": latest["emotion"], "confidence": latest["confidence"],
+                            "timestamp": latest["timestamp"]})
         else:
             return jsonify({"emotion": "Neutral", "confidence": 0.0})
     except Exception as e:
         return jsonify({"error": str(e)})
 
 
+# ──────────────────────────────────────────────────────────────────────────────
+# Standalone app
+# ──────────────────────────────────────────────────────────────────────────────
+app = Flask(__name__)
+telemetry.init_routes(app)  # /metrics
+admission.init_app(app)  # 429/503 + Retry-After, /admission_stats
+app.register_blueprint(bp)
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,5 @@
+"""
+Offline benchmarks for the Calmana backends.
+
+Run from client/backend, e.g. `python -m benchmarks.bench_emotion`.
+"""
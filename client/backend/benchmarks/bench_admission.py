@@ -0,0 +1,110 @@
+"""
+app.py's /chat under overload, with and without the LLM admission gate
+(admission.py).
+
+The stub LLM works on at most --capacity requests at once (--latency each),
+so it serves capacity / latency replies per second; --clients closed-loop
+conversations offer more than that. Clients honour Retry-After on 429/503.
+A separate session sends one crisis message and then follow-up turns during
+the load; with the gate on those skip the queue (CRITICAL priority).
+
+    off   ADMIT_LLM_CONCURRENCY large: every request waits at the provider
+    on    ADMIT_LLM_CONCURRENCY=--gate, ADMIT_LLM_QUEUE=--queue,
+          ADMIT_LLM_WAIT_MS=--wait-ms: excess is shed with 503 + Retry-After
+
+    python -m benchmarks.bench_admission [--clients 64] [--capacity 8] [--latency 0.25] [--duration 10]
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks import stub_llm
+from benchmarks.load_chat import free_port, percentile, start_server, wait_for
+
+MESSAGE = "I have been feeling a little overwhelmed at work this week."
+CRISIS = "Some days I just want to end it all."
+
+
+def drive(base: str, clients: int, duration: float) -> dict:
+    ok, priority, shed = [], [], [0]
+    lock = threading.Lock()
+    stop = time.monotonic() + duration
+
+    def client(i: int):
+        session = requests.Session()
+        while time.monotonic() < stop:
+            t0 = time.perf_counter()
+            resp = session.post(f"{base}/chat", json={"message": MESSAGE, "session_id": f"load-{i}"}, timeout=120)
+            if resp.status_code in (429, 503):
+                with lock:
+                    shed[0] += 1
+                time.sleep(float(resp.headers.get("Retry-After", 1)))
+                continue
+            resp.raise_for_status()
+            with lock:
+                ok.append(time.perf_counter() - t0)
+
+    def crisis_session():
+        session = requests.Session()
+        session.post(f"{base}/chat", json={"message": CRISIS, "session_id": "crisis"}, timeout=120).raise_for_status()
+        time.sleep(1.0)  # let the queue build first
+        while time.monotonic() < stop:
+            t0 = time.perf_counter()
+            session.post(f"{base}/chat", json={"message": MESSAGE, "session_id": "crisis"},
+                         timeout=120).raise_for_status()
+            priority.append(time.perf_counter() - t0)
+
+    workers = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(clients)]
+    workers.append(threading.Thread(target=crisis_session, daemon=True))
+    t0 = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    wall = time.perf_counter() - t0
+    return {"ok": len(ok), "shed": shed[0], "rps": len(ok) / wall,
+            "p50": percentile(ok, 0.50), "p99": percentile(ok, 0.99),
+            "priority_p50": percentile(priority, 0.50), "priority_max": max(priority, default=0.0)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--capacity", type=int, default=8, help="stub LLM requests worked on at once")
+    parser.add_argument("--latency", type=float, default=0.25, help="stub LLM seconds per request")
+    parser.add_argument("--gate", type=int, default=8)
+    parser.add_argument("--queue", type=int, default=8)
+    parser.add_argument("--wait-ms", type=float, default=1000)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    stub, stub_url = stub_llm.start(latency=args.latency, capacity=args.capacity)
+    print(f"provider: {args.capacity / args.latency:.0f} replies/s max; {args.clients} clients")
+    for name, admit in (("off", {"ADMIT_LLM_CONCURRENCY": "100000"}),
+                        ("on", {"ADMIT_LLM_CONCURRENCY": str(args.gate), "ADMIT_LLM_QUEUE": str(args.queue),
+                                "ADMIT_LLM_WAIT_MS": str(args.wait_ms)})):
+        port = free_port()
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {"MISTRAL_API_KEY": "stub", "MISTRAL_BASE_URL": stub_url, "RATE_LIMITS": "",
+                   "SESSION_DB": os.path.join(tmp, "sessions.db"), "LLM_CACHE_ROUTES": "", "LLM_CACHE_DB": "",
+                   "EMOTION_DB": os.path.join(tmp, "emotions.db"), "TTS_PRERENDER": "0",
+                   "LLM_POOL_SIZE": str(args.clients * 2), "TELEMETRY_SLOW_MS": "60000", **admit}
+            proc = start_server("app:app", "sync", port, env, args.clients * 2)
+            try:
+                wait_for(f"http://127.0.0.1:{port}/")
+                r = drive(f"http://127.0.0.1:{port}", args.clients, args.duration)
+            finally:
+                proc.terminate()
+                proc.wait()
+        print(f"{name:>4}: {r['rps']:6.1f} replies/s | p50 {r['p50'] * 1000:6.0f} ms p99 {r['p99'] * 1000:6.0f} ms "
+              f"| shed {r['shed']:5d} | crisis session p50 {r['priority_p50'] * 1000:5.0f} ms "
+              f"max {r['priority_max'] * 1000:5.0f} ms")
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
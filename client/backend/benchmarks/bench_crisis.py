@@ -0,0 +1,88 @@
+"""
+Crisis matching latency as the pattern list grows.
+
+Builds pattern lists of increasing size from multilingual phrases and reports
+p50/p99 per-message match time for the old "re.search every pattern" loop and
+for CrisisMatcher.
+
+    python -m benchmarks.bench_crisis [--sizes 8,100,200,350] [--messages 2000]
+"""
+import argparse
+import random
+import re
+import time
+
+from crisis import CRISIS_PATTERNS, CrisisMatcher
+
+# Seed phrases; synthetic variants are generated from these to reach each size.
+PHRASES = [
+    "want to die", "kill myself", "end my life", "no reason to live", "better off dead",
+    "quiero morir", "matarme", "no quiero vivir", "acabar con todo",
+    "je veux mourir", "me tuer", "en finir", "ich will sterben", "mich umbringen",
+    "marna chahta", "marna chahti", "jeena nahi", "khud ko khatam",
+    "मरना चाहता", "जीना नहीं चाहता", "खुद को खत्म",
+]
+ENDINGS = ("tonight", "anymore", "now", "today", "forever", "soon", "ahora", "ya", "hoy",
+           "maintenant", "ce soir", "jetzt", "heute", "abhi", "aaj raat", "अभी", "आज")
+FILLER = ("i", "had", "a", "long", "day", "at", "work", "and", "then", "we", "went", "home",
+          "my", "sister", "called", "me", "about", "the", "trip", "it", "was", "fine", "hoy",
+          "fue", "un", "dia", "largo", "aaj", "ka", "din", "accha", "tha")
+
+
+def make_patterns(size: int, rng: random.Random) -> list:
+    variants = [rf"\b{re.escape(p)} {re.escape(e)}\b" for p in PHRASES for e in ENDINGS]
+    rng.shuffle(variants)
+    return (list(CRISIS_PATTERNS) + variants)[:size]
+
+
+def make_messages(n: int, rng: random.Random) -> list:
+    msgs = []
+    for _ in range(n):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(5, 40))]
+        if rng.random() < 0.05:
+            words.insert(rng.randrange(len(words) + 1), rng.choice(PHRASES))
+        msgs.append(" ".join(words))
+    return msgs
+
+
+def percentiles(samples: list) -> tuple:
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return pick(0.50) * 1e6, pick(0.99) * 1e6
+
+
+def time_each(fn, messages: list) -> list:
+    out = []
+    for m in messages:
+        start = time.perf_counter()
+        fn(m)
+        out.append(time.perf_counter() - start)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="8,100,200,350")
+    parser.add_argument("--messages", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    messages = make_messages(args.messages, rng)
+    print(f"{'patterns':>8} | {'legacy p50':>10} {'legacy p99':>10} | {'matcher p50':>11} {'matcher p99':>11}  (us)")
+    for size in (int(s) for s in args.sizes.split(",")):
+        patterns = make_patterns(size, rng)
+        matcher = CrisisMatcher(patterns)
+
+        def legacy(text):
+            t = text.lower()
+            return any(re.search(pat, t) for pat in patterns)
+
+        for m in messages[:50]:  # warm the re module cache for the legacy path
+            legacy(m)
+        l50, l99 = percentiles(time_each(legacy, messages))
+        m50, m99 = percentiles(time_each(matcher.match, messages))
+        print(f"{size:>8} | {l50:>10.1f} {l99:>10.1f} | {m50:>11.1f} {m99:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
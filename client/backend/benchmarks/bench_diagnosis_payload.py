@@ -0,0 +1,90 @@
+"""
+Wire size and server time over one simulated assessment: the legacy
+/diagnosis protocol (client posts the whole conversation, server echoes it
+back) versus server-held sessions (client posts only its answer).
+
+The stub LLM (benchmarks/stub_llm.py) answers every turn instantly with a
+realistic multiple-choice question, and the response cache is disabled so
+every turn reaches it; the "to LLM" column is what is forwarded upstream and
+is the same for both protocols.
+
+    python -m benchmarks.bench_diagnosis_payload [--turns 12] [--runs 5]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks import stub_llm
+
+QUESTION = ("4. Over the last two weeks, how often have you had trouble falling or staying asleep, "
+            "or sleeping too much?\nA) Not at all\nB) Several days\nC) More than half the days\nD) Nearly every day")
+ANSWERS = ["A) Not at all", "B) Several days", "C) More than half the days", "D) Nearly every day"]
+
+
+def legacy_assessment(client, turns: int):
+    rows, conversation = [], []
+    for i in range(turns):
+        if i:
+            conversation.append({"role": "user", "content": ANSWERS[i % 4]})
+        body = json.dumps({"conversation": conversation}).encode()
+        t0 = time.perf_counter()
+        resp = client.post("/diagnosis", data=body, content_type="application/json")
+        elapsed = time.perf_counter() - t0
+        data = resp.get_json()
+        conversation = data["conversation"]
+        rows.append((len(body), len(resp.get_data()), elapsed))
+    return rows
+
+
+def session_assessment(client, turns: int):
+    rows, session_id = [], None
+    for i in range(turns):
+        payload = {"session_id": session_id, "answer": ANSWERS[i % 4]} if i else {}
+        body = json.dumps(payload).encode()
+        t0 = time.perf_counter()
+        resp = client.post("/diagnosis", data=body, content_type="application/json")
+        elapsed = time.perf_counter() - t0
+        session_id = resp.get_json()["session_id"]
+        rows.append((len(body), len(resp.get_data()), elapsed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=12)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    stub, url = stub_llm.start(reply=QUESTION)
+    tmp = tempfile.mkdtemp()
+    os.environ.update({"TOGETHER_API_KEY": os.getenv("TOGETHER_API_KEY", "bench"), "TOGETHER_BASE_URL": url,
+                       "LLM_CACHE_ROUTES": "", "LLM_CACHE_DB": "", "DIAGNOSIS_DB": os.path.join(tmp, "sessions.db"),
+                       "RATE_LIMITS": ""})
+    import llm_chatbot
+    client = llm_chatbot.app.test_client()
+
+    # Bytes forwarded to the LLM per turn (identical for both protocols).
+    to_llm = []
+    for i in range(args.turns):
+        conversation = [{"role": "user", "content": "x"}] + [
+            {"role": role, "content": QUESTION if role == "assistant" else ANSWERS[0]}
+            for _ in range(i) for role in ("assistant", "user")]
+        to_llm.append(len(json.dumps([llm_chatbot.system_message] + conversation)))
+
+    for name, run in (("legacy", legacy_assessment), ("session", session_assessment)):
+        run(client, 2)  # warm-up
+        results = [run(client, args.turns) for _ in range(args.runs)]
+        up = sum(r[0] for r in results[0])
+        down = sum(r[1] for r in results[0])
+        last_up, last_down = results[0][-1][0], results[0][-1][1]
+        server_ms = min(sum(r[2] for r in rows) for rows in results) * 1000
+        print(f"{name:>8}: {args.turns} turns | up {up / 1024:7.1f} KiB (last turn {last_up:6d} B) | "
+              f"down {down / 1024:7.1f} KiB (last turn {last_down:6d} B) | {server_ms:7.1f} ms total")
+    print(f"  to LLM: {sum(to_llm) / 1024:7.1f} KiB over the assessment (both protocols)")
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
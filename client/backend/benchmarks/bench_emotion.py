@@ -0,0 +1,72 @@
+"""
+Compare the precompiled lexicon against the old per-keyword regex scan.
+
+    python -m benchmarks.bench_emotion [--messages 5000] [--repeat 5]
+"""
+import argparse
+import random
+import re
+import time
+
+from emotion_lexicon import EMOTION_KEYWORDS, DEFAULT_LEXICON
+
+FILLER = ("i", "today", "was", "really", "kind", "of", "at", "work", "and", "my", "friend",
+          "said", "that", "we", "should", "talk", "about", "it", "later", "feel", "so")
+
+
+def legacy_detect_emotion(text: str) -> str:
+    # Verbatim copy of the previous app.detect_emotion.
+    t = text.lower()
+    for emotion, words in EMOTION_KEYWORDS.items():
+        for w in words:
+            if re.search(rf"\b{re.escape(w)}\b", t):
+                return emotion
+    return "neutral"
+
+
+def make_messages(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    keywords = [w for words in EMOTION_KEYWORDS.values() for w in words]
+    messages = []
+    for _ in range(n):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(6, 40))]
+        for _ in range(rng.randint(0, 2)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords))
+        messages.append(" ".join(words).capitalize() + ".")
+    return messages
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    messages = make_messages(args.messages)
+    legacy = best_of(lambda: [legacy_detect_emotion(m) for m in messages], args.repeat)
+    single = best_of(lambda: [DEFAULT_LEXICON.classify(m) for m in messages], args.repeat)
+    batch = best_of(lambda: DEFAULT_LEXICON.classify_batch(messages), args.repeat)
+
+    # Messages with at most one emotion present must classify identically.
+    single_emotion = [m for m in messages if sum(1 for c in DEFAULT_LEXICON.scores(m).values() if c) <= 1]
+    agree = sum(legacy_detect_emotion(m) == DEFAULT_LEXICON.classify(m) for m in single_emotion)
+
+    n = len(messages)
+    print(f"messages: {n}")
+    print(f"legacy regex scan : {legacy / n * 1e6:8.2f} us/msg")
+    print(f"lexicon classify  : {single / n * 1e6:8.2f} us/msg  ({legacy / single:.1f}x)")
+    print(f"lexicon batch     : {batch / n * 1e6:8.2f} us/msg  ({legacy / batch:.1f}x)")
+    print(f"agreement on single-emotion messages: {agree}/{len(single_emotion)}")
+
+
+if __name__ == "__main__":
+    main()
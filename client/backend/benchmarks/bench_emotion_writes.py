@@ -0,0 +1,81 @@
+"""
+Write throughput for the emotions table, in frames/sec.
+
+    legacy   connect, INSERT, commit, close per frame (the old fg.py path)
+    writer   EmotionWriter: WAL, bounded queue, group commit
+
+Both run with --producers threads posting --frames rows in total.
+
+    python -m benchmarks.bench_emotion_writes [--frames 2000] [--producers 4]
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from emotion_store import EmotionWriter, init_db
+
+
+def legacy_insert(path, emotion, confidence):
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute("INSERT INTO emotions (emotion, confidence) VALUES (?, ?)", (emotion, float(confidence)))
+    conn.commit()
+    conn.close()
+
+
+def run_producers(n_frames: int, producers: int, write) -> float:
+    per_thread = n_frames // producers
+
+    def produce():
+        for i in range(per_thread):
+            write("happy" if i % 3 else "neutral", 0.5 + (i % 50) / 100)
+
+    threads = [threading.Thread(target=produce) for _ in range(producers)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - t0
+
+
+def count_rows(path) -> int:
+    conn = sqlite3.connect(path)
+    n = conn.execute("SELECT COUNT(*) FROM emotions").fetchone()[0]
+    conn.close()
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=2000)
+    parser.add_argument("--producers", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_db = os.path.join(tmp, "legacy.db")
+        init_db(legacy_db)
+        conn = sqlite3.connect(legacy_db)
+        conn.execute("PRAGMA journal_mode=DELETE")  # the old default
+        conn.close()
+        elapsed = run_producers(args.frames, args.producers,
+                                lambda e, c: legacy_insert(legacy_db, e, c))
+        print(f"legacy: {count_rows(legacy_db)} rows in {elapsed:.2f}s -> {count_rows(legacy_db) / elapsed:8.0f} frames/s")
+
+        writer_db = os.path.join(tmp, "writer.db")
+        init_db(writer_db)
+        writer = EmotionWriter(writer_db)
+        t0 = time.perf_counter()
+        run_producers(args.frames, args.producers, lambda e, c: writer.write([(e, c)]))
+        writer.flush(timeout=60)
+        elapsed = time.perf_counter() - t0
+        rows = count_rows(writer_db)
+        print(f"writer: {rows} rows in {elapsed:.2f}s -> {rows / elapsed:8.0f} frames/s "
+              f"({writer.commits} commits, {writer.dropped} dropped)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Startup time and memory: the three services as separate processes
+(serve.py app:app, llm_chatbot:app, fg:app, each with its own defaults)
+versus one gateway process (serve.py gateway:app).
+
+    serving   seconds from launch until every service answers
+    warm      seconds from launch until one chat, diagnosis, /speak and
+              /analyze_frame request have each completed (DeepFace and
+              pyttsx3 loaded, lazily or not)
+    idle      RSS / PSS summed over the processes once serving
+    loaded    the same after the warm-up requests
+
+DeepFace and pyttsx3 are the fakes from bench_startup / run_suite (the fake
+DeepFace sleeps --import-s on import and allocates --weights-mb of weights
+in --load-s); the LLM is the local stub. Linux only (reads /proc/<pid>/smaps_rollup).
+
+    python -m benchmarks.bench_gateway [--import-s 1.5] [--load-s 1.0] [--weights-mb 300] [--runs 3]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+from benchmarks import stub_llm
+from benchmarks.bench_startup import FAKE_DEEPFACE
+from benchmarks.frames import jpeg_bytes, synthetic_frames
+from benchmarks.load_chat import BACKEND_DIR, free_port
+from benchmarks.run_suite import FAKE_PYTTSX3
+
+# target -> {service: health path}
+LAYOUTS = {
+    "separate": {"app:app": {"chat": "/"}, "llm_chatbot:app": {"diagnosis": "/diagnoses?limit=1"},
+                 "fg:app": {"vision": "/livez"}},
+    "gateway": {"gateway:app": {"chat": "/", "diagnosis": "/assessment/diagnoses?limit=1", "vision": "/livez"}},
+}
+PREFIX = {"separate": "", "gateway": "/assessment"}
+
+
+def memory(pid: int) -> tuple:
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return fields.get("Rss", 0.0), fields.get("Pss", 0.0)
+
+
+def total_memory(procs) -> tuple:
+    rss, pss = zip(*(memory(p.pid) for p in procs))
+    return sum(rss), sum(pss)
+
+
+def wait_until(url: str, deadline: float):
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.02)
+    raise RuntimeError(f"{url} did not come up")
+
+
+def warm_up(bases: dict, prefix: str, frame: bytes):
+    requests.post(f"{bases['chat']}/chat", json={"message": "hello there", "session_id": "bench"},
+                  timeout=60).raise_for_status()
+    requests.post(f"{bases['diagnosis']}{prefix}/diagnosis", json={"engine": "llm"}, timeout=60).raise_for_status()
+    requests.post(f"{bases['chat']}/speak", json={"text": "Hello there."}, timeout=60).raise_for_status()
+    requests.post(f"{bases['vision']}/analyze_frame?session_id=bench", data=frame,
+                  headers={"Content-Type": "image/jpeg"}, timeout=60).raise_for_status()
+
+
+def run(layout: str, env: dict, frame: bytes) -> dict:
+    procs, bases = [], {}
+    t0 = time.monotonic()
+    for target, services in LAYOUTS[layout].items():
+        port = free_port()
+        cmd = [sys.executable, "serve.py", target, "--host", "127.0.0.1", "--port", str(port), "--mode", "sync"]
+        procs.append(subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+        for service in services:
+            bases[service] = f"http://127.0.0.1:{port}"
+    try:
+        for target, services in LAYOUTS[layout].items():
+            for service, path in services.items():
+                wait_until(bases[service] + path, t0 + 120)
+        serving = time.monotonic() - t0
+        idle = total_memory(procs)
+        warm_up(bases, PREFIX[layout], frame)
+        warm = time.monotonic() - t0
+        time.sleep(0.5)  # let background loads (fg's default MODEL_LOAD) settle
+        loaded = total_memory(procs)
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.wait()
+    return {"serving": serving, "warm": warm, "idle": idle, "loaded": loaded, "processes": len(procs)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--import-s", type=float, default=1.5)
+    parser.add_argument("--load-s", type=float, default=1.0)
+    parser.add_argument("--weights-mb", type=int, default=300)
+    parser.add_argument("--runtime-mb", type=int, default=40)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    stub, stub_url = stub_llm.start(latency=0.05)
+    frame = jpeg_bytes(next(synthetic_frames(1)))
+    for layout in LAYOUTS:
+        runs = []
+        for _ in range(args.runs):
+            with tempfile.TemporaryDirectory() as tmp:
+                fakes = os.path.join(tmp, "fakes")
+                os.makedirs(fakes)
+                for module, source in (("deepface", FAKE_DEEPFACE), ("pyttsx3", FAKE_PYTTSX3)):
+                    with open(os.path.join(fakes, f"{module}.py"), "w") as f:
+                        f.write(source)
+                env = {**os.environ, "MISTRAL_API_KEY": "stub", "TOGETHER_API_KEY": "stub",
+                       "MISTRAL_BASE_URL": stub_url, "TOGETHER_BASE_URL": stub_url,
+                       "SESSION_DB": os.path.join(tmp, "sessions.db"),
+                       "DIAGNOSIS_DB": os.path.join(tmp, "diagnosis.db"),
+                       "DIAGNOSIS_RESULTS_DB": os.path.join(tmp, "diagnoses.db"),
+                       "EMOTION_DB": os.path.join(tmp, "emotions.db"), "LLM_CACHE_DB": "",
+                       "TTS_CACHE_DIR": os.path.join(tmp, "tts_cache"),
+                       "FAKE_IMPORT_S": str(args.import_s), "FAKE_LOAD_S": str(args.load_s),
+                       "FAKE_WEIGHTS_MB": str(args.weights_mb), "FAKE_RUNTIME_MB": str(args.runtime_mb),
+                       "PYTHONPATH": os.pathsep.join([fakes, BACKEND_DIR, os.environ.get("PYTHONPATH", "")])}
+                runs.append(run(layout, env, frame))
+        best = min(runs, key=lambda r: r["warm"])
+        print(f"{layout:>8} ({best['processes']} proc): serving {min(r['serving'] for r in runs):5.2f} s | "
+              f"warm {best['warm']:5.2f} s | idle RSS {best['idle'][0]:6.0f} MB PSS {best['idle'][1]:6.0f} MB | "
+              f"loaded RSS {best['loaded'][0]:6.0f} MB PSS {best['loaded'][1]:6.0f} MB")
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Per-frame ingestion cost: JSON/base64 data URLs versus raw binary frames.
+
+Measures the CPU time spent turning an uploaded request body into a decoded
+BGR frame (no model inference) and the bytes on the wire per frame, for
+    json     {"image": "data:image/jpeg;base64,..."} -> json, split, b64decode, imdecode
+    binary   raw JPEG body (octet-stream / WebSocket message) -> frombuffer, imdecode
+
+    python -m benchmarks.bench_ingest [--frames 300] [--width 640 --height 480]
+"""
+import argparse
+import base64
+import json
+import time
+
+import cv2
+import numpy as np
+
+from benchmarks.frames import jpeg_bytes, synthetic_frames
+
+
+def json_path(body: bytes):
+    data = json.loads(body)["image"]
+    img = base64.b64decode(data.split(",")[1])
+    return cv2.imdecode(np.frombuffer(img, np.uint8), cv2.IMREAD_COLOR)
+
+
+def binary_path(body: bytes):
+    return cv2.imdecode(np.frombuffer(body, np.uint8), cv2.IMREAD_COLOR)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    args = parser.parse_args()
+
+    jpegs = [jpeg_bytes(f) for f in synthetic_frames(args.frames, args.width, args.height)]
+    bodies = {
+        "json": [json.dumps({"image": "data:image/jpeg;base64," + base64.b64encode(j).decode()}).encode()
+                 for j in jpegs],
+        "binary": jpegs,
+    }
+    decoders = {"json": json_path, "binary": binary_path}
+
+    base = None
+    for name, payloads in bodies.items():
+        decode = decoders[name]
+        for body in payloads[:10]:
+            decode(body)
+        cpu0 = time.process_time()
+        for body in payloads:
+            decode(body)
+        cpu = (time.process_time() - cpu0) / len(payloads)
+        size = sum(len(b) for b in payloads) / len(payloads)
+        base = base or (cpu, size)
+        print(f"{name:>6}: {cpu * 1e3:6.3f} ms CPU/frame ({cpu / base[0]:.2f}x) | "
+              f"{size / 1024:7.1f} KiB/frame ({size / base[1]:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+/diagnosis opening question with and without the LLM response cache.
+
+Every fresh assessment sends the same seed conversation, so after the first
+request the cache answers it without calling the provider. The stub LLM
+(benchmarks/stub_llm.py) stands in for Together with --llm-latency seconds
+per call. Rows:
+    uncached      LLM_CACHE_ROUTES="" (every request calls the API)
+    cached        memory tier warm
+    restarted     new process-level cache on the same SQLite file
+                  (memory tier empty, served from disk)
+
+    python -m benchmarks.bench_llm_cache [--requests 50] [--llm-latency 0.4]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks import stub_llm
+
+
+def run(client, n: int):
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        resp = client.post("/diagnosis", json={"conversation": []})
+        assert resp.status_code == 200, resp.get_data(as_text=True)
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--llm-latency", type=float, default=0.4)
+    args = parser.parse_args()
+
+    stub, url = stub_llm.start(latency=args.llm_latency)
+    tmp = tempfile.mkdtemp()
+    os.environ.update({"TOGETHER_API_KEY": os.getenv("TOGETHER_API_KEY", "bench"), "TOGETHER_BASE_URL": url,
+                       "LLM_CACHE_DB": os.path.join(tmp, "llm_cache.db"), "RATE_LIMITS": ""})
+    import llm_cache
+    import llm_chatbot
+    client = llm_chatbot.app.test_client()
+
+    rows = []
+    os.environ["LLM_CACHE_ROUTES"] = ""
+    before = stub.config.requests
+    rows.append(("uncached", run(client, args.requests), stub.config.requests - before))
+
+    os.environ["LLM_CACHE_ROUTES"] = "diagnosis"
+    client.post("/diagnosis", json={"conversation": []})  # first request fills the cache
+    before = stub.config.requests
+    rows.append(("cached", run(client, args.requests), stub.config.requests - before))
+
+    llm_cache._cache = None  # as after a restart: memory tier empty, SQLite file kept
+    before = stub.config.requests
+    client.post("/diagnosis", json={"conversation": []})
+    rows.append(("restarted", run(client, args.requests), stub.config.requests - before))
+
+    for name, (p50, p99), calls in rows:
+        print(f"{name:>9}: p50 {p50 * 1000:8.2f} ms | p99 {p99 * 1000:8.2f} ms | API calls {calls}")
+    print("cache stats:", llm_cache.get_cache().stats())
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Mood summary cost as a session's history grows: incremental aggregates
+(mood_analytics.MoodAnalytics) versus recomputing the same windows by
+rescanning a list of every (timestamp, mood) event.
+
+    python -m benchmarks.bench_mood_analytics [--events 100,1000,10000] [--queries 200]
+"""
+import argparse
+import random
+import time
+
+from mood_analytics import MOODS, MoodAnalytics
+
+
+def rescan_summary(events: list, now: float, window_events: int = 20, window_seconds: float = 1800,
+                   half_life: float = 600) -> dict:
+    last = {m: 0 for m in MOODS}
+    for _, mood in events[-window_events:]:
+        last[mood] += 1
+    recent = {m: 0 for m in MOODS}
+    decayed = {m: 0.0 for m in MOODS}
+    for ts, mood in events:
+        if ts >= now - window_seconds:
+            recent[mood] += 1
+        decayed[mood] += 0.5 ** ((now - ts) / half_life)
+    return {"last": last, "recent": recent, "decayed": decayed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", default="100,1000,10000")
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    for n in (int(x) for x in args.events.split(",")):
+        analytics, events = MoodAnalytics(), []
+        t = time.time() - n * 30
+        t0 = time.perf_counter()
+        for _ in range(n):
+            t += rng.expovariate(1 / 30)
+            mood = rng.choice(MOODS)
+            analytics.record_text("bench", mood, t)
+            events.append((t, mood))
+        per_event = (time.perf_counter() - t0) / n
+
+        t0 = time.perf_counter()
+        for _ in range(args.queries):
+            analytics.summary("bench", now=t)
+        incremental = (time.perf_counter() - t0) / args.queries
+        t0 = time.perf_counter()
+        for _ in range(args.queries):
+            rescan_summary(events, t)
+        rescan = (time.perf_counter() - t0) / args.queries
+        print(f"{n:>7} events: record {per_event * 1e6:6.2f} µs/event | summary {incremental * 1e6:8.1f} µs "
+              f"incremental vs {rescan * 1e6:9.1f} µs rescan")
+
+
+if __name__ == "__main__":
+    main()
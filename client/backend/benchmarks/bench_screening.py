@@ -0,0 +1,95 @@
+"""
+API calls and time per assessment: the LLM-driven /diagnosis flow (one
+Together round trip per question) versus the local screening engine
+(screening.py: questions and scoring served locally, LLM only for free-text
+answers and the final summary).
+
+Both run the full GAD-7 + PHQ-9 (16 questions) against the stub LLM
+(benchmarks/stub_llm.py) with --latency seconds per call and the response
+cache disabled. --free-text is the share of answers typed as prose instead
+of picking an option.
+
+    python -m benchmarks.bench_screening [--latency 0.4] [--free-text 0.2] [--runs 3]
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from benchmarks import stub_llm
+from benchmarks.bench_diagnosis_payload import QUESTION
+
+FINAL = "Final Diagnosis: moderate anxiety and mild depression. This is a screening, not a clinical diagnosis."
+# Cycled so every short form scores >= 3 and the full instruments are asked.
+ANSWERS = ["B) Several days", "C) More than half the days", "D) Nearly every day"]
+FREE_TEXT = "honestly it happens most days lately"
+
+
+def post(client, payload):
+    resp = client.post("/diagnosis", data=json.dumps(payload), content_type="application/json")
+    return resp.get_json()
+
+
+def llm_assessment(client, stub, questions: int, free_every: int):
+    stub.config.reply = QUESTION
+    data = post(client, {"engine": "llm"})
+    for i in range(questions):
+        if i == questions - 1:
+            stub.config.reply = FINAL
+        answer = FREE_TEXT if free_every and i % free_every == free_every - 1 else ANSWERS[i % 3]
+        data = post(client, {"session_id": data["session_id"], "answer": answer})
+    assert data["done"], data
+    return data
+
+
+def screening_assessment(client, stub, questions: int, free_every: int):
+    data = post(client, {"engine": "screening"})
+    for i in range(questions):
+        free = free_every and i % free_every == free_every - 1
+        stub.config.reply = "C" if free else FINAL
+        answer = FREE_TEXT if free else ANSWERS[i % 3]
+        data = post(client, {"session_id": data["session_id"], "answer": answer})
+    assert data["done"], data
+    return data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.4, help="stub LLM seconds per call")
+    parser.add_argument("--free-text", type=float, default=0.2, help="share of answers given as prose")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    stub, url = stub_llm.start(latency=args.latency)
+    tmp = tempfile.mkdtemp()
+    os.environ.update({"TOGETHER_API_KEY": os.getenv("TOGETHER_API_KEY", "bench"), "TOGETHER_BASE_URL": url,
+                       "LLM_CACHE_ROUTES": "", "LLM_CACHE_DB": "",
+                       "DIAGNOSIS_DB": os.path.join(tmp, "sessions.db"),
+                       "DIAGNOSIS_RESULTS_DB": os.path.join(tmp, "diagnoses.db"), "RATE_LIMITS": ""})
+    import llm_chatbot
+    import screening
+    client = llm_chatbot.app.test_client()
+    questions = len(screening.get_graph(llm_chatbot.SCREENING_INSTRUMENTS).nodes)
+    free_every = round(1 / args.free_text) if args.free_text > 0 else 0
+
+    results = {}
+    for name, run in (("llm", llm_assessment), ("screening", screening_assessment)):
+        times, calls = [], []
+        for _ in range(args.runs):
+            before = stub.config.requests
+            t0 = time.perf_counter()
+            run(client, stub, questions, free_every)
+            times.append(time.perf_counter() - t0)
+            calls.append(stub.config.requests - before)
+        results[name] = (min(times), calls[0])
+        print(f"{name:>10}: {questions} questions | {calls[0]:3d} LLM calls | {min(times) * 1000:8.1f} ms per assessment "
+              f"| {min(times) / (questions + 1) * 1000:7.1f} ms per turn")
+    (llm_time, llm_calls), (local_time, local_calls) = results["llm"], results["screening"]
+    print(f"  saved: {1 - local_calls / llm_calls:.0%} of LLM calls, {1 - local_time / llm_time:.0%} of time "
+          f"({args.latency * 1000:.0f} ms stub latency, {args.free_text:.0%} free-text answers)")
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+/speak latency: the old temp-file path versus in-memory and streamed audio.
+
+Reports time to the first audio byte and to the last byte for
+    legacy   synthesize to a NamedTemporaryFile, send_file it, delete it
+    memory   TTSService.speak() bytes served straight from memory
+    stream   /speak?stream=1, WAV sent sentence by sentence
+Caching is disabled so every request really synthesizes.
+
+By default pyttsx3 is replaced with a fake engine that takes --ms-per-word
+to write a silent 16 kHz WAV, so the benchmark runs without a speech driver;
+pass --real-engine to use the installed one.
+
+    python -m benchmarks.bench_speak [--requests 20] [--ms-per-word 15] [--real-engine]
+"""
+import argparse
+import os
+import tempfile
+import time
+import wave
+
+TEXT = ("I'm really sorry you're feeling this way, and I'm glad you told me. "
+        "You deserve immediate, real support. If you can, tell a trusted person nearby how you're feeling. "
+        "I'm here to listen, but a trained professional can offer immediate help.")
+
+
+class FakeEngine:
+    """
+    Minimal pyttsx3.Engine stand-in: sleeps, then writes silence.
+    """
+    ms_per_word = 15.0
+
+    def __init__(self, *args, **kwargs):
+        self._job = None
+
+    def getProperty(self, name):
+        return []
+
+    def setProperty(self, name, value):
+        pass
+
+    def save_to_file(self, text, path):
+        self._job = (text, path)
+
+    def runAndWait(self):
+        text, path = self._job
+        words = len(text.split())
+        time.sleep(words * self.ms_per_word / 1000)
+        with wave.open(path, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(16000)
+            w.writeframes(b"\0\0" * int(16000 * 0.3 * words))
+
+
+def timed(fetch):
+    """
+    (seconds to first chunk, seconds to last chunk, bytes) for one request.
+    """
+    t0 = time.perf_counter()
+    first, size = None, 0
+    for chunk in fetch():
+        if chunk and first is None:
+            first = time.perf_counter() - t0
+        size += len(chunk)
+    return first, time.perf_counter() - t0, size
+
+
+def summarize(name, samples):
+    firsts = sorted(s[0] for s in samples)
+    totals = sorted(s[1] for s in samples)
+    mid = len(samples) // 2
+    print(f"{name:>7}: first byte p50 {firsts[mid] * 1000:7.1f} ms | total p50 {totals[mid] * 1000:7.1f} ms"
+          f" | {samples[0][2]} bytes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--ms-per-word", type=float, default=15.0)
+    parser.add_argument("--real-engine", action="store_true")
+    args = parser.parse_args()
+
+    import pyttsx3
+    if not args.real_engine:
+        FakeEngine.ms_per_word = args.ms_per_word
+        pyttsx3.Engine = FakeEngine
+        pyttsx3.init = lambda *a, **k: FakeEngine()
+
+    os.environ.update({"MISTRAL_API_KEY": os.getenv("MISTRAL_API_KEY", "bench"), "SESSION_DB": "",
+                       "TTS_PRERENDER": "0", "TTS_CACHE_MB": "0", "TTS_CACHE_DIR": "", "RATE_LIMITS": ""})
+    import app as calmana
+    from flask import after_this_request, send_file
+
+    # The pre-change handler, verbatim apart from the route name.
+    @calmana.app.route("/speak_legacy", methods=["POST"])
+    def speak_legacy():
+        body = calmana.request.get_json(force=True) or {}
+        tmpfile = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
+        tmp_path = tmpfile.name
+        tmpfile.close()
+        engine = pyttsx3.init()
+        engine.save_to_file(body["text"], tmp_path)
+        engine.runAndWait()
+
+        @after_this_request
+        def cleanup(response):
+            try: os.remove(tmp_path)
+            except Exception: pass
+            return response
+
+        return send_file(tmp_path, mimetype="audio/wav", as_attachment=False, conditional=True)
+
+    client = calmana.app.test_client()
+    routes = {
+        "legacy": lambda: client.post("/speak_legacy", json={"text": TEXT}, buffered=False).response,
+        "memory": lambda: client.post("/speak", json={"text": TEXT}, buffered=False).response,
+        "stream": lambda: client.post("/speak", json={"text": TEXT, "stream": True}, buffered=False).response,
+    }
+    for name, fetch in routes.items():
+        timed(fetch)  # warm-up
+        summarize(name, [timed(fetch) for _ in range(args.requests)])
+
+
+if __name__ == "__main__":
+    main()
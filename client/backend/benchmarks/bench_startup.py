@@ -0,0 +1,182 @@
+"""
+fg.py startup time and per-worker memory for each MODEL_LOAD mode.
+
+Starts --workers worker processes the way a pre-forking server would and
+reports, per mode:
+    serving   seconds from process start until `import fg` returns (routes,
+              /livez included, can answer)
+    ready     seconds until the first inference has completed
+    pss       proportional set size per worker after that inference (shared
+              pages are split between the processes sharing them), and the
+              total across workers plus the prefork master
+    private   memory only that worker owns
+
+import-time is the previous behaviour (model loaded and warmed up during
+`import fg`), reproduced with MODEL_LOAD=lazy plus an explicit load.
+
+By default DeepFace is replaced with a fake module that sleeps --import-s on
+import (TensorFlow), allocates --weights-mb of weights in --load-s, and
+--runtime-mb of per-process state on first inference; pass --real-model to
+use the installed DeepFace. Linux only (reads /proc/self/smaps_rollup).
+
+    python -m benchmarks.bench_startup [--workers 4] [--weights-mb 300] [--real-model]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+FAKE_DEEPFACE = '''
+import os, time
+import numpy as np
+
+time.sleep(float(os.environ["FAKE_IMPORT_S"]))
+_weights = _runtime = None
+
+
+def _build():
+    global _weights
+    if _weights is None:
+        time.sleep(float(os.environ["FAKE_LOAD_S"]))
+        _weights = np.ones(int(os.environ["FAKE_WEIGHTS_MB"]) * 2 ** 17)
+
+
+class DeepFace:
+    @staticmethod
+    def build_model(task=None, model_name=None):
+        _build()
+
+    @staticmethod
+    def analyze(img, **kwargs):
+        global _runtime
+        _build()
+        if _runtime is None:
+            _runtime = np.ones(int(os.environ["FAKE_RUNTIME_MB"]) * 2 ** 17)
+        float(_weights[::512].sum())  # read every page, as inference would
+        time.sleep(float(os.environ.get("FAKE_INFER_MS", "0")) / 1000)
+        n = len(img) if getattr(img, "ndim", 3) == 4 else 1
+        return [{"dominant_emotion": "neutral", "emotion": {"neutral": 90.0}} for _ in range(n)]
+'''
+
+MODES = ["import-time", "lazy", "background", "prefork"]
+
+
+def memory() -> dict:
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {"rss": fields.get("Rss", 0.0), "pss": fields.get("Pss", 0.0),
+            "private": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0)}
+
+
+def first_inference(fg) -> float:
+    import numpy as np
+    from vision import analyze_batch
+    analyze_batch([np.zeros((100, 100, 3), dtype=np.uint8)])
+    return time.time()
+
+
+def report(**values):
+    print(json.dumps(values), flush=True)
+
+
+def child(mode: str, workers: int):
+    """
+    Runs in a fresh interpreter; BENCH_T0 is the time the parent spawned it.
+    """
+    t0 = float(os.environ["BENCH_T0"])
+    import fg
+    serving = time.time()
+    if mode == "import-time":
+        fg.MODELS.load()
+        serving = time.time()
+
+    if mode != "prefork":
+        ready = first_inference(fg)
+        report(serving=serving - t0, ready=ready - t0, **memory())
+        return
+
+    # Workers send their numbers to the master and stay alive until it has
+    # measured itself, so every PSS figure reflects the same sharing.
+    sys.stdout.flush()
+    results_r, results_w = os.pipe()
+    release_r, release_w = os.pipe()
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(release_w)
+            ready = first_inference(fg)
+            line = json.dumps(dict(serving=serving - t0, ready=ready - t0, **memory())) + "\n"
+            os.write(results_w, line.encode())
+            os.read(release_r, 1)
+            os._exit(0)
+        pids.append(pid)
+    os.close(results_w)
+    with os.fdopen(results_r) as results:
+        for _ in range(workers):
+            print(results.readline(), end="", flush=True)
+    report(master=True, **memory())
+    os.close(release_w)
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+
+def run_mode(mode: str, args, env) -> list:
+    procs = []
+    env = dict(env, MODEL_LOAD="lazy" if mode == "import-time" else mode, BENCH_T0=str(time.time()))
+    cmd = [sys.executable, "-m", "benchmarks.bench_startup", "--child", mode, "--workers", str(args.workers)]
+    for _ in range(1 if mode == "prefork" else args.workers):
+        procs.append(subprocess.Popen(cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True))
+    rows = []
+    for p in procs:
+        out, _ = p.communicate()
+        rows += [json.loads(line) for line in out.splitlines() if line.startswith("{")]
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--real-model", action="store_true")
+    parser.add_argument("--import-s", type=float, default=1.5)
+    parser.add_argument("--load-s", type=float, default=1.0)
+    parser.add_argument("--weights-mb", type=int, default=300)
+    parser.add_argument("--runtime-mb", type=int, default=40)
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        return child(args.child, args.workers)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, EMOTION_DB=os.path.join(tmp, "emotions.db"),
+                   FAKE_IMPORT_S=str(args.import_s), FAKE_LOAD_S=str(args.load_s),
+                   FAKE_WEIGHTS_MB=str(args.weights_mb), FAKE_RUNTIME_MB=str(args.runtime_mb))
+        if not args.real_model:
+            with open(os.path.join(tmp, "deepface.py"), "w") as f:
+                f.write(FAKE_DEEPFACE)
+            env["PYTHONPATH"] = os.pathsep.join([tmp, os.getcwd(), env.get("PYTHONPATH", "")])
+
+        for mode in args.modes:
+            rows = run_mode(mode, args, env)
+            workers = [r for r in rows if not r.get("master")]
+            if not workers:
+                print(f"{mode:>11}: no workers reported (is DeepFace importable?)")
+                continue
+            total = sum(r["pss"] for r in rows)
+            avg = lambda key: sum(r[key] for r in workers) / len(workers)
+            print(f"{mode:>11}: serving {avg('serving'):5.2f} s | ready {avg('ready'):5.2f} s | "
+                  f"pss/worker {avg('pss'):6.0f} MiB | private/worker {avg('private'):6.0f} MiB | "
+                  f"total pss {total:6.0f} MiB ({len(workers)} workers)")
+
+
+if __name__ == "__main__":
+    main()
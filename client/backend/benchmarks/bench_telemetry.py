@@ -0,0 +1,66 @@
+"""
+Cost of the telemetry layer (telemetry.py).
+
+    span         one `with span(...)` block (histogram + request breakdown)
+    request      a trivial Flask route with five spans, with and without
+                 init_app (request id, Server-Timing, route histogram)
+
+    python -m benchmarks.bench_telemetry [--spans 200000] [--requests 2000] [--rounds 5]
+"""
+import argparse
+import time
+
+from flask import Flask, jsonify
+
+import telemetry
+
+
+def make_app(instrumented: bool):
+    app = Flask(f"bench_{instrumented}")
+    if instrumented:
+        telemetry.init_app(app, "bench")
+
+    @app.route("/work", methods=["POST"])
+    def work():
+        for stage in ("crisis", "emotion", "session", "build_messages", "llm"):
+            with telemetry.span(stage):
+                pass
+        return jsonify({"ok": True})
+
+    return app
+
+
+def time_requests(client, n: int, enabled: bool) -> float:
+    telemetry.ENABLED = enabled
+    t0 = time.perf_counter()
+    for _ in range(n):
+        client.post("/work")
+    return (time.perf_counter() - t0) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spans", type=int, default=200000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    for _ in range(args.spans):
+        with telemetry.span("bench"):
+            pass
+    per_span = (time.perf_counter() - t0) / args.spans
+    print(f"    span: {per_span * 1e6:6.2f} µs each")
+
+    # Interleaved rounds, best of each, to keep machine noise out of the difference.
+    bare_client, traced_client = make_app(False).test_client(), make_app(True).test_client()
+    bare = traced = float("inf")
+    for _ in range(args.rounds):
+        bare = min(bare, time_requests(bare_client, args.requests, False))
+        traced = min(traced, time_requests(traced_client, args.requests, True))
+    print(f" request: {bare * 1e6:7.1f} µs bare | {traced * 1e6:7.1f} µs instrumented "
+          f"| +{(traced - bare) * 1e6:.1f} µs per request (test client, in-process)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Synthetic webcam frames for the fg.py benchmarks (no camera or dataset needed).
+
+Each frame is a smooth background with a bright "face" ellipse that drifts a
+little from frame to frame, plus sensor-like noise, so consecutive frames are
+similar but never identical, as with a real camera.
+"""
+import base64
+
+import cv2
+import numpy as np
+
+
+def synthetic_frames(n: int, width: int = 640, height: int = 480, seed: int = 3, motion: float = 2.0):
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width]
+    background = ((xx / width) * 90 + (yy / height) * 60 + 40).astype(np.uint8)
+    cx, cy = width / 2, height / 2
+    for _ in range(n):
+        cx = float(np.clip(cx + rng.normal(0, motion), width * 0.3, width * 0.7))
+        cy = float(np.clip(cy + rng.normal(0, motion), height * 0.3, height * 0.7))
+        frame = cv2.cvtColor(background, cv2.COLOR_GRAY2BGR)
+        cv2.ellipse(frame, (int(cx), int(cy)), (width // 8, height // 5), 0, 0, 360, (170, 190, 225), -1)
+        noise = rng.integers(-6, 7, frame.shape, dtype=np.int16)
+        yield np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+
+def jpeg_bytes(frame, quality: int = 80) -> bytes:
+    return cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+def data_url(frame, quality: int = 80) -> str:
+    return "data:image/jpeg;base64," + base64.b64encode(jpeg_bytes(frame, quality)).decode()
@@ -0,0 +1,132 @@
+"""
+Concurrent-conversation load test for app.py's /chat.
+
+Starts the stub LLM with a fixed latency, launches `serve.py app:app` in each
+requested mode, then drives N simultaneous conversations of K turns and
+reports throughput and latency percentiles.
+
+    python -m benchmarks.load_chat --conversations 100 --turns 3 --llm-latency 1.0
+    python -m benchmarks.load_chat --modes async --conversations 500
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks import stub_llm
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.1)
+    raise RuntimeError(f"server at {url} did not come up")
+
+
+def start_server(target: str, mode: str, port: int, env: dict, threads: int) -> subprocess.Popen:
+    cmd = [sys.executable, "serve.py", target, "--host", "127.0.0.1", "--port", str(port),
+           "--mode", mode, "--threads", str(threads)]
+    return subprocess.Popen(cmd, cwd=BACKEND_DIR, env={**os.environ, **env},
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def percentile(samples: list, q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))] if samples else 0.0
+
+
+def run_conversations(base_url: str, conversations: int, turns: int, timeout: float) -> dict:
+    latencies, errors = [], []
+    lock = threading.Lock()
+    start_gate = threading.Event()
+
+    def conversation(i: int):
+        session = requests.Session()
+        start_gate.wait()
+        for turn in range(turns):
+            t0 = time.perf_counter()
+            try:
+                resp = session.post(f"{base_url}/chat", timeout=timeout,
+                                    json={"message": f"turn {turn}: I feel a bit tense today", "session_id": f"load-{i}"})
+                resp.raise_for_status()
+            except requests.RequestException as e:
+                with lock:
+                    errors.append(str(e))
+                return
+            with lock:
+                latencies.append(time.perf_counter() - t0)
+
+    workers = [threading.Thread(target=conversation, args=(i,), daemon=True) for i in range(conversations)]
+    for w in workers:
+        w.start()
+    t0 = time.perf_counter()
+    start_gate.set()
+    for w in workers:
+        w.join()
+    wall = time.perf_counter() - t0
+    return {
+        "turns_ok": len(latencies),
+        "errors": len(errors),
+        "wall_s": round(wall, 3),
+        "turns_per_s": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_s": round(percentile(latencies, 0.50), 3),
+        "p99_s": round(percentile(latencies, 0.99), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default="sync,async")
+    parser.add_argument("--conversations", type=int, default=100)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--threads", type=int, default=8, help="worker threads for sync mode")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    stub, stub_url = stub_llm.start(latency=args.llm_latency)
+    results = []
+    for mode in args.modes.split(","):
+        port = free_port()
+        with tempfile.TemporaryDirectory() as tmp:
+            env = {"MISTRAL_API_KEY": "stub", "MISTRAL_BASE_URL": stub_url,
+                   "SESSION_DB": os.path.join(tmp, "sessions.db"), "RATE_LIMITS": ""}
+            proc = start_server("app:app", mode, port, env, args.threads)
+            try:
+                wait_for(f"http://127.0.0.1:{port}/")
+                result = run_conversations(f"http://127.0.0.1:{port}", args.conversations, args.turns, args.timeout)
+            finally:
+                proc.terminate()
+                proc.wait()
+        result.update(mode=mode, conversations=args.conversations, llm_latency_s=args.llm_latency)
+        results.append(result)
+        if not args.json:
+            print(f"{mode:>5}: {result['turns_ok']} turns ({result['errors']} errors) in {result['wall_s']}s "
+                  f"-> {result['turns_per_s']} turns/s, p50 {result['p50_s']}s, p99 {result['p99_s']}s")
+    stub.shutdown()
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
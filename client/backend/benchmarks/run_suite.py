@@ -0,0 +1,314 @@
+"""
+Scenario load tests for all three backends, with JSON results that can be
+compared between commits. Runs offline on a CPU-only box.
+
+Each service is started with serve.py in a subprocess, against the stub LLM
+(benchmarks/stub_llm.py) and, unless --real-model / --real-engine is given,
+fake DeepFace and pyttsx3 modules placed first on PYTHONPATH. --concurrency
+clients then send requests back to back for --duration seconds per scenario:
+    chat                 app.py        POST /chat
+    chat_stream          app.py        POST /chat/stream (ttfb = first SSE byte)
+    speak                app.py        POST /speak, a different sentence each time
+    diagnosis            llm_chatbot   POST /diagnosis, session mode, LLM engine
+    diagnosis_screening  llm_chatbot   POST /diagnosis, session mode, screening engine
+    analyze_frame        fg.py         POST /analyze_frame, raw JPEG (benchmarks/frames.py)
+
+    python -m benchmarks.run_suite --out results.json
+    python -m benchmarks.run_suite --scenarios chat,analyze_frame --compare baseline.json
+
+--compare prints the change against an earlier results file and exits with
+status 1 when any scenario's p95 grew by more than --tolerance (or its
+throughput fell by as much).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks import stub_llm
+from benchmarks.bench_startup import FAKE_DEEPFACE
+from benchmarks.frames import jpeg_bytes, synthetic_frames
+from benchmarks.load_chat import BACKEND_DIR, free_port, percentile, start_server
+
+FAKE_PYTTSX3 = '''
+import os
+from benchmarks.bench_speak import FakeEngine as Engine
+
+Engine.ms_per_word = float(os.environ.get("FAKE_MS_PER_WORD", "15"))
+
+
+def init(*args, **kwargs):
+    return Engine()
+'''
+
+SENTENCES = ["I have been feeling a little overwhelmed at work this week.",
+             "Sleep has been hard and I keep waking up early.",
+             "Talking to my sister helped, but the worry comes back at night.",
+             "I'm not sure whether this is stress or something more."]
+ANSWERS = ["B) Several days", "C) More than half the days", "D) Nearly every day", "A) Not at all"]
+
+
+# ---------------------------------------------------------------------------
+# Scenario clients: fn(session, base_url, client index, request number, state)
+# makes one request and returns its time to first byte, or None.
+# ---------------------------------------------------------------------------
+def chat(session, base, i, n, state):
+    resp = session.post(f"{base}/chat", json={"message": SENTENCES[n % 4], "session_id": f"suite-{i}"})
+    resp.raise_for_status()
+    return None
+
+
+def chat_stream(session, base, i, n, state):
+    t0 = time.perf_counter()
+    with session.post(f"{base}/chat/stream", stream=True,
+                      json={"message": SENTENCES[n % 4], "session_id": f"suite-stream-{i}"}) as resp:
+        resp.raise_for_status()
+        # One byte first: larger reads would wait for more of the body. Going
+        # through iter_content keeps requests' chunked decoding (async mode).
+        next(resp.iter_content(chunk_size=1))
+        ttfb = time.perf_counter() - t0
+        for _ in resp.iter_content(chunk_size=8192):
+            pass
+    return ttfb
+
+
+def speak(session, base, i, n, state):
+    resp = session.post(f"{base}/speak", json={"text": f"{SENTENCES[n % 4]} Client {i}, request {n}."})
+    resp.raise_for_status()
+    return None
+
+
+def diagnosis_turn(engine):
+    def run(session, base, i, n, state):
+        payload = {"session_id": state["session_id"], "answer": ANSWERS[n % 4]} if state.get("session_id") \
+            else {"engine": engine}
+        resp = session.post(f"{base}/diagnosis", json=payload)
+        if resp.status_code == 409:  # finished; start the next assessment
+            state.pop("session_id")
+            return run(session, base, i, n, state)
+        resp.raise_for_status()
+        data = resp.json()
+        state["session_id"] = None if data.get("done") else data["session_id"]
+        return None
+    return run
+
+
+def analyze_frame(session, base, i, n, state):
+    if "frames" not in state:
+        state["frames"] = [jpeg_bytes(f) for f in synthetic_frames(20, seed=i)]
+    frames = state["frames"]
+    resp = session.post(f"{base}/analyze_frame", data=frames[n % len(frames)],
+                        headers={"Content-Type": "image/jpeg", "X-Session-ID": f"suite-{i}"})
+    resp.raise_for_status()
+    return None
+
+
+SCENARIOS = {
+    # name: (target, readiness path, client function)
+    "chat": ("app:app", "/", chat),
+    "chat_stream": ("app:app", "/", chat_stream),
+    "speak": ("app:app", "/", speak),
+    "diagnosis": ("llm_chatbot:app", "/metrics", diagnosis_turn("llm")),
+    "diagnosis_screening": ("llm_chatbot:app", "/metrics", diagnosis_turn("screening")),
+    "analyze_frame": ("fg:app", "/readyz", analyze_frame),
+}
+
+
+def wait_ready(url: str, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"server at {url} did not become ready")
+
+
+def drive(fn, base: str, concurrency: int, duration: float, warmup: float) -> dict:
+    """
+    Closed loop: `concurrency` clients call fn back to back; only requests
+    started between warm-up and warm-up + duration are counted.
+    """
+    latencies, ttfbs, errors, sent = [], [], [], []
+    lock = threading.Lock()
+    start = time.perf_counter()
+    measure_from, stop_at = start + warmup, start + warmup + duration
+
+    def client(i: int):
+        session, state, n = requests.Session(), {}, 0
+        while True:
+            t0 = time.perf_counter()
+            if t0 >= stop_at:
+                with lock:
+                    sent.append(n)
+                return
+            try:
+                ttfb = fn(session, base, i, n, state)
+                error = None
+            except Exception as e:
+                ttfb, error = None, f"{type(e).__name__}: {e}"
+            elapsed = time.perf_counter() - t0
+            n += 1
+            if t0 < measure_from:
+                continue
+            with lock:
+                if error:
+                    errors.append(error)
+                else:
+                    latencies.append(elapsed)
+                    if ttfb is not None:
+                        ttfbs.append(ttfb)
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = max(time.perf_counter(), stop_at) - measure_from
+    ms = lambda samples, q: round(percentile(samples, q) * 1000, 2)
+    result = {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "rps": round(len(latencies) / wall, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": ms(latencies, 0.50),
+        "p95_ms": ms(latencies, 0.95),
+        "p99_ms": ms(latencies, 0.99),
+        "sent": sum(sent),
+    }
+    if ttfbs:
+        result.update(ttfb_p50_ms=ms(ttfbs, 0.50), ttfb_p95_ms=ms(ttfbs, 0.95))
+    if errors:
+        result["first_error"] = errors[0][:300]
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results: dict, baseline_path: str, tolerance: float) -> bool:
+    """
+    Print the change per scenario; False if any regressed beyond tolerance.
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\ncompared with {baseline_path} (commit {baseline['meta'].get('commit')}):", file=sys.stderr)
+    ok = True
+    for name, now in results["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if not before or not before["requests"] or not now["requests"]:
+            print(f"{name:>20}: no baseline", file=sys.stderr)
+            continue
+        p95 = now["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        rps = now["rps"] / before["rps"] - 1 if before["rps"] else 0.0
+        regressed = p95 > tolerance or rps < -tolerance
+        ok = ok and not regressed
+        print(f"{name:>20}: p95 {before['p95_ms']:8.1f} -> {now['p95_ms']:8.1f} ms ({p95:+.0%}) | "
+              f"rps {before['rps']:7.1f} -> {now['rps']:7.1f} ({rps:+.0%}){'  REGRESSION' if regressed else ''}",
+              file=sys.stderr)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before each scenario")
+    parser.add_argument("--mode", choices=["sync", "async"], default="sync")
+    parser.add_argument("--threads", type=int, default=16, help="worker threads in sync mode")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--llm-jitter", type=float, default=0.05)
+    parser.add_argument("--token-delay", type=float, default=0.01, help="seconds between streamed tokens")
+    parser.add_argument("--infer-ms", type=float, default=30.0, help="fake DeepFace inference time")
+    parser.add_argument("--ms-per-word", type=float, default=15.0, help="fake TTS synthesis time")
+    parser.add_argument("--real-model", action="store_true", help="use the installed DeepFace")
+    parser.add_argument("--real-engine", action="store_true", help="use the installed pyttsx3")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--out", help="write results JSON here (default: stdout)")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+
+    stub, stub_url = stub_llm.start(latency=args.llm_latency, jitter=args.llm_jitter,
+                                    token_delay=args.token_delay, seed=args.seed)
+    results = {
+        "meta": {"commit": git_commit(), "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                 "python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count(), "config": vars(args)},
+        "scenarios": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {"MISTRAL_API_KEY": "stub", "TOGETHER_API_KEY": "stub",
+               "MISTRAL_BASE_URL": stub_url, "TOGETHER_BASE_URL": stub_url,
+               "SESSION_DB": os.path.join(tmp, "sessions.db"), "DIAGNOSIS_DB": os.path.join(tmp, "diagnosis.db"),
+               "DIAGNOSIS_RESULTS_DB": os.path.join(tmp, "diagnoses.db"), "EMOTION_DB": os.path.join(tmp, "emotions.db"),
+               "LLM_CACHE_DB": "", "LLM_CACHE_ROUTES": "", "TTS_CACHE_DIR": os.path.join(tmp, "tts_cache"),
+               "TTS_PRERENDER": "0", "TELEMETRY_SLOW_MS": "60000",
+               "RATE_LIMITS": "",  # closed-loop clients reuse one session; measure capacity, not quotas
+               "FAKE_IMPORT_S": "0", "FAKE_LOAD_S": "0", "FAKE_WEIGHTS_MB": "1", "FAKE_RUNTIME_MB": "1",
+               "FAKE_INFER_MS": str(args.infer_ms), "FAKE_MS_PER_WORD": str(args.ms_per_word)}
+        fakes = os.path.join(tmp, "fakes")
+        os.makedirs(fakes)
+        for module, source, real in (("deepface", FAKE_DEEPFACE, args.real_model),
+                                     ("pyttsx3", FAKE_PYTTSX3, args.real_engine)):
+            if not real:
+                with open(os.path.join(fakes, f"{module}.py"), "w") as f:
+                    f.write(source)
+        env["PYTHONPATH"] = os.pathsep.join([fakes, BACKEND_DIR, os.environ.get("PYTHONPATH", "")])
+
+        # One server per target, reused by its scenarios.
+        for target in dict.fromkeys(SCENARIOS[n][0] for n in names):
+            port = free_port()
+            proc = start_server(target, args.mode, port, env, args.threads)
+            base = f"http://127.0.0.1:{port}"
+            try:
+                for name in (n for n in names if SCENARIOS[n][0] == target):
+                    _, ready_path, fn = SCENARIOS[name]
+                    wait_ready(base + ready_path)
+                    calls_before = stub.config.requests
+                    result = drive(fn, base, args.concurrency, args.duration, args.warmup)
+                    # Per request sent, warm-up included, since calls are not tied to requests.
+                    sent = result.pop("sent")
+                    result["llm_calls_per_request"] = round((stub.config.requests - calls_before) / sent, 3) \
+                        if sent else 0.0
+                    results["scenarios"][name] = result
+                    ttfb = f" | ttfb p50 {result['ttfb_p50_ms']:7.1f} ms" if "ttfb_p50_ms" in result else ""
+                    print(f"{name:>20}: {result['rps']:7.1f} req/s | p50 {result['p50_ms']:7.1f} ms | "
+                          f"p95 {result['p95_ms']:7.1f} ms | p99 {result['p99_ms']:7.1f} ms | "
+                          f"{result['errors']} errors{ttfb}", file=sys.stderr)
+            finally:
+                proc.terminate()
+                proc.wait()
+    stub.shutdown()
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Local stand-in for the Mistral/Together chat-completions API.
+
+    python -m benchmarks.stub_llm --port 9100 --latency 0.2 --jitter 0.05 --fail-rate 0.1
+    MISTRAL_BASE_URL=http://127.0.0.1:9100/v1 TOGETHER_BASE_URL=http://127.0.0.1:9100/v1 python app.py
+
+Every POST to .../chat/completions answers with a canned reply after the
+configured latency; --fail-rate returns 503 for that fraction of requests.
+--capacity caps how many requests are worked on at once (the rest wait their
+turn, like a provider at its throughput limit).
+Requests with "stream": true get the reply word by word as chunked SSE, one
+chunk every --token-delay seconds after the first.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = "That sounds really hard. I'm here with you. What has been weighing on you most today?"
+
+
+class StubConfig:
+    def __init__(self, latency=0.0, jitter=0.0, fail_rate=0.0, token_delay=0.0, reply=DEFAULT_REPLY, seed=None,
+                 capacity=0):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self.reply = reply
+        self.rng = random.Random(seed)
+        self.slots = threading.Semaphore(capacity) if capacity else None
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def delay(self) -> float:
+        with self.lock:
+            return max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            return self.rng.random() < self.fail_rate
+
+
+def make_handler(config: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the real APIs
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _send_json(self, status: int, body: dict):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _write_chunk(self, data: bytes):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def _stream(self, model):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            words = config.reply.split(" ")
+            try:
+                for i, word in enumerate(words):
+                    if i:
+                        time.sleep(config.token_delay)
+                    chunk = {"model": model, "choices": [{"index": 0, "delta": {
+                        "content": word if i == 0 else " " + word}}]}
+                    self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+                self._write_chunk(b"data: [DONE]\n\n")
+                self._write_chunk(b"")
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            with config.lock:
+                config.requests += 1
+            if not self.path.endswith("/chat/completions"):
+                return self._send_json(404, {"error": "not found"})
+            if config.slots is None:
+                time.sleep(config.delay())
+            else:
+                with config.slots:
+                    time.sleep(config.delay())
+            if config.should_fail():
+                return self._send_json(503, {"error": "stub overloaded"})
+            if payload.get("stream"):
+                return self._stream(payload.get("model"))
+            self._send_json(200, {
+                "id": f"stub-{config.requests}",
+                "model": payload.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": config.reply},
+                             "finish_reason": "stop"}],
+            })
+
+    return Handler
+
+
+def start(port: int = 0, **kwargs):
+    """
+    Start a stub server on a background thread; returns (server, base_url).
+    """
+    config = StubConfig(**kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(config))
+    server.daemon_threads = True
+    server.config = config
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of random latency")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of requests answered 503")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="seconds between streamed tokens")
+    parser.add_argument("--capacity", type=int, default=0, help="requests worked on at once (0: unlimited)")
+    args = parser.parse_args()
+
+    server, url = start(args.port, latency=args.latency, jitter=args.jitter, fail_rate=args.fail_rate,
+                        token_delay=args.token_delay, capacity=args.capacity)
+    print(f"stub LLM listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
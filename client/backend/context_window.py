@@ -0,0 +1,122 @@
+"""
+Token-budgeted chat context for the LLM calls.
+
+Every stored message carries its own token estimate, computed once when it is
+appended, and the session keeps a running total, so fitting the history to
+the budget never re-measures old turns. When the history grows past the
+budget, the oldest messages are folded into a rolling summary (kept in the
+session next to the history) instead of being dropped.
+
+The persona goes first and never changes, and the summary follows it as a
+separate system message, so the request prefix stays byte-identical across
+turns and provider-side prompt caching can reuse it.
+"""
+import re
+
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+ROLE_LABELS = {"user": "User", "assistant": "Companion"}
+
+MESSAGE_OVERHEAD = 4  # role and delimiters, per message
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count: about 4 characters per token for English text with
+    BPE tokenizers. Good enough for budgeting; no tokenizer dependency.
+    """
+    return (len(text) + 3) // 4 + MESSAGE_OVERHEAD
+
+
+def extractive_summary(summary: str, messages: list, max_tokens: int) -> str:
+    """
+    Default summarizer: one line per folded message (its first sentence,
+    shortened), appended to the previous summary; the oldest lines go first
+    once the summary exceeds `max_tokens`. Local and deterministic, so folding
+    never adds an LLM round trip to a turn.
+    """
+    lines = summary.splitlines() if summary else []
+    for m in messages:
+        first = SENTENCE_END_RE.split(m["content"].strip(), 1)[0]
+        if len(first) > 160:
+            first = first[:157].rstrip() + "..."
+        lines.append(f"{ROLE_LABELS.get(m['role'], m['role'])}: {first}")
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ContextWindow:
+    """
+    Keeps a session's "history" within `budget` tokens (and at most
+    `max_messages` messages) by folding the oldest messages into
+    session["summary"]. Folding trims down to `low_water` of the budget so it
+    runs every few turns rather than on every one.
+
+    `summarize(summary, messages, max_tokens) -> str` can be replaced, e.g.
+    with an LLM call.
+    """
+
+    def __init__(self, budget: int = 1200, summary_budget: int = 200, max_messages: int = 32,
+                 low_water: float = 0.75, summarize=extractive_summary, cache_marker: bool = False):
+        self.budget = budget
+        self.summary_budget = summary_budget
+        self.max_messages = max_messages
+        self.low_water = low_water
+        self.summarize = summarize
+        self.cache_marker = cache_marker
+
+    def _ensure_counts(self, sess: dict):
+        # Sessions stored before token tracking have no per-message counts.
+        if "history_tokens" not in sess:
+            for m in sess["history"]:
+                m.setdefault("tokens", estimate_tokens(m["content"]))
+            sess["history_tokens"] = sum(m["tokens"] for m in sess["history"])
+            sess.setdefault("summary", "")
+
+    def add(self, sess: dict, message: dict):
+        """
+        Append a stored message ({"role", "content", ...}) and fold if needed.
+        """
+        self._ensure_counts(sess)
+        message["tokens"] = estimate_tokens(message["content"])
+        sess["history"].append(message)
+        sess["history_tokens"] += message["tokens"]
+        if sess["history_tokens"] > self.budget or len(sess["history"]) > self.max_messages:
+            self.fold(sess)
+
+    def fold(self, sess: dict):
+        """
+        Move the oldest messages into the summary until the history is back
+        under the low-water mark. The newest message always stays.
+        """
+        history = sess["history"]
+        target_tokens = int(self.budget * self.low_water)
+        target_messages = int(self.max_messages * self.low_water)
+        n, tokens = 0, sess["history_tokens"]
+        while n < len(history) - 1 and (tokens > target_tokens or len(history) - n > target_messages):
+            tokens -= history[n]["tokens"]
+            n += 1
+        # Fold whole exchanges: never leave an assistant reply without its question.
+        while n < len(history) - 1 and history[n]["role"] == "assistant":
+            tokens -= history[n]["tokens"]
+            n += 1
+        if n:
+            sess["summary"] = self.summarize(sess.get("summary", ""), history[:n], self.summary_budget)
+            sess["history"] = history[n:]
+            sess["history_tokens"] = tokens
+
+    def messages(self, sess: dict, persona: str) -> list:
+        """
+        Provider message list: persona, rolling summary (if any), history.
+        """
+        self._ensure_counts(sess)
+        system = {"role": "system", "content": persona}
+        if self.cache_marker:
+            # Honoured by gateways that support explicit prompt caching; plain
+            # OpenAI-compatible APIs may reject unknown fields, hence opt-in.
+            system["cache_control"] = {"type": "ephemeral"}
+        messages = [system]
+        if sess.get("summary"):
+            messages.append({"role": "system", "content": "Earlier in this conversation:\n" + sess["summary"]})
+        messages.extend({"role": m["role"], "content": m["content"]} for m in sess["history"])
+        return messages
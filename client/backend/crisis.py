@@ -0,0 +1,178 @@
+"""
+Crisis-pattern matching for the /chat fast path.
+
+All patterns are compiled once into a CrisisMatcher. A plain pattern such as
+r"\bkill myself\b" can only match a message that contains "kill" (or "myself")
+as a whole word, so it is indexed under that word and a message only runs the
+few regexes whose anchor word it actually contains. Patterns with no such
+word (alternations, optional parts, ...) go into one combined alternation.
+Matching cost therefore tracks message length, not the size of the list.
+
+Extra patterns can be loaded from a text file (one regex per line, '#'
+comments allowed) named by CRISIS_PATTERNS_FILE. The file is re-read when its
+mtime changes, at most once every `reload_interval` seconds.
+"""
+import os
+import re
+import threading
+import time
+
+CRISIS_PATTERNS = [
+    r"\bkill myself\b", r"\bsuicide\b", r"\bsuicidal\b", r"\bend it all\b", r"\bself[-\s]?harm\b",
+    r"\bcutting\b", r"\bI don't want to live\b", r"\bI want to die\b"
+]
+
+# Curly/modifier apostrophes and backticks are folded to "'" before matching.
+APOSTROPHES = str.maketrans({"’": "'", "‘": "'", "ʼ": "'", "′": "'", "`": "'"})
+
+TOKEN_RE = re.compile(r"\w+")
+WORD_CHAR_RE = re.compile(r"\w")
+# Escapes and anchors that guarantee a word boundary next to a literal word.
+_EDGES = {"\\b", "\\s", "\\W", "^", "$"}
+
+
+def normalize(text: str) -> str:
+    return text.translate(APOSTROPHES).lower()
+
+
+def _fold_apostrophes(pattern: str) -> str:
+    # Patterns are only apostrophe-folded; lowercasing would turn \B into \b.
+    return pattern.translate(APOSTROPHES)
+
+
+def anchor_word(pattern: str):
+    """
+    The longest literal word every match of `pattern` must contain as a whole
+    token, or None when the pattern is not a plain sequence of literals and
+    escapes.
+    """
+    items, i = [], 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == "\\" and i + 1 < len(pattern):
+            esc = pattern[i + 1]
+            items.append("\\" + esc if esc.isalnum() else esc)
+            i += 2
+            continue
+        if c in "|()[]{}?*+":
+            return None
+        items.append("<any>" if c == "." else c)
+        i += 1
+
+    best, run, start = None, [], 0
+    for j, item in enumerate(items + [None]):
+        if item is not None and len(item) == 1 and WORD_CHAR_RE.match(item):
+            if not run:
+                start = j
+            run.append(item)
+            continue
+        if run:
+            left = items[start - 1] if start else None
+            right = item
+            if _is_edge(left) and _is_edge(right) and (best is None or len(run) > len(best)):
+                best = "".join(run)
+            run = []
+    return best.lower() if best else None
+
+
+def _is_edge(item) -> bool:
+    if item is None:
+        return False
+    if item in _EDGES:
+        return True
+    return len(item) == 1 and not WORD_CHAR_RE.match(item)
+
+
+class CrisisMatcher:
+    def __init__(self, patterns, path=None, reload_interval: float = 5.0):
+        self._base = list(patterns)
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._checked = 0.0
+        self._compile(self._base + self._read_file())
+
+    # ── building ────────────────────────────────────────────────────────────
+    def _read_file(self) -> list:
+        if not self.path:
+            return []
+        try:
+            self._mtime = os.stat(self.path).st_mtime
+            with open(self.path, encoding="utf-8") as f:
+                lines = [line.strip() for line in f]
+        except OSError:
+            self._mtime = None
+            return []
+        return [line for line in lines if line and not line.startswith("#")]
+
+    def _compile(self, patterns):
+        seen, unique = set(), []
+        for pat in patterns:
+            pat = _fold_apostrophes(pat)
+            if pat not in seen:
+                seen.add(pat)
+                unique.append(pat)
+
+        anchored, rest = {}, []
+        for pat in unique:
+            word = anchor_word(pat)
+            if word:
+                anchored.setdefault(word, []).append((pat, re.compile(pat, re.IGNORECASE)))
+            else:
+                rest.append(pat)
+
+        combined = None
+        if rest:
+            combined = re.compile("|".join(f"(?P<p{i}>{p})" for i, p in enumerate(rest)), re.IGNORECASE)
+
+        # Swap in one assignment so concurrent matches see a consistent state.
+        self._state = (tuple(unique), anchored, combined, tuple(rest))
+
+    def maybe_reload(self):
+        if not self.path:
+            return
+        now = time.monotonic()
+        if now - self._checked < self.reload_interval:
+            return
+        with self._lock:
+            if now - self._checked < self.reload_interval:
+                return
+            self._checked = now
+            try:
+                mtime = os.stat(self.path).st_mtime
+            except OSError:
+                mtime = None
+            if mtime != self._mtime:
+                self._compile(self._base + self._read_file())
+
+    def extend(self, patterns):
+        with self._lock:
+            self._base.extend(patterns)
+            self._compile(self._base + self._read_file())
+
+    @property
+    def patterns(self) -> tuple:
+        return self._state[0]
+
+    # ── matching ────────────────────────────────────────────────────────────
+    def match(self, text: str):
+        """
+        The pattern that matched `text`, or None.
+        """
+        self.maybe_reload()
+        _, anchored, combined, rest = self._state
+        t = normalize(text)
+        if anchored:
+            for tok in set(TOKEN_RE.findall(t)):
+                for pat, rx in anchored.get(tok, ()):
+                    if rx.search(t):
+                        return pat
+        if combined is not None:
+            m = combined.search(t)
+            if m:
+                return rest[int(m.lastgroup[1:])]
+        return None
+
+
+DEFAULT_MATCHER = CrisisMatcher(CRISIS_PATTERNS, path=os.getenv("CRISIS_PATTERNS_FILE"))
@@ -0,0 +1,209 @@
+"""
+Append-only store for finished diagnoses.
+
+One row per completed assessment in a WAL-mode SQLite table, indexed by time
+and session, instead of one timestamp-named text file per diagnosis. Rows are
+only ever inserted. transcript_ref points at the stored transcript
+("diagnosis_sessions:<session_id>") or, for imported rows, the original file.
+
+    python diagnosis_store.py import [DIR]           load old *_diagnosis.txt files (idempotent)
+    python diagnosis_store.py export [--format csv]  all rows to stdout (JSON lines by default)
+"""
+import argparse
+import csv
+import glob
+import io
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime, timezone
+
+from emotion_store import parse_time
+
+FILE_TIME_FORMAT = "%Y-%m-%d_%H-%M-%S"
+MARKER = "Final Diagnosis:"
+COLUMNS = ["id", "session_id", "created_at", "diagnosis", "reply", "transcript_ref", "source"]
+
+
+def diagnosis_from_reply(reply: str) -> str:
+    """
+    The text after the last "Final Diagnosis:" (the whole reply if the marker is missing).
+    """
+    return reply.rsplit(MARKER, 1)[-1].strip()
+
+
+class DiagnosisStore:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS diagnoses (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT,
+                created_at TEXT NOT NULL,
+                diagnosis TEXT NOT NULL,
+                reply TEXT NOT NULL,
+                transcript_ref TEXT,
+                source TEXT NOT NULL DEFAULT 'api',
+                source_file TEXT UNIQUE
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_diagnoses_created ON diagnoses (created_at, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_diagnoses_session ON diagnoses (session_id, id)")
+        conn.commit()
+
+    def _conn(self):
+        # sqlite3 connections are bound to the thread that opened them.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, reply: str, session_id: str = None, transcript_ref: str = None,
+               created_at: str = None, source: str = "api", source_file: str = None) -> int:
+        """
+        Append one diagnosis; returns its id (None if source_file was already imported).
+        """
+        created_at = created_at or datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        conn = self._conn()
+        with conn:
+            cur = conn.execute("""
+                INSERT OR IGNORE INTO diagnoses
+                    (session_id, created_at, diagnosis, reply, transcript_ref, source, source_file)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (session_id, created_at, diagnosis_from_reply(reply), reply, transcript_ref, source, source_file))
+        return cur.lastrowid if cur.rowcount else None
+
+    def get(self, diagnosis_id: int):
+        row = self._conn().execute(f"SELECT {', '.join(COLUMNS)} FROM diagnoses WHERE id = ?",
+                                   (diagnosis_id,)).fetchone()
+        return dict(zip(COLUMNS, row)) if row else None
+
+    def query(self, session_id=None, start=None, end=None, text=None, limit: int = 50, before_id=None):
+        """
+        Newest first, filtered by session, [start, end) on created_at and a
+        case-insensitive substring of the diagnosis. Pass the last id seen as
+        `before_id` for the next page. start/end are ISO dates or datetimes
+        (see emotion_store.parse_time); bad ones raise ValueError.
+        """
+        start, end = parse_time(start), parse_time(end)
+        where, params = [], []
+        if session_id:
+            where.append("session_id = ?")
+            params.append(session_id)
+        if start:
+            where.append("created_at >= ?")
+            params.append(start)
+        if end:
+            where.append("created_at < ?")
+            params.append(end)
+        if text:
+            where.append("diagnosis LIKE ? ESCAPE '\\'")
+            params.append("%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        if before_id:
+            where.append("id < ?")
+            params.append(int(before_id))
+        sql = f"SELECT {', '.join(COLUMNS)} FROM diagnoses"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        rows = self._conn().execute(sql + " ORDER BY id DESC LIMIT ?", params + [limit]).fetchall()
+        return [dict(zip(COLUMNS, r)) for r in rows]
+
+    def iter_all(self, start=None, end=None, batch: int = 1000):
+        """
+        Every row in id order, read in batches (for export). Bad start/end
+        raise ValueError here, before any row is read.
+        """
+        return self._iter_rows(parse_time(start), parse_time(end), batch)
+
+    def _iter_rows(self, start, end, batch: int):
+        last_id = 0
+        while True:
+            sql = f"SELECT {', '.join(COLUMNS)} FROM diagnoses WHERE id > ?"
+            params = [last_id]
+            if start:
+                sql += " AND created_at >= ?"
+                params.append(start)
+            if end:
+                sql += " AND created_at < ?"
+                params.append(end)
+            rows = self._conn().execute(sql + " ORDER BY id LIMIT ?", params + [batch]).fetchall()
+            if not rows:
+                return
+            for r in rows:
+                yield dict(zip(COLUMNS, r))
+            last_id = rows[-1][0]
+
+    def import_text_files(self, directory: str = ".") -> tuple:
+        """
+        Load legacy <timestamp>_diagnosis.txt files. Returns (imported, skipped);
+        files already imported are skipped, so this can be re-run safely.
+        """
+        imported = skipped = 0
+        for path in sorted(glob.glob(os.path.join(directory, "*_diagnosis.txt"))):
+            name = os.path.basename(path)
+            try:
+                # Files were named in server local time; rows are stored in UTC.
+                ts = datetime.strptime(name[:-len("_diagnosis.txt")], FILE_TIME_FORMAT).astimezone(timezone.utc)
+            except ValueError:
+                ts = datetime.fromtimestamp(os.path.getmtime(path), timezone.utc)
+            created_at = ts.strftime("%Y-%m-%d %H:%M:%S")
+            with open(path, encoding="utf-8") as f:
+                text = f.read().strip()
+            if text.startswith(MARKER):
+                # save_final_diagnosis wrote a "Final Diagnosis:" header line before the reply.
+                text = text[len(MARKER):].strip()
+            diagnosis_id = self.record(text, transcript_ref=f"file:{name}", created_at=created_at,
+                                       source="import", source_file=name)
+            if diagnosis_id is None:
+                skipped += 1
+            else:
+                imported += 1
+        return imported, skipped
+
+
+def export_rows(rows, fmt: str = "jsonl"):
+    """
+    Yield export lines for rows (jsonl or csv with a header).
+    """
+    if fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=COLUMNS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+        if buf.tell():
+            yield buf.getvalue()  # header only
+    else:
+        for row in rows:
+            yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("directory", nargs="?", default=".")
+    parser.add_argument("--db", default=os.getenv("DIAGNOSIS_RESULTS_DB", "diagnoses.db"))
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    args = parser.parse_args()
+
+    store = DiagnosisStore(args.db)
+    if args.command == "import":
+        imported, skipped = store.import_text_files(args.directory)
+        print(f"✅ Imported {imported} diagnoses ({skipped} already present) into {args.db}")
+    else:
+        for line in export_rows(store.iter_all(), args.format):
+            sys.stdout.write(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Keyword lexicon for text emotion detection.
+
+Each message is lowercased and tokenized once, then every token is looked up
+in a hashed index built at construction time. Scores are kept for all
+emotions instead of stopping at the first keyword found.
+"""
+import re
+
+EMOTION_KEYWORDS = {
+    "happy":   ["happy", "joy", "excited", "glad", "cheerful", "grateful", "content", "fantastic", "great", "smile", "love"],
+    "sad":     ["sad", "down", "depressed", "unhappy", "lonely", "tearful", "hopeless", "cry", "miserable", "blue"],
+    "angry":   ["angry", "mad", "furious", "annoyed", "irritated", "rage", "pissed", "hate", "frustrated"],
+    "anxious": ["anxious", "worried", "nervous", "tense", "panic", "stressed", "overwhelmed", "scared", "afraid"],
+    "neutral": []
+}
+
+# \w+ splits on exactly the positions where the old \b...\b regexes matched.
+TOKEN_RE = re.compile(r"\w+")
+
+
+class EmotionLexicon:
+    def __init__(self, keywords: dict, default: str = "neutral"):
+        self.emotions = list(keywords)
+        self.default = default
+        self._words = {}    # token -> (emotion, ...)
+        self._phrases = {}  # first token -> [(tokens, emotion), ...]
+        for emotion, words in keywords.items():
+            for w in words:
+                tokens = tuple(TOKEN_RE.findall(w.lower()))
+                if len(tokens) == 1:
+                    self._words[tokens[0]] = self._words.get(tokens[0], ()) + (emotion,)
+                elif tokens:
+                    self._phrases.setdefault(tokens[0], []).append((tokens, emotion))
+
+    def scores(self, text: str) -> dict:
+        """
+        Keyword hit counts for every emotion, e.g. {"happy": 1, "sad": 2, ...}.
+        """
+        counts = dict.fromkeys(self.emotions, 0)
+        tokens = TOKEN_RE.findall(text.lower())
+        words, phrases = self._words, self._phrases
+        for i, tok in enumerate(tokens):
+            hits = words.get(tok)
+            if hits:
+                for emotion in hits:
+                    counts[emotion] += 1
+            if phrases and tok in phrases:
+                for seq, emotion in phrases[tok]:
+                    if tuple(tokens[i:i + len(seq)]) == seq:
+                        counts[emotion] += 1
+        return counts
+
+    def classify(self, text: str) -> str:
+        """
+        Dominant emotion by hit count; ties go to the emotion listed first.
+        """
+        best, best_count = self.default, 0
+        for emotion, count in self.scores(text).items():
+            if count > best_count:
+                best, best_count = emotion, count
+        return best
+
+    def score_batch(self, texts) -> list:
+        return [self.scores(t) for t in texts]
+
+    def classify_batch(self, texts) -> list:
+        """
+        Classify many messages in one call (offline mood analytics).
+        """
+        return [self.classify(t) for t in texts]
+
+
+DEFAULT_LEXICON = EmotionLexicon(EMOTION_KEYWORDS)
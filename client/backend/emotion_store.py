@@ -0,0 +1,473 @@
+"""
+SQLite access for the facial-emotion time series (emotions.db).
+
+EmotionWriter owns the only write connection: request handlers enqueue rows
+and a background thread inserts them with group commit, one transaction per
+`batch_size` rows or per `flush_interval` seconds, whichever comes first.
+ReadPool hands out a few long-lived read connections. The database runs in
+WAL mode so readers never block the writer.
+
+Rows are partitioned by session_id. The same flush that inserts frames
+updates emotion_rollups, a per-minute/hour/day count and confidence sum for
+each (session, emotion), so history() pages through raw frames with a
+(timestamp, id) keyset and rollups() never touches the raw table.
+
+latest_emotions holds each session's most recent reading. It is the state
+every fg.py worker and app.py's /emotion share, and LatestEmotionFeed turns
+its changes (committed by any process) into in-process push notifications.
+
+read_pool() and feed() return one ReadPool / LatestEmotionFeed per database
+file per process, so app.py and fg.py share them when gateway.py mounts both.
+"""
+import base64
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from telemetry import span
+
+
+def connect(path: str, readonly: bool = False) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    if readonly:
+        # The journal mode is a property of the file; the writer sets it.
+        conn.execute("PRAGMA query_only=ON")
+    else:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+DEFAULT_SESSION = "default-session"
+
+# granularity -> length of the timestamp prefix that names its bucket
+# ("YYYY-MM-DD HH:MM", "YYYY-MM-DD HH", "YYYY-MM-DD")
+GRANULARITIES = {"minute": 16, "hour": 13, "day": 10}
+
+
+def init_db(path: str):
+    conn = connect(path)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS emotions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            emotion TEXT NOT NULL,
+            confidence REAL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            session_id TEXT NOT NULL DEFAULT 'default-session'
+        )
+    ''')
+    columns = [r[1] for r in conn.execute("PRAGMA table_info(emotions)")]
+    if "session_id" not in columns:
+        conn.execute("ALTER TABLE emotions ADD COLUMN session_id TEXT NOT NULL DEFAULT 'default-session'")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_emotions_session_time ON emotions (session_id, timestamp, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_emotions_time ON emotions (timestamp, id)")
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'emotion_rollups'").fetchone()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS emotion_rollups (
+            granularity TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            session_id TEXT NOT NULL,
+            emotion TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            confidence_sum REAL NOT NULL,
+            PRIMARY KEY (granularity, session_id, bucket, emotion)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_rollups_bucket ON emotion_rollups (granularity, bucket)")
+    # seq increases on every update across all sessions, so change feeds can
+    # ask for "everything after seq N".
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS latest_emotions (
+            session_id TEXT PRIMARY KEY,
+            emotion TEXT NOT NULL,
+            confidence REAL,
+            timestamp TEXT,
+            seq INTEGER NOT NULL
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_latest_seq ON latest_emotions (seq)")
+    if not exists:
+        # First run against an older database: summarize what is already there.
+        for granularity, width in GRANULARITIES.items():
+            conn.execute('''
+                INSERT INTO emotion_rollups
+                SELECT ?, substr(timestamp, 1, ?), session_id, emotion, COUNT(*), TOTAL(confidence)
+                FROM emotions WHERE timestamp IS NOT NULL
+                GROUP BY 2, session_id, emotion
+            ''', (granularity, width))
+    conn.commit()
+    conn.close()
+
+
+def utc_timestamp() -> str:
+    # Same format and clock as SQLite's CURRENT_TIMESTAMP.
+    return datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def parse_time(value):
+    """
+    Normalize an ISO date/datetime query parameter to the stored UTC
+    "YYYY-MM-DD HH:MM:SS" form. Values with an offset (or Z) are converted to
+    UTC; naive ones are taken as UTC. None passes through; bad input raises ValueError.
+    """
+    if not value:
+        return None
+    dt = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc)
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def rollup_rows(batch) -> list:
+    """
+    emotion_rollups increments for (session_id, emotion, confidence, timestamp) rows.
+    """
+    totals = {}
+    for session_id, emotion, confidence, ts in batch:
+        for granularity, width in GRANULARITIES.items():
+            key = (granularity, ts[:width], session_id, emotion)
+            count, total = totals.get(key, (0, 0.0))
+            totals[key] = (count + 1, total + confidence)
+    return [key + value for key, value in totals.items()]
+
+
+class EmotionWriter:
+    def __init__(self, path: str, batch_size: int = 64, flush_interval: float = 0.05,
+                 max_queue: int = 10000, put_timeout: float = 0.5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.written = self.commits = self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._idle = threading.Condition()
+        self._pending = 0
+        self._latest = {}  # session_id -> (emotion, confidence, timestamp), not yet committed
+        self._latest_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_started(self):
+        # Started on first use, in the process that writes: an app imported by
+        # a pre-forking server master must not leave its thread behind.
+        with self._latest_lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="emotion-writer", daemon=True)
+                self._thread.start()
+
+    def write(self, rows, session_id: str = DEFAULT_SESSION, latest=None):
+        """
+        Enqueue (emotion, confidence) rows for a session and make `latest`
+        (default: the last row) the session's latest reading. Returns False if
+        the queue stayed full for `put_timeout` seconds and the rows were dropped.
+        """
+        self._ensure_started()
+        ts = utc_timestamp()
+        emotion, confidence = latest or rows[-1]
+        with self._latest_lock:
+            self._latest[session_id] = (emotion, float(confidence), ts)
+        with self._idle:
+            self._pending += len(rows)
+        queued = 0
+        try:
+            for emotion, confidence in rows:
+                self._queue.put((session_id, emotion, float(confidence), ts), timeout=self.put_timeout)
+                queued += 1
+        except queue.Full:
+            with self._idle:
+                self.dropped += len(rows) - queued
+                self._pending -= len(rows) - queued
+                self._idle.notify_all()
+            return False
+        return True
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """
+        Block until every enqueued row is committed.
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending <= 0, timeout)
+
+    def _run(self):
+        conn = connect(self.path)
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                with span("db_flush"), conn:
+                    conn.executemany("INSERT INTO emotions (session_id, emotion, confidence, timestamp) "
+                                     "VALUES (?, ?, ?, ?)", batch)
+                    conn.executemany('''
+                        INSERT INTO emotion_rollups VALUES (?, ?, ?, ?, ?, ?)
+                        ON CONFLICT DO UPDATE SET count = count + excluded.count,
+                                                  confidence_sum = confidence_sum + excluded.confidence_sum
+                    ''', rollup_rows(batch))
+                    with self._latest_lock:
+                        latest, self._latest = self._latest, {}
+                    if latest:
+                        seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM latest_emotions").fetchone()[0]
+                        conn.executemany('''
+                            INSERT INTO latest_emotions VALUES (?, ?, ?, ?, ?)
+                            ON CONFLICT (session_id) DO UPDATE SET emotion = excluded.emotion,
+                                confidence = excluded.confidence, timestamp = excluded.timestamp, seq = excluded.seq
+                        ''', [(sid, *value, seq + i) for i, (sid, value) in enumerate(latest.items(), 1)])
+                self.written += len(batch)
+                self.commits += 1
+            except sqlite3.Error as e:
+                print("⚠️ Emotion write failed:", str(e))
+            with self._idle:
+                self._pending -= len(batch)
+                self._idle.notify_all()
+
+    def stats(self) -> dict:
+        return {"written": self.written, "commits": self.commits, "dropped": self.dropped,
+                "queued": self._queue.qsize()}
+
+
+class ReadPool:
+    def __init__(self, path: str, size: int = 4):
+        self.path = path
+        self.size = 0
+        self._pool = queue.LifoQueue()
+        self.grow(size)
+
+    def grow(self, size: int):
+        while self.size < size:
+            self._pool.put(None)  # connections are opened lazily
+            self.size += 1
+
+    @contextmanager
+    def connection(self):
+        conn = self._pool.get()
+        try:
+            if conn is None:
+                conn = connect(self.path, readonly=True)
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+
+def encode_cursor(timestamp: str, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{timestamp}|{row_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return timestamp, int(row_id)
+    except ValueError:  # bad base64, non-UTF-8, missing "|" or non-integer id
+        raise ValueError("invalid cursor") from None
+
+
+def history(conn, session_id=None, start=None, end=None, limit: int = 100, cursor=None):
+    """
+    One page of raw frames, newest first, within [start, end). Returns
+    (rows, next_cursor); next_cursor is None on the last page.
+    """
+    where, params = [], []
+    if session_id:
+        where.append("session_id = ?")
+        params.append(session_id)
+    if start:
+        where.append("timestamp >= ?")
+        params.append(start)
+    if end:
+        where.append("timestamp < ?")
+        params.append(end)
+    if cursor:
+        where.append("(timestamp, id) < (?, ?)")
+        params.extend(decode_cursor(cursor))
+    sql = "SELECT id, session_id, emotion, confidence, timestamp FROM emotions"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+    rows = conn.execute(sql, params + [limit + 1]).fetchall()
+    next_cursor = encode_cursor(rows[limit - 1][4], rows[limit - 1][0]) if len(rows) > limit else None
+    return [{"id": r[0], "session_id": r[1], "emotion": r[2], "confidence": r[3], "timestamp": r[4]}
+            for r in rows[:limit]], next_cursor
+
+
+def rollups(conn, granularity: str = "hour", session_id=None, start=None, end=None, limit: int = 500):
+    """
+    Per-bucket summaries, newest first: dominant emotion (most frames), mean
+    confidence over all frames in the bucket and per-emotion frame counts.
+    Without a session_id the buckets cover every session.
+    """
+    width = GRANULARITIES[granularity]
+    where, params = ["granularity = ?"], [granularity]
+    if session_id:
+        where.append("session_id = ?")
+        params.append(session_id)
+    # Bucket names are timestamp prefixes, so compare against the same prefix.
+    if start:
+        where.append("bucket >= ?")
+        params.append(start[:width])
+    if end:
+        where.append("bucket < ?")
+        params.append(end[:width])
+    bucket_filter = " AND ".join(where)
+    rows = conn.execute(f'''
+        SELECT bucket, emotion, SUM(count), SUM(confidence_sum) FROM emotion_rollups
+        WHERE {bucket_filter} AND bucket IN (
+            SELECT DISTINCT bucket FROM emotion_rollups WHERE {bucket_filter}
+            ORDER BY bucket DESC LIMIT ?)
+        GROUP BY bucket, emotion ORDER BY bucket DESC
+    ''', params + params + [limit]).fetchall()
+
+    buckets = {}
+    for bucket, emotion, count, total in rows:
+        b = buckets.setdefault(bucket, {"bucket": bucket, "counts": {}, "count": 0, "confidence_sum": 0.0})
+        b["counts"][emotion] = count
+        b["count"] += count
+        b["confidence_sum"] += total
+    out = []
+    for b in buckets.values():
+        total = b.pop("confidence_sum")
+        b["emotion"] = max(b["counts"], key=b["counts"].get)
+        b["confidence"] = round(total / b["count"], 4) if b["count"] else 0.0
+        out.append(b)
+    return out
+
+
+def latest(conn, session_id=None):
+    """
+    The session's latest reading, or the most recent one across all sessions
+    when no session_id is given. None if there is none.
+    """
+    sql = "SELECT session_id, emotion, confidence, timestamp, seq FROM latest_emotions"
+    if session_id:
+        row = conn.execute(sql + " WHERE session_id = ?", (session_id,)).fetchone()
+    else:
+        row = conn.execute(sql + " ORDER BY seq DESC LIMIT 1").fetchone()
+    if row is None:
+        return None
+    return {"session_id": row[0], "emotion": row[1], "confidence": row[2], "timestamp": row[3], "seq": row[4]}
+
+
+class LatestEmotionFeed:
+    """
+    Pushes latest_emotions updates to subscribers in this process, whichever
+    process committed them.
+
+    One thread checks PRAGMA data_version (which changes when another
+    connection commits) every `poll_interval` seconds while anyone is
+    subscribed, and only then reads the rows whose seq moved. Each subscriber
+    gets a bounded queue; a slow one loses its oldest updates, never blocks
+    the others. A forked child (pre-forking server) starts over with no
+    subscribers and starts its own thread on its first subscribe(). fork()
+    waits for the thread's SQLite calls to finish: a child forked while one
+    held SQLite's process-wide mutex would hang on its first connect().
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.1, max_pending: int = 32):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.max_pending = max_pending
+        self._reset()
+        os.register_at_fork(before=lambda: self._io.acquire(), after_in_parent=lambda: self._io.release(),
+                            after_in_child=self._reset)
+
+    def _reset(self):
+        # The parent's thread and subscribers do not exist in a forked child,
+        # and its locks may have been held at the fork.
+        self._subscribers = {}  # queue -> session_id or None (all sessions)
+        self._lock = threading.Lock()
+        self._io = threading.Lock()  # held by the thread while it is inside SQLite
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def subscribe(self, session_id=None) -> queue.Queue:
+        q = queue.Queue(maxsize=self.max_pending)
+        with self._lock:
+            self._subscribers[q] = session_id
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="emotion-feed", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.pop(q, None)
+
+    def _publish(self, update: dict):
+        with self._lock:
+            targets = [q for q, sid in self._subscribers.items() if sid is None or sid == update["session_id"]]
+        for q in targets:
+            while True:
+                try:
+                    q.put_nowait(update)
+                    break
+                except queue.Full:
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def _run(self):
+        with self._io:
+            conn = connect(self.path, readonly=True)
+        version = last_seq = None
+        while True:
+            if not self._subscribers:
+                while not self._subscribers:
+                    self._wakeup.wait()
+                    self._wakeup.clear()
+                last_seq = None  # new subscribers start from now, not from the backlog
+            rows = ()
+            try:
+                with self._io:
+                    if last_seq is None:
+                        last_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM latest_emotions").fetchone()[0]
+                    current = conn.execute("PRAGMA data_version").fetchone()[0]
+                    if current != version:
+                        version = current
+                        rows = conn.execute("SELECT session_id, emotion, confidence, timestamp, seq "
+                                            "FROM latest_emotions WHERE seq > ? ORDER BY seq", (last_seq,)).fetchall()
+                for sid, emotion, confidence, ts, seq in rows:
+                    last_seq = seq
+                    self._publish({"session_id": sid, "emotion": emotion, "confidence": confidence,
+                                   "timestamp": ts, "seq": seq})
+            except sqlite3.Error as e:
+                print("⚠️ Emotion feed read failed:", str(e))
+            time.sleep(self.poll_interval)
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def read_pool(path: str, size: int = 4) -> ReadPool:
+    """
+    The process's ReadPool for `path`, grown to at least `size` connections.
+    """
+    with _shared_lock:
+        pool = _shared.get(("reads", os.path.abspath(path)))
+        if pool is None:
+            pool = _shared[("reads", os.path.abspath(path))] = ReadPool(path, size)
+        pool.grow(size)
+        return pool
+
+
+def feed(path: str, poll_interval: float = 0.1) -> LatestEmotionFeed:
+    """
+    The process's LatestEmotionFeed for `path` (the first caller's interval).
+    """
+    with _shared_lock:
+        f = _shared.get(("feed", os.path.abspath(path)))
+        if f is None:
+            f = _shared[("feed", os.path.abspath(path))] = LatestEmotionFeed(path, poll_interval)
+        return f
@@ -0,0 +1,59 @@
+"""
+Bounded executors for CPU-bound work (DeepFace inference, TTS synthesis).
+
+Handlers call run_blocking(pool, fn, ...) instead of calling the heavy
+function inline. Under the gevent server (serve.py --mode async) each pool is
+a gevent ThreadPoolExecutor, which always uses native threads, so the event
+loop keeps serving other requests; otherwise it is a plain
+concurrent.futures pool, which still caps how many inferences run at once.
+
+Pool sizes come from EXECUTOR_<NAME>_THREADS (default 2; 1 for "tts", since
+the speech engines are not safe to drive concurrently).
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_THREADS = {"tts": 1}
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def _gevent_active() -> bool:
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("threading")
+
+
+def pool_size(name: str) -> int:
+    return int(os.getenv(f"EXECUTOR_{name.upper()}_THREADS", str(DEFAULT_THREADS.get(name, 2))))
+
+
+def _pool(name: str):
+    with _lock:
+        pool = _pools.get(name)
+        if pool is None:
+            if _gevent_active():
+                from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+                pool = NativeThreadPoolExecutor(pool_size(name))
+            else:
+                pool = ThreadPoolExecutor(pool_size(name), thread_name_prefix=name)
+            _pools[name] = pool
+        return pool
+
+
+def submit(pool: str, fn, *args, **kwargs):
+    """
+    Schedule fn(*args, **kwargs) on the named pool; returns a Future.
+    """
+    return _pool(pool).submit(fn, *args, **kwargs)
+
+
+def run_blocking(pool: str, fn, *args, **kwargs):
+    """
+    Run fn(*args, **kwargs) on the named pool and wait for its result.
+    """
+    return submit(pool, fn, *args, **kwargs).result()
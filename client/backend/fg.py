@@ -1,111 +1,425 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, request, jsonify
 from flask_cors import CORS
+from flask_sock import Sock
+import json
 import cv2
 import base64
-import numpy as np
-from deepface import DeepFace
-import sqlite3
-from datetime import datetime
+import os
+import queue
+import tempfile
 
-app = Flask(__name__)
-CORS(app)
+import admission
+import emotion_store
+import telemetry
+from executors import run_blocking
+from sse import SSE_HEADERS, sse_event
+from vision import MODELS, FrameGate, MicroBatcher, ModelUnavailable, aggregate, analyze_batch, decode_image
+
+# Routes live on `bp`: `app` at the bottom serves it alone, gateway.py mounts
+# it next to the chat and diagnosis services.
+bp = Blueprint("vision", __name__)
+CORS(bp)
+sock = Sock()
+telemetry.init_app(bp, "vision", routes=False)  # request ids, stage timings
 
-DB_NAME = "emotions.db"
+DB_NAME = os.getenv("EMOTION_DB", "emotions.db")
 
 # ───────────────────────────────────────────
-# SQLite Setup
+# SQLite Setup (WAL, group-committing writer + read pool)
 # ───────────────────────────────────────────
 def init_db():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS emotions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            emotion TEXT NOT NULL,
-            confidence REAL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    emotion_store.init_db(DB_NAME)
 
 init_db()
 
-latest_emotion = {"emotion": "Unknown", "confidence": 0.0, "timestamp": None}
+WRITER = emotion_store.EmotionWriter(
+    DB_NAME,
+    batch_size=int(os.getenv("DB_BATCH_ROWS", "64")),
+    flush_interval=float(os.getenv("DB_FLUSH_MS", "50")) / 1000,
+    max_queue=int(os.getenv("DB_MAX_QUEUE", "10000")),
+)
+READS = emotion_store.read_pool(DB_NAME, size=int(os.getenv("DB_READ_CONNECTIONS", "4")))
+
+# Latest readings live in the database (latest_emotions) so every worker
+# process answers /get_latest_emotion the same way; FEED pushes changes.
+FEED = emotion_store.feed(DB_NAME, poll_interval=float(os.getenv("FEED_POLL_MS", "100")) / 1000)
+UNKNOWN_EMOTION = {"emotion": "Unknown", "confidence": 0.0, "timestamp": None}
+
+# DeepFace model: lazy | background (default) | prefork (see vision.ModelManager)
+MODELS.start(os.getenv("MODEL_LOAD", "background"))
+
+# Concurrent /analyze_frame requests within BATCH_WAIT_MS share one model call
+BATCHER = MicroBatcher(analyze_batch,
+                       max_batch=int(os.getenv("BATCH_MAX_FRAMES", "8")),
+                       max_wait=float(os.getenv("BATCH_WAIT_MS", "5")) / 1000)
+MAX_FRAMES_PER_REQUEST = int(os.getenv("MAX_FRAMES_PER_REQUEST", "32"))
+# Upload size and frames scanned per clip; longer clips are sampled from their start.
+CLIP_MAX_BYTES = int(os.getenv("CLIP_MAX_MB", "20")) * 1024 * 1024
+CLIP_MAX_SCAN_FRAMES = int(os.getenv("CLIP_MAX_SCAN_FRAMES", "3000"))
+
+# Skip inference on near-identical frames and cap full inferences per session
+GATE = FrameGate(threshold=float(os.getenv("GATE_DIFF_THRESHOLD", "4")),
+                 min_interval=float(os.getenv("GATE_MIN_INTERVAL_MS", "200")) / 1000,
+                 max_age=float(os.getenv("GATE_MAX_AGE_MS", "2000")) / 1000)
+GATE_ENABLED = os.getenv("GATE_ENABLED", "1") == "1"
+
+# Frames per second per session (RATE_LIMITS "analyze_frame") and a bounded
+# queue in front of DeepFace (ADMIT_VISION_*); see admission.py.
+LIMITER = admission.limiter()
+VISION_GATE = admission.gate("vision")
+
+
+def analyze_gated(session_id, frame):
+    """
+    Result for one frame, reusing the session's last result when FrameGate
+    says the frame has not meaningfully changed. Returns (result, reused).
+    Only frames that reach the model wait for VISION_GATE.
+    """
+    if not GATE_ENABLED:
+        with VISION_GATE.slot():
+            return BATCHER(frame), False
+    thumb, result = GATE.check(session_id, frame)
+    if result is not None:
+        return result, True
+    with VISION_GATE.slot():
+        result = BATCHER(frame)
+    GATE.store(session_id, thumb, result)
+    return result, False
+
+
+def session_from_request():
+    return (request.headers.get("X-Session-ID") or request.args.get("session_id")
+            or (request.get_json(silent=True) or {}).get("session_id") or "default-session").strip()
+
+
+def decode_data_url(data: str):
+    with telemetry.span("b64decode"):
+        raw = base64.b64decode(data.split(",")[1])
+    with telemetry.span("imdecode"):
+        return decode_image(raw)
+
+
+def decode_clip(data: str, max_frames: int):
+    """
+    Evenly sample up to `max_frames` frames from a base64 (data URL) video.
+    Only the sampled frames are decoded into images (grab() skips the rest),
+    and at most CLIP_MAX_SCAN_FRAMES are scanned. Raises ValueError for
+    clips over CLIP_MAX_BYTES.
+    """
+    encoded = data.split(",")[-1]
+    if len(encoded) * 3 // 4 > CLIP_MAX_BYTES:
+        raise ValueError(f"Clip larger than {CLIP_MAX_BYTES // (1024 * 1024)} MB")
+    raw = base64.b64decode(encoded)
+    with tempfile.NamedTemporaryFile(suffix=".webm") as f:
+        f.write(raw)
+        f.flush()
+        del raw
+        cap = cv2.VideoCapture(f.name)
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if total <= 0:  # not in the container header (common for webm): count without decoding
+            total = 0
+            while total < CLIP_MAX_SCAN_FRAMES and cap.grab():
+                total += 1
+            cap.release()
+            cap = cv2.VideoCapture(f.name)
+        total = min(total, CLIP_MAX_SCAN_FRAMES)
+        wanted = {int(i * total / max_frames) for i in range(max_frames)} if total > max_frames else set(range(total))
+        frames = []
+        for i in range(total):
+            if not cap.grab():
+                break
+            if i in wanted:
+                ok, frame = cap.retrieve()
+                if ok:
+                    frames.append(frame)
+        cap.release()
+    return frames
+
+
+def frame_from_request():
+    """
+    The uploaded frame: a raw JPEG/PNG body (application/octet-stream or
+    image/*), decoded straight from the request buffer, or the legacy JSON
+    { "image": dataURL }. None if no image was sent.
+    """
+    if request.mimetype == "application/octet-stream" or request.mimetype.startswith("image/"):
+        raw = request.get_data(cache=False)
+        if not raw:
+            return None
+        with telemetry.span("imdecode"):
+            return decode_image(raw)
+    data = (request.get_json(silent=True) or {}).get("image")
+    return decode_data_url(data) if data else None
 
-# Warmup DeepFace model once
-print("⏳ Loading DeepFace model...")
-_ = DeepFace.analyze(np.zeros((100, 100, 3), dtype=np.uint8), actions=["emotion"], enforce_detection=False)
-print("✅ DeepFace model loaded.")
+
+def record_result(results, summary=None, session_id=emotion_store.DEFAULT_SESSION, reused=False):
+    """
+    Persist per-frame results and make `summary` (or the last result) the
+    session's latest reading. Returns that reading. A `reused` result
+    (FrameGate) is already stored for the frame it came from, so it is not
+    written again: duplicates would inflate history, rollups and mood analytics.
+    """
+    summary = summary or results[-1]
+    if not reused:
+        store_emotions(results, session_id, summary)
+    return {
+        "emotion": summary["emotion"],
+        "confidence": summary["confidence"],
+        "timestamp": emotion_store.utc_timestamp()
+    }
+
+
+def model_unavailable(e):
+    resp = jsonify({"error": str(e), "emotion": "Unknown", "confidence": 0.0, "model": MODELS.status()})
+    resp.status_code = 503
+    resp.headers["Retry-After"] = "5"
+    return resp
+
+
+def store_emotions(results, session_id=emotion_store.DEFAULT_SESSION, summary=None):
+    latest = (summary["emotion"], summary["confidence"]) if summary else None
+    WRITER.write([(r["emotion"], r["confidence"]) for r in results], session_id, latest)
 
 
 # ───────────────────────────────────────────
 # Analyze Frame
 # ───────────────────────────────────────────
-@app.route("/analyze_frame", methods=["POST"])
+@bp.route("/analyze_frame", methods=["POST"])
 def analyze_frame():
-    global latest_emotion
     try:
-        data = request.json.get("image")
-        if not data:
+        session_id = session_from_request()
+        LIMITER.check("analyze_frame", admission.client_key(session_id))
+        frame = frame_from_request()
+        if frame is None:
             return jsonify({"error": "No image data"}), 400
 
-        # Decode base64 image
-        img_data = base64.b64decode(data.split(",")[1])
-        np_arr = np.frombuffer(img_data, np.uint8)
-        frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+        # Analyze (gated, micro-batched with concurrent requests), store, update the latest reading
+        with telemetry.span("analyze"):
+            result, reused = analyze_gated(session_id, frame)
+        with telemetry.span("store"):
+            reading = record_result([result], session_id=session_id, reused=reused)
+        return jsonify({**reading, "reused": reused})
+
+    except admission.AdmissionError as e:
+        return admission.error_response(e)
+    except ModelUnavailable as e:
+        return model_unavailable(e)
+    except Exception as e:
+        print("⚠️ Emotion detection error:", str(e))
+        return jsonify({"error": str(e), "emotion": "Unknown", "confidence": 0.0}), 500
+
 
-        result = DeepFace.analyze(frame, actions=['emotion'], enforce_detection=False)
-        if isinstance(result, list):
-            result = result[0]
+# ───────────────────────────────────────────
+# Frame stream over WebSocket
+# ───────────────────────────────────────────
+@sock.route("/ws/frames", bp=bp)
+def ws_frames(ws):
+    """
+    Continuous camera stream: each binary message is one encoded frame
+    (text messages may carry a data URL). Every frame is answered on the same
+    socket with the JSON result; frames over the session's rate limit or
+    shed by the vision gate are answered with an error and `retry_after`.
+    """
+    session_id = session_from_request()
+    while True:
+        message = ws.receive()
+        if message is None:
+            break
+        try:
+            LIMITER.check("analyze_frame", admission.client_key(session_id))
+            frame = decode_image(message) if isinstance(message, (bytes, bytearray)) else decode_data_url(message)
+            if frame is None:
+                ws.send(json.dumps({"error": "Could not decode frame"}))
+                continue
+            result, reused = analyze_gated(session_id, frame)
+            ws.send(json.dumps({**record_result([result], session_id=session_id, reused=reused), "reused": reused}))
+        except admission.AdmissionError as e:
+            ws.send(json.dumps({"error": str(e), "retry_after": e.retry_after}))
+        except Exception as e:
+            print("⚠️ Emotion detection error:", str(e))
+            ws.send(json.dumps({"error": str(e), "emotion": "Unknown", "confidence": 0.0}))
 
-        dominant_emotion = result.get('dominant_emotion', "Unknown")
-        confidence = result.get('emotion', {}).get(dominant_emotion, 0.0)
 
-        # Store in SQLite
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO emotions (emotion, confidence) VALUES (?, ?)",
-                       (dominant_emotion, float(confidence)))
-        conn.commit()
-        conn.close()
+# ───────────────────────────────────────────
+# Analyze Frames (batch of images or a short clip)
+# ───────────────────────────────────────────
+@bp.route("/analyze_frames", methods=["POST"])
+def analyze_frames():
+    """
+    Body: { "images": [dataURL, ...] } or { "clip": dataURL of a short video }
+    Returns per-frame results plus a smoothed aggregate.
+    """
+    try:
+        body = request.get_json(force=True) or {}
+        images = body.get("images") or []
+        if not body.get("clip") and len(images) > MAX_FRAMES_PER_REQUEST:
+            return jsonify({"error": f"At most {MAX_FRAMES_PER_REQUEST} frames per request"}), 400
 
-        # Update latest_emotion
-        latest_emotion = {
-            "emotion": str(dominant_emotion),
-            "confidence": float(confidence),
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
+        # Admit before decoding; a clip is charged for the most frames it can yield.
+        session_id = session_from_request()
+        LIMITER.check("analyze_frame", admission.client_key(session_id),
+                      cost=MAX_FRAMES_PER_REQUEST if body.get("clip") else max(len(images), 1))
+        if body.get("clip"):
+            try:
+                frames = decode_clip(body["clip"], MAX_FRAMES_PER_REQUEST)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+        else:
+            frames = [decode_data_url(img) for img in images]
+        frames = [f for f in frames if f is not None]
+        if not frames:
+            return jsonify({"error": "No image data"}), 400
 
-        return jsonify(latest_emotion)
+        with telemetry.span("analyze"), VISION_GATE.slot():
+            results = run_blocking("vision", analyze_batch, frames)
+        summary = aggregate(results)
+        with telemetry.span("store"):
+            record_result(results, summary, session_id)
+        return jsonify({"frames": results, "aggregate": summary})
 
+    except admission.AdmissionError as e:
+        return admission.error_response(e)
+    except ModelUnavailable as e:
+        return model_unavailable(e)
     except Exception as e:
         print("⚠️ Emotion detection error:", str(e))
         return jsonify({"error": str(e), "emotion": "Unknown", "confidence": 0.0}), 500
 
 
 # ───────────────────────────────────────────
-# Get Latest Emotion
+# Liveness / readiness
 # ───────────────────────────────────────────
-@app.route("/get_latest_emotion", methods=["GET"])
+@bp.route("/livez", methods=["GET"])
+def livez():
+    # The process is up and serving; says nothing about the model.
+    return jsonify({"status": "ok"})
+
+
+@bp.route("/readyz", methods=["GET"])
+def readyz():
+    status = MODELS.status()
+    if MODELS.ready():
+        return jsonify({"status": "ready", "model": status})
+    return jsonify({"status": "not ready", "model": status}), 503
+
+
+# ───────────────────────────────────────────
+# Get Latest Emotion (shared across workers) and its push stream
+# ───────────────────────────────────────────
+def requested_session():
+    """
+    Session named by the request, or None for "any session".
+    """
+    return request.headers.get("X-Session-ID") or request.args.get("session_id")
+
+
+@bp.route("/get_latest_emotion", methods=["GET"])
 def get_latest_emotion():
-    return jsonify(latest_emotion)
+    with READS.connection() as conn:
+        latest = emotion_store.latest(conn, requested_session())
+    return jsonify(latest or UNKNOWN_EMOTION)
+
+
+@bp.route("/emotions/stream", methods=["GET"])
+def emotions_stream():
+    """
+    SSE: the current reading, then an `emotion` event whenever any worker
+    records a new one for the session (or for any session without
+    ?session_id). Comments every 15 s keep idle proxies from closing it.
+    """
+    session_id = requested_session()
+    updates = FEED.subscribe(session_id)
+
+    def generate():
+        try:
+            with READS.connection() as conn:
+                current = emotion_store.latest(conn, session_id)
+            if current:
+                yield sse_event(current, "emotion")
+            while True:
+                try:
+                    yield sse_event(updates.get(timeout=15), "emotion")
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+        finally:
+            FEED.unsubscribe(updates)
+
+    return Response(generate(), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+
+# ───────────────────────────────────────────
+# Frame gate / micro-batcher statistics
+# ───────────────────────────────────────────
+@bp.route("/gate_stats", methods=["GET"])
+def gate_stats():
+    return jsonify({"gate": GATE.stats(), "batcher": BATCHER.stats(), "writer": WRITER.stats()})
 
 
 # ───────────────────────────────────────────
 # Get All Emotions (last 20)
 # ───────────────────────────────────────────
-@app.route("/get_all_emotions", methods=["GET"])
+@bp.route("/get_all_emotions", methods=["GET"])
 def get_all_emotions():
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT emotion, confidence, timestamp FROM emotions ORDER BY id DESC LIMIT 20")
-    rows = cursor.fetchall()
-    conn.close()
+    with READS.connection() as conn:
+        rows = conn.execute("SELECT emotion, confidence, timestamp FROM emotions ORDER BY id DESC LIMIT 20").fetchall()
     emotions = [{"emotion": r[0], "confidence": r[1], "timestamp": r[2]} for r in rows]
     return jsonify(emotions)
 
 
+# ───────────────────────────────────────────
+# Emotion History (keyset-paginated) and Rollups
+# ───────────────────────────────────────────
+HISTORY_MAX_LIMIT = 1000
+
+
+def time_range_from_request():
+    return emotion_store.parse_time(request.args.get("start")), emotion_store.parse_time(request.args.get("end"))
+
+
+@bp.route("/emotions/history", methods=["GET"])
+def emotions_history():
+    """
+    ?session_id=&start=&end=&limit=&cursor=
+    Frames newest first; pass the returned next_cursor to get the next page.
+    """
+    try:
+        start, end = time_range_from_request()
+        limit = min(max(int(request.args.get("limit", 100)), 1), HISTORY_MAX_LIMIT)
+        with READS.connection() as conn:
+            rows, next_cursor = emotion_store.history(conn, request.args.get("session_id"), start, end,
+                                                      limit, request.args.get("cursor"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"emotions": rows, "next_cursor": next_cursor})
+
+
+@bp.route("/emotions/rollups", methods=["GET"])
+def emotions_rollups():
+    """
+    ?granularity=minute|hour|day&session_id=&start=&end=&limit=
+    Dominant emotion and mean confidence per bucket, newest first.
+    """
+    granularity = request.args.get("granularity", "hour")
+    if granularity not in emotion_store.GRANULARITIES:
+        return jsonify({"error": f"granularity must be one of {', '.join(emotion_store.GRANULARITIES)}"}), 400
+    try:
+        start, end = time_range_from_request()
+        limit = min(max(int(request.args.get("limit", 500)), 1), HISTORY_MAX_LIMIT)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    with READS.connection() as conn:
+        buckets = emotion_store.rollups(conn, granularity, request.args.get("session_id"), start, end, limit)
+    return jsonify({"granularity": granularity, "buckets": buckets})
+
+
+# ───────────────────────────────────────────
+# Standalone app
+# ───────────────────────────────────────────
+app = Flask(__name__)
+telemetry.init_routes(app)  # /metrics
+admission.init_app(app)  # 429/503 + Retry-After, /admission_stats
+app.register_blueprint(bp)
+
 # ───────────────────────────────────────────
 # Run Flask App
 # ───────────────────────────────────────────
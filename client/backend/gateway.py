@@ -0,0 +1,61 @@
+"""
+Every backend service in one process: the chat (app.py), diagnosis
+(llm_chatbot.py) and vision (fg.py) blueprints mounted on a single Flask app.
+
+    python serve.py gateway:app --port 5000 --mode async
+    python serve.py gateway:app --port 5000 --mode sync --threads 16 --workers 2
+
+Mounted together the services share one set of LLM connection pools
+(llm_client), response cache (llm_cache), executor pools, admission gates,
+emotions.db read pool and feed (emotion_store.read_pool/feed), and a single
+/metrics and /admission_stats. Each keeps its own CORS policy and its
+`service` label in the metrics.
+
+Chat and vision keep their paths (/chat, /speak, /analyze_frame, ...).
+Diagnosis moves under GATEWAY_DIAGNOSIS_PREFIX (default /assessment), since
+its /chat and /cache_stats would collide with app.py's.
+
+Heavy subsystems load on first use unless configured otherwise: MODEL_LOAD
+defaults to "lazy" (DeepFace loads on the first frame) and TTS_PRERENDER to
+"0" (pyttsx3 starts on the first /speak).
+
+Configuration (environment):
+    GATEWAY_SERVICES          comma-separated subset of chat,diagnosis,vision
+                              (default all); others are not even imported
+    GATEWAY_DIAGNOSIS_PREFIX  URL prefix of the diagnosis service (default /assessment)
+"""
+import importlib
+import os
+
+from flask import Flask
+
+import admission
+import telemetry
+
+os.environ.setdefault("MODEL_LOAD", "lazy")
+os.environ.setdefault("TTS_PRERENDER", "0")
+
+SERVICES = {
+    # name: (module, URL prefix)
+    "chat": ("app", ""),
+    "diagnosis": ("llm_chatbot", os.getenv("GATEWAY_DIAGNOSIS_PREFIX", "/assessment")),
+    "vision": ("fg", ""),
+}
+
+
+def create_app(services) -> Flask:
+    app = Flask(__name__)
+    telemetry.init_routes(app)  # /metrics
+    admission.init_app(app)  # 429/503 + Retry-After, /admission_stats
+    for name in services:
+        if name not in SERVICES:
+            raise ValueError(f"Unknown service '{name}'; expected one of {', '.join(SERVICES)}")
+        module, prefix = SERVICES[name]
+        app.register_blueprint(importlib.import_module(module).bp, url_prefix=prefix or None)
+    return app
+
+
+app = create_app([s.strip() for s in os.getenv("GATEWAY_SERVICES", ",".join(SERVICES)).split(",") if s.strip()])
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=5000)
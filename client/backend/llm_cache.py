@@ -0,0 +1,190 @@
+"""
+Response cache for chat-completion calls.
+
+Entries are keyed by a hash of (provider, model, messages, sampling params)
+after normalization: Unicode NFKC, case folding and collapsed whitespace in
+every message, and params in sorted order. Prompts that differ only in
+spacing or capitalization share an entry.
+
+Two tiers: an in-process LRU with a TTL and an optional SQLite table that
+survives restarts and is shared by every worker. Callers opt in per route
+(LLM_CACHE_ROUTES), because a cached reply is one sample reused, not a new one.
+
+Configuration (environment):
+    LLM_CACHE_ROUTES   comma-separated route names allowed to use the cache
+                       (default "diagnosis"; also "supportive", "chat")
+    LLM_CACHE_DB       SQLite file for the persistent tier ("" = memory only)
+    LLM_CACHE_SIZE     in-memory entries (default 1000)
+    LLM_CACHE_TTL      seconds an entry stays valid (default 86400)
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    return WHITESPACE_RE.sub(" ", unicodedata.normalize("NFKC", text).casefold()).strip()
+
+
+def cache_key(provider: str, model: str, messages: list, params: dict) -> str:
+    payload = {
+        "provider": provider,
+        "model": model,
+        "messages": [[m.get("role"), normalize_text(m.get("content") or "")] for m in messages],
+        "params": params,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path: str = None, max_entries: int = 1000, ttl: float = 86400.0,
+                 max_disk_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self._items = OrderedDict()  # key -> (reply, stored_at)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.counts = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0}
+        if path:
+            self._conn().execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    reply TEXT NOT NULL,
+                    stored_at REAL NOT NULL
+                )
+            """)
+            self._conn().execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_stored ON llm_cache (stored_at)")
+            self._conn().commit()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _remember(self, key: str, reply: str, stored_at: float):
+        with self._lock:
+            self._items[key] = (reply, stored_at)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                if now - item[1] < self.ttl:
+                    self._items.move_to_end(key)
+                    self.counts["memory_hits"] += 1
+                    return item[0]
+                del self._items[key]
+        if self.path:
+            try:
+                row = self._conn().execute("SELECT reply, stored_at FROM llm_cache WHERE key = ? AND stored_at > ?",
+                                           (key, now - self.ttl)).fetchone()
+            except sqlite3.Error as e:
+                print("⚠️ LLM cache read failed:", str(e))
+                row = None
+            if row:
+                self._remember(key, row[0], row[1])
+                self._count("disk_hits")
+                return row[0]
+        self._count("misses")
+        return None
+
+    def set(self, key: str, reply: str):
+        now = time.time()
+        self._remember(key, reply, now)
+        self._count("stores")
+        if self.path:
+            try:
+                conn = self._conn()
+                with conn:
+                    conn.execute("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?)", (key, reply, now))
+                    if self.counts["stores"] % 100 == 0:
+                        conn.execute("DELETE FROM llm_cache WHERE stored_at <= ?", (now - self.ttl,))
+                        conn.execute("DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache "
+                                     "ORDER BY stored_at DESC LIMIT -1 OFFSET ?)", (self.max_disk_entries,))
+            except sqlite3.Error as e:
+                print("⚠️ LLM cache write failed:", str(e))
+
+    def chat(self, client, messages: list, model: str, **params) -> str:
+        """
+        client.chat(messages, model, **params), answered from the cache when
+        an equivalent request was seen within the TTL.
+        """
+        key = cache_key(client.name, model, messages, params)
+        reply = self.get(key)
+        if reply is None:
+            reply = client.chat(messages, model=model, **params)
+            self.set(key, reply)
+        return reply
+
+    def stream_chat(self, client, messages: list, model: str, **params):
+        """
+        Token generator like client.stream_chat. A cached reply is replayed as
+        a single token; a fresh one is stored only if the stream completes.
+        """
+        key = cache_key(client.name, model, messages, params)
+        reply = self.get(key)
+        if reply is not None:
+            yield reply
+            return
+        parts = []
+        for token in client.stream_chat(messages, model=model, **params):
+            parts.append(token)
+            yield token
+        self.set(key, "".join(parts))
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+            counts["memory_entries"] = len(self._items)
+        lookups = counts["memory_hits"] + counts["disk_hits"] + counts["misses"]
+        counts["hit_rate"] = round((counts["memory_hits"] + counts["disk_hits"]) / lookups, 3) if lookups else 0.0
+        return counts
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> ResponseCache:
+    """
+    Process-wide cache, created on first use.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(
+                os.getenv("LLM_CACHE_DB", "llm_cache.db") or None,
+                max_entries=int(os.getenv("LLM_CACHE_SIZE", "1000")),
+                ttl=float(os.getenv("LLM_CACHE_TTL", "86400")),
+            )
+        return _cache
+
+
+def cache_for(route: str):
+    """
+    The shared cache if `route` is listed in LLM_CACHE_ROUTES, else None.
+    """
+    routes = {r.strip() for r in os.getenv("LLM_CACHE_ROUTES", "diagnosis").split(",") if r.strip()}
+    return get_cache() if route in routes else None
@@ -1,10 +1,20 @@
 import os
-import requests
-import datetime
+import uuid
 from dotenv import load_dotenv
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, request, jsonify
 from flask_cors import CORS
 
+from llm_client import get_client
+from llm_cache import cache_for, get_cache
+from sse import SSE_HEADERS, sse_event
+from session_store import SessionConflict, SessionStore, SQLiteSessionBackend
+from diagnosis_store import DiagnosisStore, export_rows
+from supportive import get_supportive_response, stream_supportive_response
+from crisis import DEFAULT_MATCHER as CRISIS_MATCHER
+import admission
+import screening
+import telemetry
+
 # -------------------------
 # Setup
 # -------------------------
@@ -14,8 +24,30 @@ TOGETHER_API_KEY = os.getenv("TOGETHER_API_KEY")
 if not TOGETHER_API_KEY:
     raise ValueError("❌ TOGETHER_API_KEY not found in environment variables.")
 
-app = Flask(__name__)
-CORS(app, origins=["http://localhost:3000"])  # Allow React dev server
+# Routes live on `bp`: `app` at the bottom serves it alone, gateway.py mounts
+# it under /assessment next to the chat and vision services.
+bp = Blueprint("diagnosis", __name__)
+CORS(bp, origins=["http://localhost:3000"])  # Allow React dev server
+telemetry.init_app(bp, "diagnosis", routes=False)  # request ids, stage timings
+
+# Per-session token buckets for /diagnosis and /chat (RATE_LIMITS, see admission.py);
+# Together calls wait in the "llm" gate.
+LIMITER = admission.limiter()
+
+# Server-held assessments: the client sends only its new answer per turn.
+# conversation is stored compactly as [role, content] pairs; screening holds
+# the local engine's state ({instruments, position, answers}) when it is used.
+DIAGNOSIS_DB = os.getenv("DIAGNOSIS_DB", "sessions.db")
+DIAGNOSIS_SESSIONS = SessionStore(
+    lambda: {"conversation": [], "supportive": [], "diagnosed_issue": None, "done": False, "screening": None},
+    backend=SQLiteSessionBackend(DIAGNOSIS_DB, table="diagnosis_sessions") if DIAGNOSIS_DB else None,
+    max_sessions=int(os.getenv("SESSION_CACHE_SIZE", "1000")),
+    ttl=float(os.getenv("SESSION_TTL", "3600")),
+    freshness=float(os.getenv("SESSION_FRESHNESS_MS", "500")) / 1000,
+)
+SEED_MESSAGE = "Please begin the first diagnostic question."
+# Assessment question/answer pairs carried into the supportive chat.
+SUPPORTIVE_CONTEXT_TURNS = int(os.getenv("SUPPORTIVE_CONTEXT_TURNS", "8"))
 
 # -------------------------
 # Diagnostic bot config
@@ -38,25 +70,25 @@ system_message = {
 }
 
 
-def get_llm_response(conversation):
-    headers = {
-        "Authorization": f"Bearer {TOGETHER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "model": "mistralai/Mistral-7B-Instruct-v0.1",
-        "messages": [system_message] + conversation,
-        "max_tokens": 300,
-        "temperature": 0.7
-    }
-    response = requests.post(
-        "https://api.together.xyz/v1/chat/completions",
-        headers=headers, json=payload
-    )
-    if response.status_code != 200:
-        raise Exception(f"API error {response.status_code}: {response.text}")
+DIAGNOSIS_PARAMS = {
+    "model": "mistralai/Mistral-7B-Instruct-v0.1",
+    "max_tokens": 300,
+    "temperature": 0.7
+}
+
 
-    reply = response.json()["choices"][0]["message"]["content"].strip()
+def get_llm_response(conversation, cache=None):
+    """
+    Next diagnostic turn. With a `cache` (see llm_cache.py), an equivalent
+    conversation seen before is answered without calling Together.
+    """
+    client = get_client("together")
+    messages = [system_message] + conversation
+    with telemetry.span("llm"):
+        if cache is not None:
+            reply = cache.chat(client, messages, **DIAGNOSIS_PARAMS)
+        else:
+            reply = client.chat(messages, **DIAGNOSIS_PARAMS)
 
     # Guardrail: prevent echoing user input prompts
     if "Your answer" in reply:
@@ -64,98 +96,393 @@ def get_llm_response(conversation):
 
     return reply
 
-def save_final_diagnosis(diagnosis_text):
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"{timestamp}_diagnosis.txt"
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write("Final Diagnosis:\n")
-        f.write(diagnosis_text)
-    return filename
+# Finished diagnoses (append-only, queryable); see diagnosis_store.py
+DIAGNOSES = DiagnosisStore(os.getenv("DIAGNOSIS_RESULTS_DB", "diagnoses.db"))
+
+
+def save_final_diagnosis(diagnosis_text, session_id=None):
+    """
+    Record a finished assessment; returns the diagnosis id.
+    """
+    transcript_ref = f"diagnosis_sessions:{session_id}" if session_id else None
+    return DIAGNOSES.record(diagnosis_text, session_id=session_id, transcript_ref=transcript_ref)
 
 # -------------------------
-# Supportive chat config
+# Screening engine config
 # -------------------------
-def get_supportive_response(conversation_history, diagnosed_issue, user_message):
-    headers = {
-        "Authorization": f"Bearer {TOGETHER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-
-    system_prompt = (
-        "You are a compassionate mental health support companion. "
-        "Your purpose is to listen with empathy and gently support users "
-        "who are experiencing emotional or mental health struggles. "
-        "Keep responses short (2–4 sentences). Avoid repeating advice. "
-        "Respect boundaries if the user asks to stop. "
-        "⚠️ Note: You are not a licensed professional. "
-    )
+# "screening" serves GAD-7/PHQ-9 locally (screening.py); the LLM is only
+# asked to read answers that name no option and to write the final summary.
+DIAGNOSIS_ENGINE = os.getenv("DIAGNOSIS_ENGINE", "llm")
+SCREENING_INSTRUMENTS = screening.validate_instruments(
+    i.strip() for i in os.getenv("SCREENING_INSTRUMENTS", ",".join(screening.DEFAULT_INSTRUMENTS)).split(",")
+    if i.strip()
+)
+SCREENING_INTRO = "I'll ask a few standard questions about the last 2 weeks. Pick the answer that fits best."
+SCREENING_RETRY = "I couldn't match that to one of the options. Please answer with A, B, C or D."
+SAFETY_NOTE = (
+    "If you are having thoughts of hurting yourself, please reach out to a crisis line "
+    "or someone you trust right now. You don't have to go through this alone."
+)
+INTERPRET_PARAMS = {
+    "model": "mistralai/Mistral-7B-Instruct-v0.1",
+    "max_tokens": 5,
+    "temperature": 0
+}
+SUMMARY_PARAMS = {
+    "model": "mistralai/Mistral-7B-Instruct-v0.1",
+    "max_tokens": 200,
+    "temperature": 0.3
+}
 
-    user_prompt = (
-        f"The user has been diagnosed with: {diagnosed_issue}.\n"
-        f"User says: \"{user_message}\"\n"
-        "Provide a supportive and empathetic response."
-    )
 
-    payload = {
-        "model": "mistralai/Mistral-7B-Instruct-v0.1",
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": "\n\n".join(conversation_history) + "\n\n" + user_prompt}
-        ],
-        "max_tokens": 300,
-        "temperature": 0.6,
-        "top_p": 0.9
-    }
-
-    response = requests.post(
-        "https://api.together.xyz/v1/chat/completions",
-        headers=headers, json=payload
-    )
-    if response.status_code != 200:
-        raise Exception(f"API error {response.status_code}: {response.text}")
-    return response.json()["choices"][0]["message"]["content"].strip()
+def interpret_answer(question, answer, cache=None):
+    """
+    Map a free-text answer onto the question's options with one short LLM
+    call; None if it fits none of them (or the call fails).
+    """
+    messages = [
+        {"role": "system", "content": (
+            "You map a person's answer to a questionnaire item onto one of its options. "
+            "Reply with only the letter A, B, C or D, or ? if the answer does not say."
+        )},
+        {"role": "user", "content": f"{question}\n\nAnswer: \"{answer}\""},
+    ]
+    client = get_client("together")
+    try:
+        with telemetry.span("llm_interpret"):
+            reply = cache.chat(client, messages, **INTERPRET_PARAMS) if cache is not None \
+                else client.chat(messages, **INTERPRET_PARAMS)
+    except Exception as e:
+        print("⚠️ Answer interpretation failed:", str(e))
+        return None
+    return screening.parse_answer(reply)
+
+
+def summarize_screening(scores, cache=None):
+    """
+    "Final Diagnosis: ..." written by the LLM from the local scores, or the
+    plain local summary if the call fails.
+    """
+    lines = [f"{s['name']}{' (first 2 items only)' if s['short_form'] else ''}: "
+             f"score {s['score']}, {s['severity']}" for s in scores.values()]
+    messages = [
+        {"role": "system", "content": (
+            "You summarize questionnaire results for the person who answered them. "
+            "Start with 'Final Diagnosis:' followed by the main finding, then 2-3 short, "
+            "supportive sentences. Do not invent symptoms. Note that this is a screening, "
+            "not a clinical diagnosis."
+        )},
+        {"role": "user", "content": "\n".join(lines)},
+    ]
+    client = get_client("together")
+    try:
+        with telemetry.span("llm_summary"):
+            reply = cache.chat(client, messages, **SUMMARY_PARAMS) if cache is not None \
+                else client.chat(messages, **SUMMARY_PARAMS)
+    except Exception as e:
+        print("⚠️ Screening summary failed, using local summary:", str(e))
+        return screening.local_summary(scores)
+    reply = reply.strip()
+    if "Final Diagnosis:" not in reply:
+        reply = "Final Diagnosis: " + reply
+    return reply
 
 # -------------------------
 # Flask Routes
 # -------------------------
 
-@app.route("/diagnosis", methods=["POST"])
+@bp.route("/diagnosis", methods=["POST"])
 def diagnosis():
     """
     Diagnostic Q&A flow
+
+    Session mode: { "session_id"?: "...", "answer"?: "...", "engine"?: "llm" | "screening" }.
+    Without a session_id a new assessment starts (engine defaults to
+    DIAGNOSIS_ENGINE) with the seed message, whose first question is the same
+    for everyone and cached; an answer sent along is taken as the reply to
+    it. The reply carries the session_id and only the new question (no transcript).
+    Legacy mode: { "conversation": [...] } with the whole transcript each turn.
     """
     data = request.get_json()
+    if "conversation" not in data:
+        engine = data.get("engine") or DIAGNOSIS_ENGINE
+        if engine not in ("llm", "screening"):
+            return jsonify({"error": "engine must be 'llm' or 'screening'"}), 400
+        LIMITER.check("diagnosis", admission.client_key(data.get("session_id")))
+        try:
+            return diagnosis_turn(data.get("session_id"), (data.get("answer") or "").strip(), engine)
+        except SessionConflict:
+            # Two answers to the same turn raced; the other one was recorded.
+            return jsonify({"error": "This assessment was updated by another request; reload it"}), 409
+
+    LIMITER.check("diagnosis", admission.client_key())
     conversation = data.get("conversation", [])
 
     # Ensure conversation starts properly
     if not conversation:
-        conversation = [{"role": "user", "content": "Please begin the first diagnostic question."}]
+        conversation = [{"role": "user", "content": SEED_MESSAGE}]
 
-    response = get_llm_response(conversation)
+    response = get_llm_response(conversation, cache=cache_for("diagnosis"))
     conversation.append({"role": "assistant", "content": response})
 
     # If Final Diagnosis is reached → save and return
     if "Final Diagnosis:" in response:
-        filename = save_final_diagnosis(response)
-        return jsonify({"reply": response, "done": True, "file": filename})
+        diagnosis_id = save_final_diagnosis(response)
+        return jsonify({"reply": response, "done": True, "diagnosis_id": diagnosis_id})
 
     return jsonify({"reply": response, "done": False, "conversation": conversation})
 
 
-@app.route("/chat", methods=["POST"])
+def diagnosis_turn(session_id, answer, engine="llm"):
+    if session_id:
+        sess = DIAGNOSIS_SESSIONS.get(session_id, create=False)
+        if sess is None:
+            return jsonify({"error": "Unknown session_id"}), 404
+        if not answer:
+            return jsonify({"error": "Missing 'answer'"}), 400
+        if sess["done"]:
+            return jsonify({"error": "Assessment already finished", "session_id": session_id}), 409
+    else:
+        session_id = uuid.uuid4().hex
+        sess = DIAGNOSIS_SESSIONS.factory()
+    # Every free-text answer goes through the same crisis matcher as app.py's /chat.
+    # A match puts SAFETY_NOTE before this turn's reply and after the final result.
+    with telemetry.span("crisis"):
+        crisis = bool(answer) and CRISIS_MATCHER.match(answer) is not None
+    if crisis:
+        sess["crisis"] = True
+
+    if not sess["conversation"]:
+        if engine == "screening":
+            return start_screening(session_id, sess, crisis)
+        first = get_llm_response([{"role": "user", "content": SEED_MESSAGE}], cache=cache_for("diagnosis"))
+        sess["conversation"].extend([["user", SEED_MESSAGE], ["assistant", first]])
+        if not answer:
+            DIAGNOSIS_SESSIONS.save(session_id, sess)
+            return jsonify({"session_id": session_id, "turn": 1, "reply": first, "done": False})
+    if sess.get("screening") is not None:
+        return screening_turn(session_id, sess, answer, crisis)
+    conversation = [{"role": role, "content": content} for role, content in sess["conversation"]]
+    conversation.append({"role": "user", "content": answer})
+    response = get_llm_response(conversation, cache=cache_for("diagnosis"))
+    # Stored only once the turn succeeded, so a failed call can be retried.
+    sess["conversation"].extend([["user", answer], ["assistant", response]])
+    turn = len(sess["conversation"]) // 2
+
+    if "Final Diagnosis:" in response:
+        sess["done"] = True
+        sess["diagnosed_issue"] = response.split("Final Diagnosis:", 1)[1].strip()
+        DIAGNOSIS_SESSIONS.save(session_id, sess)
+        diagnosis_id = save_final_diagnosis(response, session_id)
+        reply = response + "\n\n" + SAFETY_NOTE if sess.get("crisis") else response
+        return jsonify({"session_id": session_id, "turn": turn, "reply": reply, "done": True,
+                        "diagnosis_id": diagnosis_id, "crisis": crisis})
+
+    DIAGNOSIS_SESSIONS.save(session_id, sess)
+    return jsonify({"session_id": session_id, "turn": turn, "reply": with_safety_note(response, crisis),
+                    "done": False, "crisis": crisis})
+
+
+def with_safety_note(reply: str, crisis: bool) -> str:
+    return SAFETY_NOTE + "\n\n" + reply if crisis else reply
+
+
+def start_screening(session_id, sess, crisis=False):
+    graph = screening.get_graph(SCREENING_INSTRUMENTS)
+    sess["screening"] = {"instruments": list(graph.instruments), "position": 0, "asked": 1, "answers": {}}
+    reply = SCREENING_INTRO + "\n\n" + graph.render(0, 1)
+    sess["conversation"].extend([["user", SEED_MESSAGE], ["assistant", reply]])
+    DIAGNOSIS_SESSIONS.save(session_id, sess)
+    return jsonify({"session_id": session_id, "turn": 1, "reply": with_safety_note(reply, crisis), "done": False,
+                    "crisis": crisis})
+
+
+def screening_turn(session_id, sess, answer, crisis=False):
+    """
+    One answer to the locally served questionnaire. Scoring and the next
+    question need no API call; the LLM is used for an answer that names no
+    option and once for the final summary.
+    """
+    state = sess["screening"]
+    graph = screening.get_graph(tuple(state["instruments"]))
+    position = state["position"]
+    score = screening.parse_answer(answer)
+    if score is None:
+        score = interpret_answer(graph.render(position, state["asked"]), answer, cache_for("diagnosis"))
+    if score is None:
+        reply = SCREENING_RETRY + "\n\n" + graph.render(position, state["asked"])
+        sess["conversation"].extend([["user", answer], ["assistant", reply]])
+        DIAGNOSIS_SESSIONS.save(session_id, sess)
+        return jsonify({"session_id": session_id, "turn": len(sess["conversation"]) // 2,
+                        "reply": with_safety_note(reply, crisis), "done": False, "crisis": crisis})
+
+    state["answers"][graph.node_id(position)] = score
+    position = graph.next(position, state["answers"])
+    if position is not None:
+        state["position"] = position
+        state["asked"] += 1
+        reply = graph.render(position, state["asked"])
+        sess["conversation"].extend([["user", answer], ["assistant", reply]])
+        DIAGNOSIS_SESSIONS.save(session_id, sess)
+        return jsonify({"session_id": session_id, "turn": len(sess["conversation"]) // 2,
+                        "reply": with_safety_note(reply, crisis), "done": False, "crisis": crisis})
+
+    scores = graph.score(state["answers"])
+    reply = summarize_screening(scores, cache_for("diagnosis"))
+    sess["diagnosed_issue"] = reply.split("Final Diagnosis:", 1)[1].strip()
+    if graph.safety_flag(state["answers"]) or sess.get("crisis"):
+        reply += "\n\n" + SAFETY_NOTE
+    sess["conversation"].extend([["user", answer], ["assistant", reply]])
+    sess["done"] = True
+    DIAGNOSIS_SESSIONS.save(session_id, sess)
+    diagnosis_id = save_final_diagnosis(reply, session_id)
+    return jsonify({"session_id": session_id, "turn": len(sess["conversation"]) // 2, "reply": reply,
+                    "done": True, "diagnosis_id": diagnosis_id, "scores": scores, "crisis": crisis})
+
+
+@bp.route("/diagnosis/<session_id>", methods=["GET"])
+def diagnosis_transcript(session_id):
+    """
+    Full stored transcript, e.g. to restore the page after a reload.
+    """
+    sess = DIAGNOSIS_SESSIONS.get(session_id, create=False)
+    if sess is None:
+        return jsonify({"error": "Unknown session_id"}), 404
+    return jsonify({"session_id": session_id, "done": sess["done"], "diagnosed_issue": sess["diagnosed_issue"],
+                    "conversation": [{"role": r, "content": c} for r, c in sess["conversation"]],
+                    "supportive": sess["supportive"]})
+
+
+def assessment_context(sess) -> list:
+    """
+    The end of the assessment as supportive-chat history: the last
+    SUPPORTIVE_CONTEXT_TURNS questions (first line only, without the options)
+    with the user's answers, so the chat knows what the user just told it.
+    """
+    conversation = sess["conversation"]
+    pairs = [f"Q: {q.strip().splitlines()[0] if q.strip() else q}\nA: {a}"
+             for (_, q), (_, a) in zip(conversation[1::2], conversation[2::2])]
+    return pairs[-SUPPORTIVE_CONTEXT_TURNS:] if SUPPORTIVE_CONTEXT_TURNS > 0 else []
+
+
+@bp.route("/chat", methods=["POST"])
+@bp.route("/chat/stream", methods=["POST"])
 def chat():
     """
     Supportive conversation after diagnosis
+    (SSE `token` events then `done` on /chat/stream or /chat?stream=1)
+
+    Session mode: { "session_id": "...", "message": "..." } continues the
+    stored transcript of that assessment (see assessment_context). Legacy mode: { "conversation": [...],
+    "diagnosed_issue": "..." }.
     """
     data = request.get_json()
-    conversation_history = data.get("conversation", [])
-    diagnosed_issue = data.get("diagnosed_issue", "generalized anxiety")
-    user_message = conversation_history[-1] if conversation_history else ""
+    session_id = data.get("session_id") if "conversation" not in data else None
+    sess = None
+    if session_id:
+        sess = DIAGNOSIS_SESSIONS.get(session_id, create=False)
+        if sess is None:
+            return jsonify({"error": "Unknown session_id"}), 404
+        user_message = (data.get("message") or "").strip()
+        if not user_message:
+            return jsonify({"error": "Missing 'message'"}), 400
+        conversation_history = assessment_context(sess) + sess["supportive"] + [user_message]
+        diagnosed_issue = data.get("diagnosed_issue") or sess["diagnosed_issue"] or "generalized anxiety"
+    else:
+        conversation_history = data.get("conversation", [])
+        diagnosed_issue = data.get("diagnosed_issue", "generalized anxiety")
+        user_message = conversation_history[-1] if conversation_history else ""
+    LIMITER.check("chat", admission.client_key(session_id))
+    cache = cache_for("supportive")
+
+    def remember(reply):
+        if sess is not None and reply:
+            DIAGNOSIS_SESSIONS.update(session_id, lambda s: s["supportive"].extend([user_message, reply]))
+
+    if request.path.endswith("/stream") or request.args.get("stream") == "1":
+        def generate():
+            parts = []
+            try:
+                for token in stream_supportive_response(conversation_history, diagnosed_issue, user_message, cache):
+                    parts.append(token)
+                    yield sse_event({"token": token}, "token")
+                yield sse_event({"reply": "".join(parts).strip()}, "done")
+            except admission.AdmissionError as e:
+                yield sse_event({"error": str(e), "retry_after": e.retry_after}, "error")
+            except Exception as e:
+                yield sse_event({"error": str(e)}, "error")
+            finally:
+                remember("".join(parts).strip())
+        return Response(telemetry.in_request_context(generate()), mimetype="text/event-stream",
+                        headers=SSE_HEADERS)
 
-    reply = get_supportive_response(conversation_history, diagnosed_issue, user_message)
+    reply = get_supportive_response(conversation_history, diagnosed_issue, user_message, cache)
+    remember(reply)
     return jsonify({"reply": reply})
 
 
+@bp.route("/diagnoses", methods=["GET"])
+def list_diagnoses():
+    """
+    ?session_id=&start=&end=&q=&limit=&before_id=
+    Newest first; pass the last id as before_id for the next page.
+    """
+    try:
+        limit = min(max(int(request.args.get("limit", 50)), 1), 500)
+        before_id = int(request.args["before_id"]) if request.args.get("before_id") else None
+    except ValueError:
+        return jsonify({"error": "limit and before_id must be integers"}), 400
+    try:
+        rows = DIAGNOSES.query(session_id=request.args.get("session_id"), start=request.args.get("start"),
+                               end=request.args.get("end"), text=request.args.get("q"),
+                               limit=limit, before_id=before_id)
+    except ValueError:
+        return jsonify({"error": "start and end must be ISO dates or datetimes"}), 400
+    next_before = rows[-1]["id"] if len(rows) == limit else None
+    return jsonify({"diagnoses": rows, "next_before_id": next_before})
+
+
+@bp.route("/diagnoses/<int:diagnosis_id>", methods=["GET"])
+def get_diagnosis(diagnosis_id):
+    row = DIAGNOSES.get(diagnosis_id)
+    if row is None:
+        return jsonify({"error": "Unknown diagnosis"}), 404
+    return jsonify(row)
+
+
+@bp.route("/diagnoses/export", methods=["GET"])
+def export_diagnoses():
+    """
+    Every diagnosis (optionally ?start=&end=) streamed as JSON lines or ?format=csv.
+    """
+    fmt = request.args.get("format", "jsonl")
+    if fmt not in ("jsonl", "csv"):
+        return jsonify({"error": "format must be jsonl or csv"}), 400
+    try:
+        rows = DIAGNOSES.iter_all(start=request.args.get("start"), end=request.args.get("end"))
+    except ValueError:
+        return jsonify({"error": "start and end must be ISO dates or datetimes"}), 400
+    mimetype = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return Response(export_rows(rows, fmt), mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename=diagnoses.{fmt}"})
+
+
+@bp.route("/cache_stats", methods=["GET"])
+def cache_stats():
+    """
+    LLM response cache hit/miss counters for this worker.
+    """
+    return jsonify(get_cache().stats())
+
+
+# -------------------------
+# Standalone app
+# -------------------------
+app = Flask(__name__)
+telemetry.init_routes(app)  # /metrics
+admission.init_app(app)  # 429/503 + Retry-After, /admission_stats
+app.register_blueprint(bp)
+
 # -------------------------
 # Run
 # -------------------------
@@ -0,0 +1,233 @@
+"""
+Shared HTTP client for the chat-completion providers (Mistral, Together).
+
+One pooled keep-alive requests.Session per provider, connect/read timeouts,
+retries with jittered exponential backoff on 429/5xx and connection errors
+(never after a read timeout: the provider may still be working on, and
+billing, the request), an overall deadline across attempts, and a circuit
+breaker that fails fast while a provider is down so callers can fall back
+immediately. Every call holds a slot of the process-wide "llm"
+admission gate (admission.py) for its whole duration, streams included.
+
+Configuration (environment):
+    MISTRAL_BASE_URL / TOGETHER_BASE_URL   override API roots (e.g. a local stub)
+    LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT   seconds (default 3.05 / 45)
+    LLM_MAX_RETRIES                         retries after the first attempt (default 2)
+    LLM_DEADLINE                            seconds for all attempts together (default 60)
+    LLM_BACKOFF                             base backoff in seconds (default 0.5)
+    LLM_POOL_SIZE                           keep-alive connections per provider (default 10)
+    LLM_BREAKER_THRESHOLD, LLM_BREAKER_RESET consecutive failures to open / seconds open
+"""
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from admission import gate
+from telemetry import outbound_headers
+
+PROVIDERS = {
+    "mistral": {
+        "label": "Mistral",
+        "url_env": "MISTRAL_BASE_URL",
+        "default_url": "https://api.mistral.ai/v1",
+        "key_env": "MISTRAL_API_KEY",
+    },
+    "together": {
+        "label": "Together",
+        "url_env": "TOGETHER_BASE_URL",
+        "default_url": "https://api.together.xyz/v1",
+        "key_env": "TOGETHER_API_KEY",
+    },
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class LLMError(RuntimeError):
+    pass
+
+
+class CircuitOpenError(LLMError):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures, then lets a single trial
+    request through once `reset_timeout` seconds have passed.
+    """
+
+    def __init__(self, threshold: int = 5, reset_timeout: float = 30.0):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+
+class LLMClient:
+    def __init__(self, name: str, base_url: str, api_key: str, connect_timeout: float = 3.05,
+                 read_timeout: float = 45.0, max_retries: int = 2, backoff: float = 0.5,
+                 pool_size: int = 10, breaker: CircuitBreaker = None, deadline: float = 60.0):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        })
+
+    def _retry_delay(self, attempt: int, resp=None) -> float:
+        delay = random.uniform(0, self.backoff * (2 ** attempt))  # full jitter
+        retry_after = resp.headers.get("Retry-After") if resp is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), 10.0))
+        return delay
+
+    def post(self, path: str, payload: dict, stream: bool = False) -> requests.Response:
+        """
+        POST with retries and the circuit breaker. Returns a 200 response or
+        raises LLMError (CircuitOpenError when failing fast). Every call that
+        gets past the breaker records exactly one success or failure, so a
+        half-open trial always settles the breaker.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} API unavailable (circuit open)")
+
+        url = f"{self.base_url}{path}"
+        deadline = time.monotonic() + self.deadline
+        connect_timeout, read_timeout = self.timeout
+        healthy = False
+        try:
+            for attempt in range(self.max_retries + 1):
+                resp = None
+                remaining = max(deadline - time.monotonic(), 0.1)
+                try:
+                    resp = self.session.post(url, json=payload, stream=stream, headers=outbound_headers(),
+                                             timeout=(min(connect_timeout, remaining), min(read_timeout, remaining)))
+                except requests.ConnectionError as e:  # includes ConnectTimeout; nothing reached the provider
+                    last_error = LLMError(f"{self.name} API request failed: {e}")
+                except requests.RequestException as e:  # ReadTimeout etc.: the request may be in flight
+                    raise LLMError(f"{self.name} API request failed: {e}") from e
+                else:
+                    if resp.status_code == 200:
+                        healthy = True
+                        return resp
+                    last_error = LLMError(f"{self.name} API error {resp.status_code}: {resp.text}")
+                    if resp.status_code not in RETRY_STATUSES:
+                        # A 4xx other than 429 is our fault, not the provider's.
+                        healthy = True
+                        raise last_error
+                if attempt == self.max_retries:
+                    break
+                delay = self._retry_delay(attempt, resp)
+                if time.monotonic() + delay >= deadline:
+                    break
+                time.sleep(delay)
+            raise last_error
+        finally:
+            if healthy:
+                self.breaker.record_success()
+            else:
+                self.breaker.record_failure()
+
+    def chat(self, messages: list, model: str, **params) -> str:
+        payload = {"model": model, "messages": messages, **params}
+        with gate("llm").slot():
+            data = self.post("/chat/completions", payload).json()
+        return data["choices"][0]["message"]["content"].strip()
+
+    def stream_chat(self, messages: list, model: str, **params):
+        """
+        Yield content deltas as the provider streams them (SSE, stream=true).
+        Closing the generator closes the upstream connection.
+        """
+        payload = {"model": model, "messages": messages, "stream": True, **params}
+        with gate("llm").slot():
+            resp = self.post("/chat/completions", payload, stream=True)
+            try:
+                for line in resp.iter_lines():
+                    if not line.startswith(b"data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == b"[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or [{}]
+                    token = (choices[0].get("delta") or {}).get("content")
+                    if token:
+                        yield token
+            finally:
+                resp.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(provider: str) -> LLMClient:
+    """
+    Process-wide client for a provider in PROVIDERS, created on first use.
+    """
+    with _clients_lock:
+        client = _clients.get(provider)
+        if client is None:
+            cfg = PROVIDERS[provider]
+            client = LLMClient(
+                cfg["label"], os.getenv(cfg["url_env"], cfg["default_url"]), os.getenv(cfg["key_env"], ""),
+                connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT", "3.05")),
+                read_timeout=float(os.getenv("LLM_READ_TIMEOUT", "45")),
+                max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+                backoff=float(os.getenv("LLM_BACKOFF", "0.5")),
+                pool_size=int(os.getenv("LLM_POOL_SIZE", "10")),
+                deadline=float(os.getenv("LLM_DEADLINE", "60")),
+                breaker=CircuitBreaker(int(os.getenv("LLM_BREAKER_THRESHOLD", "5")),
+                                       float(os.getenv("LLM_BREAKER_RESET", "30"))),
+            )
+            _clients[provider] = client
+        return client
@@ -0,0 +1,301 @@
+"""
+Incremental per-session mood analytics for app.py.
+
+Every mood event (the text mood of a chat message, or a facial emotion
+reading from fg.py) is appended to a fixed-size columnar ring per session and
+channel: parallel array('d') timestamps, array('b') mood indexes and
+array('f') weights. The aggregates below are updated as each event arrives,
+in O(1) (amortized for the time window, since each event leaves it once):
+
+    lifetime       counts since the session started
+    last events    counts over the last `window_events` events
+    last minutes   weighted counts over the last `window_minutes`
+    decayed        exponentially decayed scores (`half_life_minutes`)
+    trend          weighted counts and valence per `bucket_minutes` bucket,
+                   kept in a ring of `trend_buckets` buckets
+
+so summaries and trends never rescan history. Facial readings are weighted by
+confidence, mapped onto the text moods (fear -> anxious, disgust -> angry,
+surprise -> neutral) and sampled at most once per `face_interval` seconds, so
+the ring spans the time window. The fused view blends each channel's normalized decayed
+scores, so a camera sending ten frames a second does not drown out the
+occasional chat message.
+
+State is in memory, per worker process, bounded to `max_sessions` sessions
+(least recently updated dropped first). A worker forked after follow() (e.g.
+gunicorn --preload) starts its own follower on first use.
+"""
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+MOODS = ("happy", "sad", "angry", "anxious", "neutral")
+MOOD_INDEX = {m: i for i, m in enumerate(MOODS)}
+VALENCE = (1.0, -1.0, -0.7, -0.8, 0.0)
+FACE_TO_MOOD = {"happy": "happy", "sad": "sad", "angry": "angry", "disgust": "angry",
+                "fear": "anxious", "surprise": "neutral", "neutral": "neutral"}
+
+
+class EventRing:
+    """
+    Fixed-capacity ring of (timestamp, mood index, weight) in parallel arrays.
+    Events are addressed by sequence number; the last `capacity` are kept.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.ts = array("d", bytes(8 * capacity))
+        self.mood = array("b", bytes(capacity))
+        self.weight = array("f", bytes(4 * capacity))
+        self.total = 0  # events ever pushed; next sequence number
+
+    def push(self, ts: float, mood: int, weight: float) -> int:
+        seq, slot = self.total, self.total % self.capacity
+        self.ts[slot], self.mood[slot], self.weight[slot] = ts, mood, weight
+        self.total += 1
+        return seq
+
+    def last_ts(self):
+        return self.ts[(self.total - 1) % self.capacity] if self.total else None
+
+
+class ChannelStats:
+    """
+    Rolling aggregates for one channel (text or face) of one session.
+    """
+
+    def __init__(self, ring_size: int, window_events: int, window_minutes: float, half_life_minutes: float,
+                 bucket_minutes: float, trend_buckets: int):
+        self.ring = EventRing(ring_size)
+        self.window_events = min(window_events, ring_size)
+        self.window_seconds = window_minutes * 60
+        self.half_life = half_life_minutes * 60
+        self.bucket_seconds = bucket_minutes * 60
+        k = len(MOODS)
+        self.lifetime = [0] * k
+        self.event_counts = [0] * k
+        self.time_counts = [0.0] * k
+        self.time_tail = 0  # sequence number of the oldest event inside the time window
+        self.decayed = [0.0] * k
+        self.decayed_at = None
+        self.bucket_ids = array("q", [-1]) * trend_buckets
+        self.bucket_counts = array("d", bytes(8 * trend_buckets * k))
+
+    def add(self, ts: float, mood: int, weight: float):
+        ring, k = self.ring, len(MOODS)
+        if ring.total >= ring.capacity and self.time_tail <= ring.total - ring.capacity:
+            self._evict_time()  # about to be overwritten while still in the time window
+        if self.window_events:
+            # Read the event leaving the last-N window before push() can overwrite its slot.
+            if ring.total >= self.window_events:
+                self.event_counts[ring.mood[(ring.total - self.window_events) % ring.capacity]] -= 1
+            self.event_counts[mood] += 1
+        ring.push(ts, mood, weight)
+        self.lifetime[mood] += 1
+
+        self.time_counts[mood] += weight
+        self.expire(ts)
+
+        if self.decayed_at is not None:
+            factor = 0.5 ** (max(0.0, ts - self.decayed_at) / self.half_life)
+            self.decayed = [v * factor for v in self.decayed]
+        self.decayed[mood] += weight
+        self.decayed_at = ts
+
+        bucket = int(ts // self.bucket_seconds)
+        slot = bucket % len(self.bucket_ids)
+        if self.bucket_ids[slot] != bucket:
+            self.bucket_ids[slot] = bucket
+            for i in range(k):
+                self.bucket_counts[slot * k + i] = 0.0
+        self.bucket_counts[slot * k + mood] += weight
+
+    def _evict_time(self):
+        ring = self.ring
+        slot = self.time_tail % ring.capacity
+        self.time_counts[ring.mood[slot]] -= ring.weight[slot]
+        self.time_tail += 1
+
+    def expire(self, now: float):
+        ring, cutoff = self.ring, now - self.window_seconds
+        while self.time_tail < ring.total and ring.ts[self.time_tail % ring.capacity] < cutoff:
+            self._evict_time()
+
+    def decayed_at_time(self, now: float) -> list:
+        if self.decayed_at is None:
+            return [0.0] * len(MOODS)
+        factor = 0.5 ** (max(0.0, now - self.decayed_at) / self.half_life)
+        return [v * factor for v in self.decayed]
+
+    def trend(self, now: float, buckets: int) -> list:
+        """
+        The last `buckets` buckets up to `now`, oldest first: weighted counts
+        per mood and mean valence (None for empty buckets).
+        """
+        k, size = len(MOODS), len(self.bucket_ids)
+        current = int(now // self.bucket_seconds)
+        rows = []
+        for bucket in range(current - min(buckets, size) + 1, current + 1):
+            slot = bucket % size
+            counts = list(self.bucket_counts[slot * k:(slot + 1) * k]) if self.bucket_ids[slot] == bucket else [0.0] * k
+            rows.append((bucket * self.bucket_seconds, counts, valence(counts)))
+        return rows
+
+
+def valence(scores) -> float:
+    total = sum(scores)
+    return round(sum(v * s for v, s in zip(VALENCE, scores)) / total, 3) if total > 0 else None
+
+
+def shares(scores) -> dict:
+    total = sum(scores)
+    return {m: round(s / total, 3) if total > 0 else 0.0 for m, s in zip(MOODS, scores)}
+
+
+def dominant(scores):
+    best = max(range(len(MOODS)), key=lambda i: scores[i])
+    return MOODS[best] if scores[best] > 0 else None
+
+
+class MoodAnalytics:
+    def __init__(self, max_sessions: int = 1000, ring_size: int = 256, window_events: int = 20,
+                 window_minutes: float = 30.0, half_life_minutes: float = 10.0, bucket_minutes: float = 5.0,
+                 trend_buckets: int = 48, face_weight: float = 0.4, face_interval: float = 10.0):
+        self.max_sessions = max_sessions
+        self.face_weight = face_weight
+        self.face_interval = face_interval
+        self._channel_args = (ring_size, window_events, window_minutes, half_life_minutes,
+                              bucket_minutes, trend_buckets)
+        self._sessions = OrderedDict()  # session_id -> {"text": ChannelStats, "face": ChannelStats}
+        self._lock = threading.Lock()
+        self._feed = None
+        self._follower = None  # pid of the process whose thread follows _feed
+        os.register_at_fork(after_in_child=self._after_fork)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()  # may have been held by a parent thread at the fork
+
+    def _channels(self, session_id: str) -> dict:
+        channels = self._sessions.get(session_id)
+        if channels is None:
+            channels = self._sessions[session_id] = {"text": ChannelStats(*self._channel_args),
+                                                     "face": ChannelStats(*self._channel_args)}
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session_id)
+        return channels
+
+    def record_text(self, session_id: str, mood: str, ts: float = None):
+        self._ensure_following()
+        index = MOOD_INDEX.get(mood)
+        if index is None:
+            return
+        with self._lock:
+            self._channels(session_id)["text"].add(ts or time.time(), index, 1.0)
+
+    def record_face(self, session_id: str, emotion: str, confidence: float, ts: float = None):
+        """
+        One facial reading; DeepFace confidence is a percentage.
+        """
+        mood = FACE_TO_MOOD.get((emotion or "").lower())
+        if mood is None:
+            return
+        weight = min(max(float(confidence or 0.0) / 100, 0.0), 1.0)
+        ts = ts or time.time()
+        with self._lock:
+            face = self._channels(session_id)["face"]
+            last = face.ring.last_ts()
+            if last is None or ts - last >= self.face_interval:
+                face.add(ts, MOOD_INDEX[mood], weight)
+
+    def reset(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def summary(self, session_id: str, now: float = None) -> dict:
+        self._ensure_following()
+        now = now or time.time()
+        with self._lock:
+            channels = self._sessions.get(session_id)
+            if channels is None:
+                return {"session_id": session_id, "events": 0, "text": None, "face": None, "fused": None}
+            out = {"session_id": session_id}
+            decayed = {}
+            for name, stats in channels.items():
+                stats.expire(now)
+                decayed[name] = stats.decayed_at_time(now)
+                out[name] = {
+                    "events": stats.ring.total,
+                    "lifetime": dict(zip(MOODS, stats.lifetime)),
+                    "last_events": {"n": min(stats.ring.total, stats.window_events),
+                                    "counts": dict(zip(MOODS, stats.event_counts))},
+                    "last_minutes": {"minutes": stats.window_seconds / 60, "shares": shares(stats.time_counts)},
+                    "decayed": shares(decayed[name]),
+                    "valence": valence(decayed[name]),
+                    "dominant": dominant(decayed[name]),
+                } if stats.ring.total else None
+            out["events"] = sum(c.ring.total for c in channels.values())
+        out["fused"] = self._fuse(decayed["text"], decayed["face"])
+        return out
+
+    def _fuse(self, text: list, face: list):
+        parts = [(w, s) for w, s in ((1.0 - self.face_weight, text), (self.face_weight, face)) if sum(s) > 0]
+        if not parts:
+            return None
+        weight_total = sum(w for w, _ in parts)
+        fused = [sum(w * s[i] / sum(s) for w, s in parts) / weight_total for i in range(len(MOODS))]
+        return {"shares": shares(fused), "valence": valence(fused), "dominant": dominant(fused),
+                "channels": [name for name, s in (("text", text), ("face", face)) if sum(s) > 0]}
+
+    def trend(self, session_id: str, buckets: int = 12, now: float = None) -> dict:
+        self._ensure_following()
+        now = now or time.time()
+        with self._lock:
+            channels = self._sessions.get(session_id)
+            if channels is None:
+                return {"session_id": session_id, "buckets": []}
+            rows = {name: stats.trend(now, buckets) for name, stats in channels.items()}
+            bucket_minutes = channels["text"].bucket_seconds / 60
+        out = []
+        for (start, text, text_valence), (_, face, face_valence) in zip(rows["text"], rows["face"]):
+            out.append({
+                "start": datetime.fromtimestamp(start, timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+                "text": dict(zip(MOODS, (round(c, 3) for c in text))),
+                "face": dict(zip(MOODS, (round(c, 3) for c in face))),
+                "text_valence": text_valence,
+                "face_valence": face_valence,
+                "fused": self._fuse(text, face),
+            })
+        return {"session_id": session_id, "bucket_minutes": bucket_minutes, "buckets": out}
+
+    def follow(self, feed):
+        """
+        Record every facial reading `feed` (emotion_store.LatestEmotionFeed)
+        publishes, on a background thread started once per process: here, and
+        in a forked child on its first record_text/summary/trend call.
+        """
+        self._feed = feed
+        self._ensure_following()
+
+    def _ensure_following(self):
+        if self._feed is None or self._follower == os.getpid():
+            return
+        with self._lock:
+            if self._follower == os.getpid():
+                return
+            self._follower = os.getpid()
+        updates = self._feed.subscribe(None)
+
+        def run():
+            while True:
+                u = updates.get()
+                self.record_face(u["session_id"], u["emotion"], u["confidence"])
+
+        threading.Thread(target=run, name="mood-face-fusion", daemon=True).start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"sessions": len(self._sessions)}
@@ -0,0 +1,184 @@
+"""
+Local questionnaire engine for the diagnostic flow.
+
+Serves standardized screening instruments (GAD-7, PHQ-9) from a question
+graph compiled once per instrument combination, parses multiple-choice
+answers and scores them locally. Only answers that cannot be parsed and the
+final summary need the LLM (see llm_chatbot.py).
+
+The graph is gated the usual way: when the first two items of an instrument
+(GAD-2 / PHQ-2) sum to less than 3, its remaining items are skipped and the
+short form's result is reported. An instrument's safety item (PHQ-9 item 9,
+thoughts of self-harm) is never skipped.
+"""
+import re
+from functools import lru_cache
+
+RESPONSE_OPTIONS = ["Not at all", "Several days", "More than half the days", "Nearly every day"]
+OPTION_LETTERS = "ABCD"
+LEAD_IN = "Over the last 2 weeks, how often have you been bothered by"
+
+INSTRUMENTS = {
+    "gad7": {
+        "name": "GAD-7",
+        "items": [
+            "feeling nervous, anxious, or on edge",
+            "not being able to stop or control worrying",
+            "worrying too much about different things",
+            "trouble relaxing",
+            "being so restless that it's hard to sit still",
+            "becoming easily annoyed or irritable",
+            "feeling afraid as if something awful might happen",
+        ],
+        "bands": [(4, "minimal anxiety"), (9, "mild anxiety"), (14, "moderate anxiety"), (21, "severe anxiety")],
+    },
+    "phq9": {
+        "name": "PHQ-9",
+        "items": [
+            "little interest or pleasure in doing things",
+            "feeling down, depressed, or hopeless",
+            "trouble falling or staying asleep, or sleeping too much",
+            "feeling tired or having little energy",
+            "poor appetite or overeating",
+            "feeling bad about yourself, or that you are a failure or have let yourself or your family down",
+            "trouble concentrating on things, such as reading the newspaper or watching television",
+            "moving or speaking so slowly that other people could have noticed, or the opposite, "
+            "being so fidgety or restless that you have been moving around a lot more than usual",
+            "thoughts that you would be better off dead, or of hurting yourself in some way",
+        ],
+        "bands": [(4, "minimal depression"), (9, "mild depression"), (14, "moderate depression"),
+                  (19, "moderately severe depression"), (27, "severe depression")],
+        "safety_item": 8,  # any answer above "Not at all" needs a crisis resource
+    },
+}
+DEFAULT_INSTRUMENTS = ("gad7", "phq9")
+GATE_ITEMS, GATE_THRESHOLD = 2, 3
+
+LETTER_RE = re.compile(r"^\s*\(?([a-dA-D])\s*(?:[\).:\-]|$)")  # "B", "b)", "B. Several days"; not "a lot"
+DIGIT_RE = re.compile(r"^\s*([0-3])\s*$")  # a bare score; "1. Over the last..." is not an answer
+
+
+def parse_answer(text: str):
+    """
+    Score 0-3 for a multiple-choice answer ("B", "b) Several days", "2",
+    "several days"), or None if the text does not name an option.
+    """
+    text = (text or "").strip()
+    m = LETTER_RE.match(text)
+    if m:
+        return OPTION_LETTERS.index(m.group(1).upper())
+    m = DIGIT_RE.match(text)
+    if m:
+        return int(m.group(1))
+    lowered = text.lower().rstrip(".!")
+    for score, option in enumerate(RESPONSE_OPTIONS):
+        if lowered == option.lower():
+            return score
+    return None
+
+
+class QuestionGraph:
+    """
+    Nodes are (instrument, item index); node i's successor is i + 1, except
+    at a gate, where a low short-form score jumps to the instrument's safety
+    item if it has one (and from there to the next instrument), otherwise
+    straight to the next instrument.
+    """
+
+    def __init__(self, instruments=DEFAULT_INSTRUMENTS, gated: bool = True):
+        self.instruments = tuple(instruments)
+        self.gated = gated
+        self.nodes = []    # (instrument, index, question text with options)
+        self.gates = {}    # node position -> (positions summed, position to skip to)
+        self.exits = {}    # safety item position -> (positions summed, end of its instrument)
+        self.options = "\n".join(f"{OPTION_LETTERS[i]}) {o}" for i, o in enumerate(RESPONSE_OPTIONS))
+        for key in self.instruments:
+            first = len(self.nodes)
+            items = INSTRUMENTS[key]["items"]
+            for index, item in enumerate(items):
+                self.nodes.append((key, index, f"{LEAD_IN} {item}?\n{self.options}"))
+            if gated and len(items) > GATE_ITEMS:
+                short_form, end = range(first, first + GATE_ITEMS), first + len(items)
+                safety = INSTRUMENTS[key].get("safety_item")
+                if safety is not None and safety >= GATE_ITEMS:
+                    self.gates[first + GATE_ITEMS - 1] = (short_form, first + safety)
+                    self.exits[first + safety] = (short_form, end)
+                else:
+                    self.gates[first + GATE_ITEMS - 1] = (short_form, end)
+
+    def node_id(self, position: int) -> str:
+        key, index, _ = self.nodes[position]
+        return f"{key}:{index}"
+
+    def render(self, position: int, number: int) -> str:
+        return f"{number}. {self.nodes[position][2]}"
+
+    def next(self, position: int, answers: dict):
+        """
+        Position of the next question after `position`, or None when done.
+        """
+        for table in (self.gates, self.exits):
+            jump = table.get(position)
+            if jump is not None:
+                positions, skip_to = jump
+                if sum(answers.get(self.node_id(p), 0) for p in positions) < GATE_THRESHOLD:
+                    position = skip_to - 1
+        position += 1
+        return position if position < len(self.nodes) else None
+
+    def score(self, answers: dict) -> dict:
+        """
+        Per instrument: total, items answered, severity band and whether only
+        the gated short form was completed.
+        """
+        results = {}
+        for key in self.instruments:
+            spec = INSTRUMENTS[key]
+            values = [answers[f"{key}:{i}"] for i in range(len(spec["items"])) if f"{key}:{i}" in answers]
+            full = len(values) == len(spec["items"])
+            if full:
+                total = sum(values)
+                severity = next(label for limit, label in spec["bands"] if total <= limit)
+            else:
+                # The short form's score; a safety item asked after the gate is not part of it.
+                total = sum(answers.get(f"{key}:{i}", 0) for i in range(GATE_ITEMS))
+                severity = f"negative {spec['name'][:3]}-{GATE_ITEMS} screen"
+            results[key] = {"name": spec["name"], "score": total, "answered": len(values),
+                            "severity": severity, "short_form": not full}
+        return results
+
+    def safety_flag(self, answers: dict) -> bool:
+        for key in self.instruments:
+            item = INSTRUMENTS[key].get("safety_item")
+            if item is not None and answers.get(f"{key}:{item}", 0) > 0:
+                return True
+        return False
+
+
+def validate_instruments(instruments) -> tuple:
+    """
+    `instruments` as a tuple of INSTRUMENTS keys; raises ValueError naming
+    any unknown one.
+    """
+    instruments = tuple(instruments)
+    unknown = [i for i in instruments if i not in INSTRUMENTS]
+    if unknown or not instruments:
+        raise ValueError(f"Unknown screening instrument(s) {', '.join(unknown) or '(none given)'}; "
+                         f"expected some of {', '.join(INSTRUMENTS)}")
+    return instruments
+
+
+@lru_cache(maxsize=None)
+def get_graph(instruments=DEFAULT_INSTRUMENTS, gated: bool = True) -> QuestionGraph:
+    return QuestionGraph(validate_instruments(instruments), gated)
+
+
+def local_summary(scores: dict) -> str:
+    """
+    Summary used when the LLM is unavailable.
+    """
+    parts = []
+    for s in scores.values():
+        label = f"{s['name'][:3]}-{GATE_ITEMS}" if s["short_form"] else s["name"]
+        parts.append(f"{s['severity']} ({label} score {s['score']})")
+    return "Final Diagnosis: " + "; ".join(parts) + ". This is a screening result, not a clinical diagnosis."
@@ -0,0 +1,142 @@
+"""
+Run one of the backend apps behind a production WSGI server.
+
+    python serve.py app:app --port 5000 --mode async --connections 1000
+    python serve.py llm_chatbot:app --port 8000 --mode sync --threads 8
+    python serve.py fg:app --port 5001 --mode async
+    python serve.py gateway:app --port 5000 --mode async --workers 2   (every service, see gateway.py)
+
+sync   a fixed pool of worker threads; each request holds a thread for its
+       whole duration, so a 45s LLM call pins one of them.
+async  gevent: the standard library is monkey-patched, so blocking socket I/O
+       (requests to Mistral/Together, SSE relays) yields to other requests
+       instead of holding an OS thread. CPU-bound work is offloaded through
+       executors.run_blocking.
+
+--workers N forks N processes that accept on one shared listening socket;
+each imports the app itself after the fork (nothing is shared copy-on-write),
+and the parent only waits and passes SIGTERM/SIGINT on to them.
+
+gunicorn equivalents:
+    gunicorn -w 2 -k gthread --threads 8 app:app
+    gunicorn -w 2 -k gevent --worker-connections 1000 app:app
+
+fg.py loads the DeepFace model according to MODEL_LOAD (vision.ModelManager).
+To load it once and share the weights between workers copy-on-write:
+    MODEL_LOAD=prefork gunicorn --preload -w 4 -k gthread --threads 4 fg:app
+"""
+import argparse
+import importlib
+import os
+import signal
+import socket
+import sys
+
+
+def load_app(target: str):
+    module_name, _, attr = target.partition(":")
+    return getattr(importlib.import_module(module_name), attr or "app")
+
+
+def serve_sync(app, listener, threads: int):
+    from concurrent.futures import ThreadPoolExecutor
+    from werkzeug.serving import BaseWSGIServer
+
+    class PooledWSGIServer(BaseWSGIServer):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.pool = ThreadPoolExecutor(threads, thread_name_prefix="wsgi")
+
+        def process_request(self, request, client_address):
+            self.pool.submit(self._process, request, client_address)
+
+        def _process(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    host, port = listener.getsockname()[:2]
+    server = PooledWSGIServer(host, port, app, fd=listener.fileno())
+    print(f"serving (sync, {threads} threads, pid {os.getpid()}) on http://{host}:{port}", flush=True)
+    server.serve_forever()
+
+
+def serve_async(app, listener, connections: int):
+    from gevent.pool import Pool
+    from gevent.pywsgi import WSGIServer
+
+    # A gevent socket on the same descriptor (the listener is created unpatched).
+    listener = socket.socket(fileno=listener.detach())
+    host, port = listener.getsockname()[:2]
+    print(f"serving (async, {connections} connections, pid {os.getpid()}) on http://{host}:{port}", flush=True)
+    WSGIServer(listener, app, spawn=Pool(connections), log=None).serve_forever()
+
+
+def run_workers(workers: int, serve):
+    """
+    Fork `workers` processes running serve() and wait for them.
+    """
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            serve()
+            os._exit(0)
+        pids.append(pid)
+
+    def stop(signum, frame):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in pids:
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("target", help="module:attribute of the Flask app, e.g. app:app")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--mode", choices=["sync", "async"], default="sync")
+    parser.add_argument("--threads", type=int, default=8, help="worker threads (sync)")
+    parser.add_argument("--connections", type=int, default=1000, help="concurrent connections (async)")
+    parser.add_argument("--workers", type=int, default=1, help="processes sharing the listening socket")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ".")
+    listener = socket.create_server((args.host, args.port), backlog=1024)
+
+    def serve():
+        if args.mode == "async":
+            # Per worker, after the fork; must run before the app (and
+            # requests/urllib3) are imported.
+            from gevent import monkey
+            monkey.patch_all()
+        app = load_app(args.target)
+        if args.mode == "async":
+            serve_async(app, listener, args.connections)
+        else:
+            serve_sync(app, listener, args.threads)
+
+    if args.workers > 1:
+        run_workers(args.workers, serve)
+    else:
+        serve()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+Bounded chat session storage.
+
+SessionStore keeps recently used sessions in an in-process LRU with an idle
+TTL and writes every change through to an optional durable backend, so memory
+stays bounded, sessions survive restarts and several gunicorn workers can
+serve the same session. SQLiteSessionBackend stores one JSON document per
+session in a WAL-mode database.
+
+A cached session is re-validated against the backend's revision at most
+once every `freshness` seconds. Writes are compare-and-swap on that
+revision: save() raises SessionConflict if another worker wrote the session
+first, and update() reloads and re-applies its change until it lands.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class SessionConflict(RuntimeError):
+    """The session was written elsewhere since it was loaded."""
+
+
+class SQLiteSessionBackend:
+    def __init__(self, path: str, table: str = "sessions"):
+        self.path = path
+        self.table = table
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                session_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                revision INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.commit()
+
+    def _conn(self):
+        # sqlite3 connections are bound to the thread that opened them.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def revision(self, session_id: str):
+        row = self._conn().execute(
+            f"SELECT revision FROM {self.table} WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def load(self, session_id: str):
+        """
+        (data, revision) for a stored session, or None.
+        """
+        row = self._conn().execute(
+            f"SELECT data, revision FROM {self.table} WHERE session_id = ?", (session_id,)).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def save(self, session_id: str, data: dict, revision=None):
+        """
+        Store `data` if the stored revision is still `revision` (None: the
+        session must not exist yet). The new revision, or None on conflict.
+        """
+        conn = self._conn()
+        doc = json.dumps(data, ensure_ascii=False)
+        with conn:
+            if revision is None:
+                row = conn.execute(f"""
+                    INSERT INTO {self.table} (session_id, data, revision, updated_at) VALUES (?, ?, 1, ?)
+                    ON CONFLICT(session_id) DO NOTHING
+                    RETURNING revision
+                """, (session_id, doc, time.time())).fetchone()
+            else:
+                row = conn.execute(f"""
+                    UPDATE {self.table} SET data = ?, revision = revision + 1, updated_at = ?
+                    WHERE session_id = ? AND revision = ?
+                    RETURNING revision
+                """, (doc, time.time(), session_id, revision)).fetchone()
+        return row[0] if row else None
+
+    def delete(self, session_id: str):
+        conn = self._conn()
+        with conn:
+            conn.execute(f"DELETE FROM {self.table} WHERE session_id = ?", (session_id,))
+
+
+class SessionStore:
+    def __init__(self, factory, backend=None, max_sessions: int = 1000, ttl: float = 3600,
+                 freshness: float = 0.5, max_retries: int = 5):
+        """
+        factory: builds an empty session dict
+        backend: durable tier (e.g. SQLiteSessionBackend) or None for memory only
+        max_sessions / ttl: in-process cap and idle expiry in seconds
+        freshness: seconds a cached session is trusted before its revision is re-checked
+        max_retries: update() attempts after a conflicting write
+        """
+        self.factory = factory
+        self.backend = backend
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.freshness = freshness
+        self.max_retries = max_retries
+        self._cache = OrderedDict()  # session_id -> [data, revision, last_used, last_checked]
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def _evict(self, now: float):
+        while self._cache:
+            sid, entry = next(iter(self._cache.items()))
+            if len(self._cache) > self.max_sessions or now - entry[2] > self.ttl:
+                del self._cache[sid]
+            else:
+                break
+
+    def get(self, session_id: str, create: bool = True):
+        """
+        The session dict, loading it from the backend if needed. With
+        create=False an unknown session returns None and is not stored.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._cache.get(session_id)
+            if entry is not None and now - entry[2] > self.ttl:
+                del self._cache[session_id]
+                entry = None
+            if entry is not None and self.backend is not None and now - entry[3] >= self.freshness:
+                # Another worker may have written since we cached it.
+                if self.backend.revision(session_id) != entry[1]:
+                    entry = None
+                else:
+                    entry[3] = now
+            if entry is None:
+                loaded = self.backend.load(session_id) if self.backend is not None else None
+                if loaded is None:
+                    if not create:
+                        return None
+                    loaded = (self.factory(), None)
+                entry = [loaded[0], loaded[1], now, now]
+                self._cache[session_id] = entry
+            entry[2] = now
+            self._cache.move_to_end(session_id)
+            self._evict(now)
+            return entry[0]
+
+    def save(self, session_id: str, data: dict):
+        """
+        Write a (mutated) session through to the backend, provided nobody
+        else has written it since this process loaded or saved it. On a
+        conflict the cached copy is dropped and SessionConflict raised.
+        """
+        with self._lock:
+            revision = None
+            if self.backend is not None:
+                entry = self._cache.get(session_id)
+                # A dict that did not come from get() (reset(), a brand-new session)
+                # replaces whatever is stored now.
+                expected = entry[1] if entry is not None and entry[0] is data else self.backend.revision(session_id)
+                revision = self.backend.save(session_id, data, expected)
+                if revision is None:
+                    self._cache.pop(session_id, None)
+                    raise SessionConflict(f"session {session_id} was modified concurrently")
+            now = time.monotonic()
+            self._cache[session_id] = [data, revision, now, now]
+            self._cache.move_to_end(session_id)
+            self._evict(now)
+
+    def update(self, session_id: str, mutate) -> dict:
+        """
+        Apply `mutate(session)` and save it; on a conflicting write, reload
+        the session (save() dropped the stale copy) and apply it again.
+        Returns the saved session.
+        """
+        for attempt in range(self.max_retries + 1):
+            sess = self.get(session_id)
+            mutate(sess)
+            try:
+                self.save(session_id, sess)
+                return sess
+            except SessionConflict:
+                if attempt == self.max_retries:
+                    raise
+
+    def reset(self, session_id: str) -> dict:
+        data = self.factory()
+        self.save(session_id, data)
+        return data
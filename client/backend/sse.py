@@ -0,0 +1,17 @@
+"""
+Server-Sent Events helpers shared by the Flask services.
+"""
+import json
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # stop nginx from buffering the stream
+}
+
+
+def sse_event(data, event: str = None) -> str:
+    """
+    One SSE frame; `data` is JSON-encoded.
+    """
+    frame = f"event: {event}\n" if event else ""
+    return frame + f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
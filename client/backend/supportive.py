@@ -0,0 +1,58 @@
+"""
+Supportive follow-up chat after a diagnosis: the prompt builder and Together
+call shared by llm_chatbot.py's /chat and the test.py console chat, each with
+its own persona (system prompt and closing instruction).
+"""
+import telemetry
+from llm_client import get_client
+
+SUPPORTIVE_PARAMS = {
+    "model": "mistralai/Mistral-7B-Instruct-v0.1",
+    "max_tokens": 300,
+    "temperature": 0.6,
+    "top_p": 0.9
+}
+
+
+# The persona llm_chatbot.py's /chat uses; test.py passes its own.
+SUPPORTIVE_PROMPT = (
+    "You are a compassionate mental health support companion. "
+    "Your purpose is to listen with empathy and gently support users "
+    "who are experiencing emotional or mental health struggles. "
+    "Keep responses short (2–4 sentences). Avoid repeating advice. "
+    "Respect boundaries if the user asks to stop. "
+    "⚠️ Note: You are not a licensed professional. "
+)
+SUPPORTIVE_INSTRUCTION = "Provide a supportive and empathetic response."
+
+
+def supportive_messages(conversation_history, diagnosed_issue, user_message, system_prompt=SUPPORTIVE_PROMPT,
+                        instruction=SUPPORTIVE_INSTRUCTION):
+    user_prompt = (
+        f"The user has been diagnosed with: {diagnosed_issue}.\n"
+        f"User says: \"{user_message}\"\n"
+        f"{instruction}"
+    )
+
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": "\n\n".join(conversation_history) + "\n\n" + user_prompt}
+    ]
+
+
+def get_supportive_response(conversation_history, diagnosed_issue, user_message, cache=None, **persona):
+    """
+    `persona`: system_prompt / instruction overrides for supportive_messages.
+    """
+    messages = supportive_messages(conversation_history, diagnosed_issue, user_message, **persona)
+    with telemetry.span("llm"):
+        if cache is not None:
+            return cache.chat(get_client("together"), messages, **SUPPORTIVE_PARAMS)
+        return get_client("together").chat(messages, **SUPPORTIVE_PARAMS)
+
+
+def stream_supportive_response(conversation_history, diagnosed_issue, user_message, cache=None, **persona):
+    messages = supportive_messages(conversation_history, diagnosed_issue, user_message, **persona)
+    if cache is not None:
+        return cache.stream_chat(get_client("together"), messages, **SUPPORTIVE_PARAMS)
+    return get_client("together").stream_chat(messages, **SUPPORTIVE_PARAMS)
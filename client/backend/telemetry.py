@@ -0,0 +1,374 @@
+"""
+Request tracing and latency metrics shared by the backend services.
+
+    telemetry.init_app(app, "chat")    request ids, per-route histograms, /metrics
+    with telemetry.span("llm"): ...    time one stage of the current request
+
+Every request gets an id (the caller's X-Request-ID when it sends a sane
+one). It is echoed in the response and forwarded on outbound LLM calls
+(outbound_headers()), so one request can be followed through the frontend,
+the services and the provider's logs. The request's stage timings come back
+in a Server-Timing header (visible in the browser's network panel), and
+requests slower than TELEMETRY_SLOW_MS are logged with their breakdown. For
+streamed responses the request time is the time to the first byte; wrap the
+body in in_request_context() so its stages and outbound calls keep the id. Stages
+that run off the request thread (model batches, database flushes) are only
+counted in the histograms, with service="-".
+
+Histograms use fixed buckets, so recording is a bisect and two additions
+under a lock, cheap enough to leave on in production. /metrics serves them
+in the Prometheus text format; /metrics?format=json gives p50/p95/p99
+estimated from the buckets. Both are per worker process.
+
+Sampling profiler (opt-in, thread workers only): with TELEMETRY_PROFILE=1,
+requests sent with "X-Profile: 1" (plus a TELEMETRY_PROFILE_RATE fraction of
+all requests) have their thread's stack sampled every
+TELEMETRY_PROFILE_INTERVAL_MS. If the request turns out slow, the collapsed
+stacks (flame graph input) are kept for /debug/profiles.
+
+Configuration (environment):
+    TELEMETRY_ENABLED              "0" turns spans, ids and histograms off (default "1")
+    TELEMETRY_SLOW_MS              log requests slower than this (default 1000)
+    TELEMETRY_PROFILE              "1" enables the sampling profiler
+    TELEMETRY_PROFILE_RATE         fraction of requests profiled without asking (default 0)
+    TELEMETRY_PROFILE_INTERVAL_MS  sampling interval (default 5)
+"""
+import bisect
+import contextvars
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, deque
+
+ENABLED = os.getenv("TELEMETRY_ENABLED", "1") == "1"
+SLOW_SECONDS = float(os.getenv("TELEMETRY_SLOW_MS", "1000")) / 1000
+PROFILE = os.getenv("TELEMETRY_PROFILE") == "1"
+PROFILE_RATE = float(os.getenv("TELEMETRY_PROFILE_RATE", "0"))
+PROFILE_INTERVAL = float(os.getenv("TELEMETRY_PROFILE_INTERVAL_MS", "5")) / 1000
+
+PREFIX = "calmana_"
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUANTILES = (0.5, 0.95, 0.99)
+REQUEST_ID_RE = re.compile(r"^[\w.\-]{1,64}$")
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate by linear interpolation inside the bucket holding the rank
+        (the same method as Prometheus' histogram_quantile).
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+class Metrics:
+    """
+    Histograms by metric name and label set.
+    """
+
+    def __init__(self):
+        self._series = {}  # name -> {labels (tuple of pairs): Histogram}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, labels: tuple, value: float):
+        with self._lock:
+            series = self._series.setdefault(name, {})
+            hist = series.get(labels)
+            if hist is None:
+                hist = series[labels] = Histogram()
+            hist.observe(value)
+
+    def _snapshot(self):
+        with self._lock:
+            return {name: {labels: (list(h.counts), h.sum, h.count, [h.quantile(q) for q in QUANTILES])
+                           for labels, h in series.items()}
+                    for name, series in self._series.items()}
+
+    def prometheus(self) -> str:
+        lines = []
+        for name, series in sorted(self._snapshot().items()):
+            lines.append(f"# TYPE {PREFIX}{name} histogram")
+            for labels, (counts, total, count, _) in sorted(series.items()):
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                sep = "," if label_text else ""
+                cumulative = 0
+                for le, n in zip(list(BUCKETS) + ["+Inf"], counts):
+                    cumulative += n
+                    lines.append(f'{PREFIX}{name}_bucket{{{label_text}{sep}le="{le}"}} {cumulative}')
+                lines.append(f"{PREFIX}{name}_sum{{{label_text}}} {total:.6f}")
+                lines.append(f"{PREFIX}{name}_count{{{label_text}}} {count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        """
+        {name: [{labels..., count, mean_ms, p50_ms, p95_ms, p99_ms}]}
+        """
+        out = {}
+        for name, series in sorted(self._snapshot().items()):
+            rows = []
+            for labels, (_, total, count, quantiles) in sorted(series.items()):
+                row = dict(labels)
+                row.update({"count": count, "mean_ms": round(total / count * 1000, 3) if count else 0.0})
+                row.update({f"p{int(q * 100)}_ms": round(v * 1000, 3) for q, v in zip(QUANTILES, quantiles)})
+                rows.append(row)
+            out[name] = rows
+        return out
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+METRICS = Metrics()
+
+# ---------------------------------------------------------------------------
+# Request traces and spans
+# ---------------------------------------------------------------------------
+class RequestTrace:
+    __slots__ = ("request_id", "service", "start", "spans", "profiling")
+
+    def __init__(self, request_id: str, service: str):
+        self.request_id = request_id
+        self.service = service
+        self.start = time.perf_counter()
+        self.spans = []  # (stage, seconds) in completion order
+        self.profiling = False
+
+    def server_timing(self, total: float) -> str:
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.spans]
+        parts.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(parts)
+
+
+_current = contextvars.ContextVar("telemetry_trace", default=None)
+
+
+class Span:
+    """
+    Times a block as stage `name`: recorded in the stage histogram and, inside
+    a request, in that request's breakdown.
+    """
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if ENABLED:
+            observe_stage(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def span(name: str) -> Span:
+    return Span(name)
+
+
+def observe_stage(name: str, seconds: float):
+    trace = _current.get()
+    service = trace.service if trace is not None else "-"
+    METRICS.observe("stage_duration_seconds", (("service", service), ("stage", name)), seconds)
+    if trace is not None:
+        trace.spans.append((name, seconds))
+
+
+def current_request_id():
+    trace = _current.get()
+    return trace.request_id if trace is not None else None
+
+
+def outbound_headers() -> dict:
+    """
+    Headers that carry the current request id to another service.
+    """
+    trace = _current.get()
+    return {"X-Request-ID": trace.request_id} if trace is not None else {}
+
+
+def in_request_context(gen):
+    """
+    Iterate generator `gen` (a streamed response body) inside a copy of the
+    current context. Flask ends the request, and with it the trace, before
+    the server starts reading the body; without this the stream's spans
+    would count as service "-" and its LLM call would carry no request id.
+    """
+    ctx = contextvars.copy_context()  # now, while the request is still current
+
+    def run():
+        done = object()
+        try:
+            while True:
+                item = ctx.run(next, gen, done)
+                if item is done:
+                    return
+                yield item
+        finally:
+            ctx.run(gen.close)
+
+    return run()
+
+# ---------------------------------------------------------------------------
+# Sampling profiler
+# ---------------------------------------------------------------------------
+class SamplingProfiler:
+    """
+    One background thread samples the stacks of registered threads every
+    `interval` seconds via sys._current_frames(); idle when nothing is
+    registered.
+    """
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self._targets = {}  # thread id -> Counter of collapsed stacks
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pid = None
+
+    def _ensure_started(self):
+        # Threads do not survive fork; start one per worker process.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            threading.Thread(target=self._run, name="sampling-profiler", daemon=True).start()
+
+    def start(self, thread_id: int):
+        with self._lock:
+            self._ensure_started()
+            self._targets[thread_id] = Counter()
+        self._wake.set()
+
+    def stop(self, thread_id: int) -> Counter:
+        with self._lock:
+            return self._targets.pop(thread_id, Counter())
+
+    def _collapse(self, frame) -> str:
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def _run(self):
+        while True:
+            with self._lock:
+                idle = not self._targets
+                if idle:
+                    self._wake.clear()
+            if idle:
+                self._wake.wait()
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, stacks in self._targets.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[self._collapse(frame)] += 1
+
+
+PROFILER = SamplingProfiler(PROFILE_INTERVAL)
+PROFILES = deque(maxlen=int(os.getenv("TELEMETRY_PROFILE_KEEP", "20")))
+
+# ---------------------------------------------------------------------------
+# Flask integration
+# ---------------------------------------------------------------------------
+def init_routes(app):
+    """
+    The /metrics (and, with the profiler enabled, /debug/profiles) routes.
+    Metrics are per process, so register them once per app.
+    """
+    from flask import Response, jsonify, request
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        if request.args.get("format") == "json":
+            return jsonify(METRICS.summary())
+        return Response(METRICS.prometheus(), mimetype="text/plain; version=0.0.4")
+
+    if PROFILE:
+        @app.route("/debug/profiles", methods=["GET"])
+        def debug_profiles():
+            return jsonify(list(PROFILES))
+
+
+def init_app(app, service: str, routes: bool = True):
+    """
+    Register request-id/timing hooks (and, with `routes`, init_routes) on a
+    Flask app or blueprint. On a blueprint the hooks only see its requests,
+    so services mounted together keep their own `service` label.
+    """
+    from flask import request
+
+    if routes:
+        init_routes(app)
+    if not ENABLED:
+        return
+
+    @app.before_request
+    def start_trace():
+        incoming = request.headers.get("X-Request-ID", "")
+        trace = RequestTrace(incoming if REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex, service)
+        request.environ["telemetry.token"] = _current.set(trace)
+        if PROFILE and (request.headers.get("X-Profile") == "1" or random.random() < PROFILE_RATE):
+            trace.profiling = True
+            PROFILER.start(threading.get_ident())
+
+    @app.after_request
+    def finish_trace(resp):
+        trace = _current.get()
+        if trace is None:
+            return resp
+        elapsed = time.perf_counter() - trace.start
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        METRICS.observe("request_duration_seconds", (("service", service), ("route", route),
+                        ("method", request.method), ("status", str(resp.status_code))), elapsed)
+        resp.headers["X-Request-ID"] = trace.request_id
+        resp.headers["Server-Timing"] = trace.server_timing(elapsed)
+        resp.headers.setdefault("Access-Control-Expose-Headers", "X-Request-ID, Server-Timing")
+        stacks = PROFILER.stop(threading.get_ident()) if trace.profiling else None
+        if elapsed >= SLOW_SECONDS:
+            print(f"⚠️ Slow request {trace.request_id} {request.method} {route} "
+                  f"{elapsed * 1000:.0f} ms: {trace.server_timing(elapsed)}")
+        if stacks and (elapsed >= SLOW_SECONDS or request.headers.get("X-Profile") == "1"):
+            PROFILES.append({"request_id": trace.request_id, "service": service, "route": route,
+                             "duration_ms": round(elapsed * 1000, 1), "samples": sum(stacks.values()),
+                             "stacks": [f"{stack} {n}" for stack, n in stacks.most_common(50)]})
+        return resp
+
+    @app.teardown_request
+    def end_trace(exc):
+        token = request.environ.pop("telemetry.token", None)
+        if token is not None:
+            if PROFILE:
+                PROFILER.stop(threading.get_ident())
+            _current.reset(token)
@@ -1,7 +1,8 @@
 import os
-import requests
 from dotenv import load_dotenv
 
+from supportive import get_supportive_response
+
 # Load the API key from environment variables for security
 load_dotenv()
 TOGETHER_API_KEY = os.environ.get("TOGETHER_API_KEY")
@@ -9,16 +10,8 @@ TOGETHER_API_KEY = os.environ.get("TOGETHER_API_KEY")
 if not TOGETHER_API_KEY:
     raise ValueError("Error: TOGETHER_API_KEY not found in environment variables.")
 
-def get_supportive_response(conversation_history, diagnosed_issue, user_message):
-    """
-    Queries the language model with a sensitive, empathetic prompt.
-    """
-    headers = {
-        "Authorization": f"Bearer {TOGETHER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-
-    system_prompt = (
+# The console chat's own persona (see supportive.py for the shared request).
+SYSTEM_PROMPT = (
     "You are a compassionate mental health support companion. "
     "Your purpose is to listen with empathy and gently support users "
     "who are experiencing emotional or mental health struggles. "
@@ -29,30 +22,8 @@ def get_supportive_response(conversation_history, diagnosed_issue, user_message)
     "If the user says 'stop' or asks to end, respect their boundary and respond briefly with kindness. "
     "Provide reassurance and coping suggestions only when relevant. "
     "Include the professional disclaimer only once at the start of the chat."
-    )
-
-    user_prompt = (
-        f"The user has been diagnosed with: {diagnosed_issue}.\n"
-        f"User says: \"{user_message}\"\n"
-        "Provide a thoughtful, empathetic response to help them explore how they're feeling."
-    )
-
-    payload = {
-        "model": "mistralai/Mistral-7B-Instruct-v0.1",
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": "\n\n".join(conversation_history) + "\n\n" + user_prompt}
-        ],
-        "max_tokens": 300,       # allow a bit longer responses
-        "temperature": 0.6,      # reduce randomness to avoid rambling
-        "top_p": 0.9             # add nucleus sampling for variety
-    }
-
-    response = requests.post("https://api.together.xyz/v1/chat/completions", headers=headers, json=payload)
-    if response.status_code != 200:
-        raise Exception(f"API error {response.status_code}: {response.text}")
-
-    return response.json()["choices"][0]["message"]["content"].strip()
+)
+INSTRUCTION = "Provide a thoughtful, empathetic response to help them explore how they're feeling."
 
 def compassionate_followup_chat(diagnosed_issue):
     """
@@ -74,7 +45,8 @@ def compassionate_followup_chat(diagnosed_issue):
 
         conversation_history.append(f"You: {user_input}")
         try:
-            reply = get_supportive_response(conversation_history, diagnosed_issue, user_input)
+            reply = get_supportive_response(conversation_history, diagnosed_issue, user_input,
+                                            system_prompt=SYSTEM_PROMPT, instruction=INSTRUCTION)
         except Exception as e:
             print(f"Error generating response: {e}")
             break
@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+import admission
+from admission import CRITICAL, HIGH, NORMAL, Gate, MemoryBuckets, Overloaded, RateLimited, RateLimiter, SQLiteBuckets
+
+
+@pytest.mark.parametrize("make", [lambda tmp: MemoryBuckets(), lambda tmp: SQLiteBuckets(str(tmp / "rl.db"))])
+def test_token_bucket(make, tmp_path):
+    buckets = make(tmp_path)
+    assert [buckets.take("k", 1.0, 3, now=100.0)[0] for _ in range(3)] == [True] * 3
+    allowed, wait = buckets.take("k", 1.0, 3, now=100.0)
+    assert not allowed and wait == pytest.approx(1.0)
+    assert buckets.take("k", 1.0, 3, now=101.0)[0]           # one token refilled
+    assert buckets.take("other", 1.0, 3, now=101.0)[0]       # keys are independent
+    assert buckets.take("k", 1.0, 3, now=1000.0) == (True, 0.0)  # refill is capped at the burst
+
+
+def test_rate_limiter():
+    limiter = RateLimiter(admission.parse_rules("chat=0.5/2"))
+    limiter.check("chat", "a")
+    limiter.check("chat", "a")
+    with pytest.raises(RateLimited) as e:
+        limiter.check("chat", "a")
+    assert e.value.status == 429 and e.value.retry_after == 2
+    limiter.check("chat", "b")
+    limiter.check("speak", "a")  # no rule
+    with admission.priority(CRITICAL):
+        limiter.check("chat", "a")
+    assert limiter.limited == 1
+
+
+def test_parse_rules():
+    assert admission.parse_rules("chat=1/10, speak=2") == {"chat": (1.0, 10.0), "speak": (2.0, 2.0)}
+    assert admission.parse_rules("") == {}
+
+
+def test_client_key(monkeypatch):
+    app = Flask(__name__)
+    monkeypatch.setattr(admission, "TRUSTED_PROXIES", {"10.0.0.1"})
+    forwarded = {"X-Forwarded-For": "6.6.6.6, 1.2.3.4"}
+    with app.test_request_context(environ_base={"REMOTE_ADDR": "9.9.9.9"}, headers=forwarded):
+        assert admission.client_key("abc123") == "abc123"
+        assert admission.client_key("default-session") == "9.9.9.9"  # shared id; header not trusted
+        assert admission.client_key() == "9.9.9.9"
+    with app.test_request_context(environ_base={"REMOTE_ADDR": "10.0.0.1"}, headers=forwarded):
+        assert admission.client_key() == "1.2.3.4"
+
+
+def hold(gate, level, order, release_after=None):
+    def run():
+        with gate.slot(level):
+            order.append(level)
+            if release_after is not None:
+                release_after.wait(2)
+    t = threading.Thread(target=run)
+    t.start()
+    return t
+
+
+def wait_for(predicate):
+    deadline = time.monotonic() + 2
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def test_gate_serves_waiters_by_priority():
+    gate, order, busy = Gate("test", 1, 4, 2.0), [], threading.Event()
+    threads = [hold(gate, NORMAL, order, busy)]
+    wait_for(lambda: gate.running == 1)
+    threads.append(hold(gate, NORMAL, order))
+    wait_for(lambda: gate.stats()["queued"] == 1)
+    threads.append(hold(gate, HIGH, order))
+    wait_for(lambda: gate.stats()["queued"] == 2)
+    busy.set()
+    for t in threads:
+        t.join(2)
+    assert order == [NORMAL, HIGH, NORMAL]
+    assert gate.stats()["running"] == 0
+
+
+def test_gate_sheds_and_times_out_but_admits_critical():
+    gate = Gate("test", 1, 0, 0.05)
+    gate.acquire(NORMAL)
+    with pytest.raises(Overloaded):
+        gate.acquire(NORMAL)  # queue full
+    gate.acquire(CRITICAL)    # never shed
+    assert gate.stats()["running"] == 2
+    gate.release()
+    gate.release()
+
+    gate = Gate("test", 1, 1, 0.05)
+    gate.acquire(NORMAL)
+    with pytest.raises(Overloaded):
+        gate.acquire(NORMAL)  # waited, timed out
+    assert gate.counts["timed_out"] == 1 and gate.stats()["queued"] == 0
+    gate.release()
+    assert gate.stats()["running"] == 0
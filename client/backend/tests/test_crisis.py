@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from crisis import CRISIS_PATTERNS, CrisisMatcher, anchor_word
+
+
+@pytest.fixture
+def matcher():
+    return CrisisMatcher(CRISIS_PATTERNS)
+
+
+@pytest.mark.parametrize("text", [
+    "I don't want to live anymore",
+    "I don’t want to live anymore",   # right single quotation mark
+    "I donʼt want to live anymore",   # modifier letter apostrophe
+    "I don`t want to live anymore",
+    "Sometimes I think about SUICIDE",
+    "I keep thinking about self harm",
+    "thinking about self-harm again",
+])
+def test_matches(matcher, text):
+    assert matcher.match(text) is not None
+
+
+@pytest.mark.parametrize("text", [
+    "I want to live a better life",
+    "the suicidesquad movie",
+    "it would be killing myself with work",
+])
+def test_no_match(matcher, text):
+    assert matcher.match(text) is None
+
+
+def test_reports_the_pattern(matcher):
+    assert matcher.match("I don’t want to live") == r"\bI don't want to live\b"
+
+
+def test_anchor_word():
+    assert anchor_word(r"\bkill myself\b") == "myself"
+    assert anchor_word(r"\bself[-\s]?harm\b") is None
+
+
+def test_patterns_file_reload(tmp_path):
+    path = tmp_path / "patterns.txt"
+    path.write_text("# extra\n\\bhopeless\\b\n", encoding="utf-8")
+    matcher = CrisisMatcher(CRISIS_PATTERNS, path=str(path), reload_interval=0)
+    assert matcher.match("I feel hopeless") == r"\bhopeless\b"
+    path.write_text("\\bno way out\\b\n", encoding="utf-8")
+    os.utime(path, (1, 1))  # mtime change even within the filesystem's resolution
+    assert matcher.match("I feel hopeless") is None
+    assert matcher.match("there is no way out") is not None
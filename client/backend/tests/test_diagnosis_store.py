@@ -0,0 +1,38 @@
+import pytest
+
+from diagnosis_store import DiagnosisStore
+
+LEGACY_REPLY = ("Thank you for sharing. Based on your answers you may be experiencing anxiety.\n"
+                "Final Diagnosis: Generalized anxiety")
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DiagnosisStore(str(tmp_path / "diagnoses.db"))
+
+
+def test_import_legacy_file(store, tmp_path):
+    # The format save_final_diagnosis used to write: a header line, then the reply.
+    (tmp_path / "2025-03-01_10-15-00_diagnosis.txt").write_text("Final Diagnosis:\n" + LEGACY_REPLY,
+                                                                 encoding="utf-8")
+    assert store.import_text_files(str(tmp_path)) == (1, 0)
+    assert store.import_text_files(str(tmp_path)) == (0, 1)
+    [row] = store.query()
+    assert row["reply"] == LEGACY_REPLY
+    assert row["diagnosis"] == "Generalized anxiety"
+    assert row["source"] == "import"
+
+
+def test_query_accepts_iso_bounds(store):
+    for created_at in ("2026-01-01 09:59:59", "2026-01-01 10:00:00", "2026-01-01 10:30:00"):
+        store.record(LEGACY_REPLY, created_at=created_at)
+    rows = store.query(start="2026-01-01T10:00", end="2026-01-01T10:30:00Z")
+    assert [r["created_at"] for r in rows] == ["2026-01-01 10:00:00"]
+    assert len(list(store.iter_all(start="2026-01-01T10:00"))) == 2
+
+
+def test_bad_bounds_raise(store):
+    with pytest.raises(ValueError):
+        store.query(start="yesterday")
+    with pytest.raises(ValueError):
+        store.iter_all(end="2026-13-01")
@@ -0,0 +1,50 @@
+import pytest
+
+import emotion_store
+
+
+@pytest.fixture
+def conn(tmp_path):
+    path = str(tmp_path / "emotions.db")
+    emotion_store.init_db(path)
+    conn = emotion_store.connect(path)
+    rows = [("a" if i % 3 else "b", "happy", 0.5, f"2026-01-01 10:00:{i // 2:02d}") for i in range(25)]
+    conn.executemany("INSERT INTO emotions (session_id, emotion, confidence, timestamp) VALUES (?, ?, ?, ?)", rows)
+    conn.commit()
+    return conn
+
+
+def test_parse_time_converts_offsets_to_utc():
+    assert emotion_store.parse_time("2026-01-01T10:00:00+05:30") == "2026-01-01 04:30:00"
+    assert emotion_store.parse_time("2026-01-01T10:00:00Z") == "2026-01-01 10:00:00"
+    assert emotion_store.parse_time("2026-01-01T10:00") == "2026-01-01 10:00:00"
+    assert emotion_store.parse_time("2026-01-01") == "2026-01-01 00:00:00"
+    assert emotion_store.parse_time(None) is None
+    with pytest.raises(ValueError):
+        emotion_store.parse_time("tomorrow")
+
+
+def test_keyset_pages_cover_every_row_once(conn):
+    # Timestamps repeat (two rows per second), so the cursor must break ties by id.
+    seen, cursor = [], None
+    while True:
+        rows, cursor = emotion_store.history(conn, limit=4, cursor=cursor)
+        seen.extend(rows)
+        if cursor is None:
+            break
+    ids = [r["id"] for r in seen]
+    assert sorted(ids, reverse=True) == ids
+    assert sorted(ids) == list(range(1, 26))
+
+
+def test_history_filters_by_session_and_range(conn):
+    rows, cursor = emotion_store.history(conn, session_id="b", start="2026-01-01 10:00:03",
+                                         end="2026-01-01 10:00:09", limit=100)
+    assert cursor is None
+    assert rows and all(r["session_id"] == "b" for r in rows)
+    assert all("2026-01-01 10:00:03" <= r["timestamp"] < "2026-01-01 10:00:09" for r in rows)
+
+
+def test_malformed_cursor_raises_fixed_message(conn):
+    with pytest.raises(ValueError, match="^invalid cursor$"):
+        emotion_store.history(conn, cursor="not-a-cursor")
@@ -0,0 +1,106 @@
+import time
+
+import pytest
+import requests
+
+from llm_client import CircuitBreaker, CircuitOpenError, LLMClient, LLMError
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = ""
+
+
+def make_client(outcomes, **kwargs):
+    """Client whose session.post returns / raises the given outcomes in turn."""
+    client = LLMClient("Test", "http://llm.invalid", "key", backoff=0.001, **kwargs)
+    calls = []
+
+    def post(url, **_):
+        calls.append(url)
+        outcome = outcomes[min(len(calls), len(outcomes)) - 1]
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return FakeResponse(outcome) if isinstance(outcome, int) else outcome
+
+    client.session.post = post
+    return client, calls
+
+
+def test_breaker_opens_after_threshold_and_recovers_through_one_trial():
+    breaker = CircuitBreaker(threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()  # only one trial at a time
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_failed_trial_reopens_breaker():
+    breaker = CircuitBreaker(threshold=5, reset_timeout=0.05)
+    for _ in range(5):
+        breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_unexpected_error_in_trial_still_settles_breaker():
+    breaker = CircuitBreaker(threshold=1, reset_timeout=0.05)
+    client, _ = make_client([ValueError("bad payload")], breaker=breaker)
+    breaker.record_failure()
+    time.sleep(0.06)
+    with pytest.raises(ValueError):
+        client.post("/chat/completions", {})
+    assert breaker.state == "open"  # reopened, not stuck in a trial
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+def test_connection_errors_and_5xx_are_retried():
+    client, calls = make_client([requests.ConnectionError("refused"), 503, 200], max_retries=2)
+    assert client.post("/chat/completions", {}).status_code == 200
+    assert len(calls) == 3
+    assert client.breaker.failures == 0
+
+
+def test_read_timeout_is_not_retried():
+    client, calls = make_client([requests.ReadTimeout("slow"), 200], max_retries=2)
+    with pytest.raises(LLMError):
+        client.post("/chat/completions", {})
+    assert len(calls) == 1
+    assert client.breaker.failures == 1
+
+
+def test_client_errors_are_not_retried_and_do_not_trip_breaker():
+    client, calls = make_client([400], max_retries=2)
+    with pytest.raises(LLMError):
+        client.post("/chat/completions", {})
+    assert len(calls) == 1
+    assert client.breaker.failures == 0
+
+
+def test_deadline_stops_retries():
+    client, calls = make_client([FakeResponse(503, {"Retry-After": "5"})], max_retries=5, deadline=0.5)
+    t0 = time.monotonic()
+    with pytest.raises(LLMError):
+        client.post("/chat/completions", {})
+    assert time.monotonic() - t0 < 0.5
+    assert len(calls) == 1
+
+
+def test_open_breaker_fails_fast():
+    client, calls = make_client([503], max_retries=0, breaker=CircuitBreaker(threshold=1, reset_timeout=60))
+    with pytest.raises(LLMError):
+        client.post("/chat/completions", {})
+    with pytest.raises(CircuitOpenError):
+        client.post("/chat/completions", {})
+    assert len(calls) == 1
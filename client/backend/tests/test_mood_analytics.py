@@ -0,0 +1,66 @@
+import os
+import random
+import time
+
+import pytest
+
+import emotion_store
+from mood_analytics import MOODS, ChannelStats, MoodAnalytics
+
+
+def brute_force_counts(moods, window):
+    counts = [0] * len(MOODS)
+    for m in moods[-window:]:
+        counts[m] += 1
+    return counts
+
+
+def test_event_window_equal_to_ring_size():
+    stats = ChannelStats(ring_size=8, window_events=8, window_minutes=60, half_life_minutes=10,
+                         bucket_minutes=5, trend_buckets=4)
+    rng = random.Random(7)
+    moods = []
+    for i in range(100):
+        mood = rng.randrange(len(MOODS))
+        moods.append(mood)
+        stats.add(float(i), mood, 1.0)
+        assert stats.event_counts == brute_force_counts(moods, 8)
+
+
+def test_event_window_smaller_than_ring():
+    stats = ChannelStats(ring_size=8, window_events=3, window_minutes=60, half_life_minutes=10,
+                         bucket_minutes=5, trend_buckets=4)
+    moods = [i % len(MOODS) for i in range(30)]
+    for i, mood in enumerate(moods):
+        stats.add(float(i), mood, 1.0)
+    assert stats.event_counts == brute_force_counts(moods, 3)
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_worker_follows_feed(tmp_path):
+    path = str(tmp_path / "emotions.db")
+    emotion_store.init_db(path)
+    analytics = MoodAnalytics(face_interval=0)
+    analytics.follow(emotion_store.LatestEmotionFeed(path, poll_interval=0.01))
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:  # pre-forked worker: first use restarts the follower
+        ok = False
+        try:
+            analytics.summary("s")
+            time.sleep(0.2)
+            writer = emotion_store.EmotionWriter(path)
+            writer.write([("fear", 80.0)], "s")
+            deadline = time.time() + 5
+            while time.time() < deadline and not ok:
+                face = analytics.summary("s")["face"]
+                ok = bool(face and face["events"])
+                time.sleep(0.02)
+        finally:
+            os.write(write_fd, b"1" if ok else b"0")
+            os._exit(0)
+    os.close(write_fd)
+    result = os.read(read_fd, 1)
+    os.waitpid(pid, 0)
+    assert result == b"1"
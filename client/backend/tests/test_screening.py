@@ -0,0 +1,66 @@
+import pytest
+
+import screening
+from screening import QuestionGraph, parse_answer
+
+
+def walk(graph, answers):
+    """Answer `answers` in order; the node ids asked and the answers recorded."""
+    position, asked, recorded = 0, [], {}
+    for value in answers:
+        asked.append(graph.node_id(position))
+        recorded[graph.node_id(position)] = value
+        position = graph.next(position, recorded)
+        if position is None:
+            break
+    return asked, recorded, position
+
+
+def test_low_short_forms_still_ask_safety_item():
+    graph = QuestionGraph()
+    asked, answers, position = walk(graph, [0, 0, 0, 1, 1])
+    assert asked == ["gad7:0", "gad7:1", "phq9:0", "phq9:1", "phq9:8"]
+    assert position is None
+    assert graph.safety_flag(answers)
+    assert not graph.safety_flag({**answers, "phq9:8": 0})
+
+
+def test_safety_item_not_in_short_form_score():
+    graph = QuestionGraph()
+    _, answers, _ = walk(graph, [0, 1, 1, 0, 3])
+    scores = graph.score(answers)
+    assert scores["phq9"]["short_form"] and scores["phq9"]["score"] == 1
+    assert scores["phq9"]["answered"] == 3
+    assert scores["gad7"]["score"] == 1
+
+
+def test_positive_screen_asks_every_item():
+    graph = QuestionGraph()
+    asked, answers, position = walk(graph, [2, 2] + [1] * 5 + [1, 2] + [0] * 7)
+    assert position is None
+    assert len(asked) == len(graph.nodes)
+    assert not graph.safety_flag(answers)
+    assert graph.score(answers)["gad7"] == {"name": "GAD-7", "score": 9, "answered": 7,
+                                            "severity": "mild anxiety", "short_form": False}
+
+
+def test_ungated_graph_is_linear():
+    graph = QuestionGraph(gated=False)
+    asked, _, _ = walk(graph, [0] * len(graph.nodes))
+    assert len(asked) == len(graph.nodes)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("B", 1), ("b) several days", 1), ("(D)", 3), ("2", 2), ("nearly every day", 3),
+    ("a lot", None), ("1. Over the last two weeks", None),
+])
+def test_parse_answer(text, expected):
+    assert parse_answer(text) == expected
+
+
+def test_unknown_instrument_is_named():
+    with pytest.raises(ValueError, match="phq8"):
+        screening.validate_instruments(["gad7", "phq8"])
+    with pytest.raises(ValueError):
+        screening.validate_instruments([])
+    assert screening.validate_instruments(["phq9"]) == ("phq9",)
@@ -0,0 +1,64 @@
+import pytest
+
+from session_store import SessionConflict, SessionStore, SQLiteSessionBackend
+
+
+def new_session():
+    return {"history": []}
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two stores over one database, like two gunicorn workers."""
+    path = str(tmp_path / "sessions.db")
+    return [SessionStore(new_session, SQLiteSessionBackend(path), freshness=0) for _ in range(2)]
+
+
+def test_save_rejects_a_stale_copy(workers):
+    a, b = workers
+    a.update("s", lambda s: s["history"].append("a1"))
+    stale = b.get("s")
+    a.update("s", lambda s: s["history"].append("a2"))
+    stale["history"].append("b1")
+    with pytest.raises(SessionConflict):
+        b.save("s", stale)
+    assert b.get("s")["history"] == ["a1", "a2"]
+
+
+def test_update_reapplies_after_a_conflict(workers):
+    a, b = workers
+    b.get("s")
+    calls = []
+
+    def append(sess):
+        calls.append(1)
+        if len(calls) == 1:
+            a.update("s", lambda s: s["history"].append("a"))  # lands first
+        sess["history"].append("b")
+
+    b.update("s", append)
+    assert len(calls) == 2
+    assert a.get("s")["history"] == ["a", "b"]
+
+
+def test_reset_overwrites(workers):
+    a, b = workers
+    a.update("s", lambda s: s["history"].append("a"))
+    b.reset("s")
+    assert a.get("s") == new_session()
+
+
+def test_revision_check_is_throttled(tmp_path):
+    backend = SQLiteSessionBackend(str(tmp_path / "sessions.db"))
+    checks = []
+    revision = backend.revision
+    backend.revision = lambda sid: checks.append(sid) or revision(sid)
+    store = SessionStore(new_session, backend, freshness=60)
+    store.update("s", lambda s: s["history"].append("x"))
+    checks.clear()
+    for _ in range(5):
+        store.get("s")
+    assert checks == []
+    store.freshness = 0
+    store.get("s")
+    assert checks == ["s"]
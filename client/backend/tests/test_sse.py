@@ -0,0 +1,79 @@
+import json
+
+from flask import Flask, Response
+
+from llm_client import LLMClient
+from sse import SSE_HEADERS, sse_event
+
+
+def parse(stream: str) -> list:
+    """(event, data) per frame, the way a browser's EventSource splits them."""
+    frames = []
+    for block in stream.split("\n\n")[:-1]:
+        event, data = "message", []
+        for line in block.split("\n"):
+            field, _, value = line.partition(": ")
+            if field == "event":
+                event = value
+            elif field == "data":
+                data.append(value)
+        frames.append((event, json.loads("\n".join(data))))
+    return frames
+
+
+def test_frames():
+    assert sse_event({"token": "Hi"}, "token") == 'event: token\ndata: {"token": "Hi"}\n\n'
+    assert sse_event("x") == 'data: "x"\n\n'
+
+
+def test_newlines_and_unicode_stay_in_one_data_line():
+    frame = sse_event({"token": "line one\n\nline two — ok"}, "token")
+    assert frame.count("\n") == 3  # event line, data line, terminating blank line
+    assert "—" in frame
+    assert parse(frame) == [("token", {"token": "line one\n\nline two — ok"})]
+
+
+def test_streamed_response():
+    app = Flask(__name__)
+
+    @app.route("/stream")
+    def stream():
+        def generate():
+            yield sse_event({"emotion": "sad"}, "meta")
+            for token in ("I'm ", "here."):
+                yield sse_event({"token": token}, "token")
+            yield sse_event({"reply": "I'm here."}, "done")
+        return Response(generate(), mimetype="text/event-stream", headers=SSE_HEADERS)
+
+    resp = app.test_client().get("/stream")
+    assert resp.mimetype == "text/event-stream"
+    assert resp.headers["Cache-Control"] == "no-cache" and resp.headers["X-Accel-Buffering"] == "no"
+    assert parse(resp.get_data(as_text=True)) == [
+        ("meta", {"emotion": "sad"}), ("token", {"token": "I'm "}), ("token", {"token": "here."}),
+        ("done", {"reply": "I'm here."})]
+
+
+class FakeStream:
+    status_code = 200
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.closed = False
+
+    def iter_lines(self):
+        return iter(self.lines)
+
+    def close(self):
+        self.closed = True
+
+
+def test_provider_stream_is_parsed_until_done():
+    def delta(content):
+        return b"data: " + json.dumps({"choices": [{"delta": {"content": content}}]}).encode()
+
+    upstream = FakeStream([b": keep-alive", delta("Hel"), b"", delta(None), delta("lo"), b"data: [DONE]",
+                           delta("ignored")])
+    client = LLMClient("Test", "http://llm.invalid", "key")
+    client.session.post = lambda url, **_: upstream
+    assert list(client.stream_chat([{"role": "user", "content": "hi"}], "m")) == ["Hel", "lo"]
+    assert upstream.closed
@@ -0,0 +1,46 @@
+from flask import Flask, Response
+
+import telemetry
+
+
+def make_app(seen):
+    app = Flask(__name__)
+    telemetry.init_app(app, "stream-test", routes=False)
+
+    @app.route("/stream")
+    def stream():
+        def generate():
+            yield "a"
+            with telemetry.span("stream_stage"):
+                seen.append(telemetry.outbound_headers())
+            yield "b"
+        return Response(telemetry.in_request_context(generate()), mimetype="text/event-stream")
+
+    return app
+
+
+def test_stream_keeps_request_context():
+    seen = []
+    resp = make_app(seen).test_client().get("/stream", headers={"X-Request-ID": "req-123"})
+    assert resp.get_data(as_text=True) == "ab"
+    assert resp.headers["X-Request-ID"] == "req-123"
+    assert seen == [{"X-Request-ID": "req-123"}]
+    stages = telemetry.METRICS.summary()["stage_duration_seconds"]
+    assert {"service": "stream-test", "stage": "stream_stage"} in [
+        {k: row[k] for k in ("service", "stage")} for row in stages]
+
+
+def test_closing_the_stream_closes_the_generator():
+    closed = []
+
+    def generate():
+        try:
+            yield 1
+            yield 2
+        finally:
+            closed.append(telemetry.current_request_id())
+
+    stream = telemetry.in_request_context(generate())
+    assert next(stream) == 1
+    stream.close()
+    assert closed == [None]
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+import vision
+
+FRAME = np.zeros((8, 8, 3), np.uint8)
+RESULT = {"dominant_emotion": "happy", "emotion": {"happy": 90.0, "sad": 10.0}}
+
+
+class FakeDeepFace:
+    def __init__(self, batch_error=None):
+        self.batch_error = batch_error
+        self.calls = []
+
+    def analyze(self, img, **_):
+        self.calls.append(img.ndim)
+        if img.ndim == 4:
+            if self.batch_error:
+                raise self.batch_error
+            return [RESULT] * len(img)
+        return [RESULT]
+
+
+@pytest.fixture
+def deepface(monkeypatch):
+    def install(fake):
+        monkeypatch.setattr(vision.MODELS, "get", lambda timeout=None: fake)
+        monkeypatch.setattr(vision, "_batch_supported", None)
+        return fake
+    return install
+
+
+def test_batch_runs_in_one_call(deepface):
+    fake = deepface(FakeDeepFace())
+    results = vision.analyze_batch([FRAME] * 3)
+    assert [r["emotion"] for r in results] == ["happy"] * 3
+    assert fake.calls == [4]
+    assert vision._batch_supported is True
+
+
+def test_rejected_batch_input_disables_batching(deepface):
+    fake = deepface(FakeDeepFace(ValueError("expected a 3-D image")))
+    assert len(vision.analyze_batch([FRAME] * 2)) == 2
+    assert vision._batch_supported is False
+    fake.calls.clear()
+    vision.analyze_batch([FRAME] * 2)
+    assert fake.calls == [3, 3]  # no further batch attempts
+
+
+def test_other_failures_fall_back_for_that_call_only(deepface):
+    fake = deepface(FakeDeepFace(RuntimeError("transient")))
+    assert len(vision.analyze_batch([FRAME] * 2)) == 2
+    assert vision._batch_supported is None
+    fake.batch_error = None
+    fake.calls.clear()
+    vision.analyze_batch([FRAME] * 2)
+    assert fake.calls == [4]
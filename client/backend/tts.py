@@ -0,0 +1,326 @@
+"""
+Text-to-speech for /speak.
+
+Synthesis runs on the "tts" executor pool (see executors.py). Each pool
+thread keeps one long-lived pyttsx3 engine, and the male/female voice ids are
+resolved once when the first engine starts instead of on every request.
+pyttsx3 itself is imported when the first engine starts, not with this module.
+
+Rendered WAVs go into a content-addressed AudioCache keyed on (text, voice):
+an in-memory LRU capped by size that spills evicted clips to disk, so fixed
+replies such as the crisis message are synthesized once and can be
+pre-rendered at boot.
+
+pyttsx3 can only render to a file, so each engine renders into one reused
+scratch file in a per-process directory on tmpfs (/dev/shm when available),
+removed at exit; audio is handed to callers as bytes. speak_stream() renders
+sentence by sentence and yields a streaming WAV as each sentence completes,
+and encode() converts to Opus/MP3 with ffmpeg when it is installed.
+
+Cache misses hold a slot of the "tts" admission gate (admission.py) while
+they synthesize, so a burst of new texts is queued or shed (Overloaded)
+instead of piling up behind the pool; cache hits never wait.
+"""
+import atexit
+import hashlib
+import io
+import os
+import re
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+import wave
+from collections import OrderedDict
+
+from admission import gate
+from executors import pool_size, submit
+
+SENTENCE_RE = re.compile(r"(?<=[.!?…])\s+|\n+")
+
+ENCODINGS = {
+    "opus": ("audio/ogg", ["-c:a", "libopus", "-b:a", "32k", "-f", "ogg"]),
+    "mp3": ("audio/mpeg", ["-c:a", "libmp3lame", "-b:a", "64k", "-f", "mp3"]),
+}
+
+
+def split_sentences(text: str) -> list:
+    return [s.strip() for s in SENTENCE_RE.split(text) if s.strip()]
+
+
+def read_wav(data: bytes):
+    """
+    (params, pcm_frames) of a WAV file held in memory.
+    """
+    with wave.open(io.BytesIO(data), "rb") as w:
+        return w.getparams(), w.readframes(w.getnframes())
+
+
+def streaming_wav_header(params) -> bytes:
+    """
+    RIFF/WAVE header with the sizes left at 0xFFFFFFFF, the usual marker for
+    a WAV whose length is not known up front.
+    """
+    block_align = params.nchannels * params.sampwidth
+    return (b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, params.nchannels, params.framerate,
+                                    params.framerate * block_align, block_align, params.sampwidth * 8)
+            + b"data" + struct.pack("<I", 0xFFFFFFFF))
+
+
+def encode(wav_bytes: bytes, fmt: str) -> bytes:
+    """
+    Transcode WAV bytes to `fmt` ("opus" or "mp3") through an ffmpeg pipe.
+    """
+    if fmt not in ENCODINGS:
+        raise ValueError(f"Unsupported audio format '{fmt}'")
+    if not shutil.which("ffmpeg"):
+        raise RuntimeError("ffmpeg is required for compressed audio")
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-f", "wav", "-i", "pipe:0",
+           *ENCODINGS[fmt][1], "pipe:1"]
+    return subprocess.run(cmd, input=wav_bytes, stdout=subprocess.PIPE, check=True).stdout
+
+
+def _scratch_root() -> str:
+    return "/dev/shm" if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK) else None
+
+
+def _remove_stale_scratch_dirs(root):
+    # Dirs are named calmana-tts-<pid>-*; drop those whose process is gone.
+    root = root or tempfile.gettempdir()
+    for name in os.listdir(root):
+        if not name.startswith("calmana-tts-"):
+            continue
+        try:
+            pid = int(name.split("-")[2])
+            os.kill(pid, 0)
+        except (ValueError, IndexError):
+            continue
+        except ProcessLookupError:
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+        except PermissionError:
+            pass
+
+
+class AudioCache:
+    def __init__(self, max_bytes: int = 32 << 20, spill_dir: str = None, spill_max_bytes: int = 256 << 20):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self.hits = self.misses = 0
+        self._items = OrderedDict()  # key -> bytes
+        self._size = 0
+        self._lock = threading.Lock()
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    @staticmethod
+    def key(text: str, voice: str) -> str:
+        return hashlib.sha256(f"{voice}\0{text}".encode("utf-8")).hexdigest()
+
+    def _spill_path(self, key: str) -> str:
+        return os.path.join(self.spill_dir, f"{key}.clip")
+
+    def get(self, key: str):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return data
+        if self.spill_dir:
+            try:
+                with open(self._spill_path(key), "rb") as f:
+                    data = f.read()
+            except OSError:
+                data = None
+            if data is not None:
+                self.put(key, data)
+                with self._lock:
+                    self.hits += 1
+                return data
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes):
+        spilled = []
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._items[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes and self._items:
+                k, v = self._items.popitem(last=False)
+                self._size -= len(v)
+                spilled.append((k, v))
+        for k, v in spilled:
+            self._spill(k, v)
+
+    def _spill(self, key: str, data: bytes):
+        if not self.spill_dir or len(data) > self.spill_max_bytes:
+            return
+        path = self._spill_path(key)
+        if os.path.exists(path):
+            return
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self._prune_spill()
+
+    def _prune_spill(self):
+        entries = []
+        for name in os.listdir(self.spill_dir):
+            if name.endswith(".clip"):
+                st = os.stat(os.path.join(self.spill_dir, name))
+                entries.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.spill_max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.spill_dir, name))
+                total -= size
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._size, "hits": self.hits, "misses": self.misses}
+
+
+class TTSService:
+    def __init__(self, cache: AudioCache = None, pool: str = "tts"):
+        self.cache = cache or AudioCache()
+        self.pool = pool
+        self.gate = gate(pool)
+        self.voices = None  # {"male": id, "female": id}
+        self._voices_lock = threading.Lock()
+        self._local = threading.local()
+        root = _scratch_root()
+        _remove_stale_scratch_dirs(root)
+        self._scratch_dir = tempfile.mkdtemp(prefix=f"calmana-tts-{os.getpid()}-", dir=root)
+        atexit.register(shutil.rmtree, self._scratch_dir, True)
+
+    # ── runs on the tts pool threads ────────────────────────────────────────
+    def _resolve_voices(self, engine) -> dict:
+        voices = engine.getProperty("voices") or []
+        resolved = {}
+        for v in voices:
+            name = (v.name or "").lower()
+            if "female" in name:
+                resolved.setdefault("female", v.id)
+            elif "male" in name:
+                resolved.setdefault("male", v.id)
+        return resolved
+
+    def _engine(self):
+        engine = getattr(self._local, "engine", None)
+        if engine is None:
+            import pyttsx3
+
+            # A fresh Engine per thread; pyttsx3.init() would hand every
+            # thread the same cached instance.
+            engine = pyttsx3.Engine()
+            with self._voices_lock:
+                if self.voices is None:
+                    self.voices = self._resolve_voices(engine)
+            self._local.engine = engine
+            self._local.scratch = os.path.join(self._scratch_dir, f"{threading.get_ident()}.wav")
+        return engine
+
+    def _synthesize(self, text: str, gender: str) -> bytes:
+        engine = self._engine()
+        voice = self.voices.get(gender)
+        if voice:
+            engine.setProperty("voice", voice)
+        engine.save_to_file(text, self._local.scratch)
+        engine.runAndWait()
+        with open(self._local.scratch, "rb") as f:
+            return f.read()
+
+    # ── public API ──────────────────────────────────────────────────────────
+    def warm(self):
+        """
+        Start one engine per pool thread (and resolve voice ids) up front.
+        """
+        futures = [submit(self.pool, self._engine) for _ in range(pool_size(self.pool))]
+        for f in futures:
+            f.result()
+
+    def speak(self, text: str, gender: str = "female") -> bytes:
+        """
+        WAV bytes for `text`, from the cache when possible.
+        """
+        gender = "male" if gender == "male" else "female"
+        key = AudioCache.key(text, gender)
+        data = self.cache.get(key)
+        if data is None:
+            with self.gate.slot():
+                data = submit(self.pool, self._synthesize, text, gender).result()
+            self.cache.put(key, data)
+        return data
+
+    def speak_stream(self, text: str, gender: str = "female"):
+        """
+        A streaming WAV: the header, then PCM for each sentence as soon as it
+        is rendered. All sentences are queued up front (so admission is
+        decided before the first byte) and the pool never idles between them;
+        each one is cached on its own.
+        """
+        gender = "male" if gender == "male" else "female"
+        pending = []
+        for sentence in split_sentences(text):
+            key = AudioCache.key(sentence, gender)
+            pending.append((key, sentence, self.cache.get(key)))
+        misses = sum(data is None for _, _, data in pending)
+        if misses:
+            self.gate.acquire()
+            left, lock = [misses], threading.Lock()
+
+            def finished(_):
+                with lock:
+                    left[0] -= 1
+                    if left[0]:
+                        return
+                self.gate.release()
+
+        queued = []
+        for key, sentence, data in pending:
+            if data is None:
+                data = submit(self.pool, self._synthesize, sentence, gender)
+                data.add_done_callback(finished)
+            queued.append((key, data))
+        return self._stream(queued)
+
+    def _stream(self, pending: list):
+        header_sent = False
+        for key, item in pending:
+            data = item if isinstance(item, bytes) else item.result()
+            if not isinstance(item, bytes):
+                self.cache.put(key, data)
+            params, frames = read_wav(data)
+            if not header_sent:
+                yield streaming_wav_header(params)
+                header_sent = True
+            yield frames
+
+    def speak_encoded(self, text: str, gender: str, fmt: str) -> bytes:
+        """
+        Compressed audio (see encode()), cached alongside the WAVs.
+        """
+        gender = "male" if gender == "male" else "female"
+        key = AudioCache.key(text, f"{gender}.{fmt}")
+        data = self.cache.get(key)
+        if data is None:
+            data = encode(self.speak(text, gender), fmt)
+            self.cache.put(key, data)
+        return data
+
+    def prerender(self, texts, genders=("female", "male")):
+        for text in texts:
+            for gender in genders:
+                self.speak(text, gender)
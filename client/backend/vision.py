@@ -0,0 +1,313 @@
+"""
+DeepFace emotion inference helpers for fg.py.
+
+analyze_batch() runs several frames through the emotion model in one call,
+aggregate() smooths per-frame scores into one reading, MicroBatcher merges
+concurrent single-frame requests that arrive within a few milliseconds of
+each other into one batch, and FrameGate skips inference on frames that look
+the same as the last analyzed one.
+
+DeepFace (and TensorFlow behind it) is only imported by MODELS, the shared
+ModelManager, so importing this module is cheap.
+"""
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+
+from executors import run_blocking, submit
+from telemetry import span
+
+_batch_supported = None  # unknown until the first multi-frame call
+
+
+class ModelUnavailable(RuntimeError):
+    pass
+
+
+class ModelManager:
+    """
+    Loads DeepFace's emotion model once per process, in one of three modes:
+
+    lazy        nothing at startup; the first inference loads the model.
+    background  loading starts on the "vision" executor at startup; other
+                routes serve meanwhile and inference waits for it.
+    prefork     load the weights synchronously at import, without running
+                inference. With `gunicorn --preload` that happens once in the
+                master, and forked workers share the weights copy-on-write;
+                each worker's first inference creates TensorFlow's thread
+                pools after the fork, where they are safe to use.
+    """
+    MODES = ("lazy", "background", "prefork")
+
+    def __init__(self):
+        self.mode = "lazy"
+        self.state = "idle"  # idle -> loading -> ready | failed
+        self.error = None
+        self.load_seconds = None
+        self._deepface = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def start(self, mode: str = "background"):
+        if mode not in self.MODES:
+            raise ValueError(f"MODEL_LOAD must be one of {', '.join(self.MODES)}")
+        self.mode = mode
+        if mode == "background":
+            submit("vision", self.load)
+        elif mode == "prefork":
+            self.load(warmup=False)
+
+    def load(self, warmup: bool = True):
+        with self._lock:
+            if self.state in ("ready", "loading"):
+                return
+            self.state = "loading"
+        print("⏳ Loading DeepFace model...")
+        t0 = time.perf_counter()
+        try:
+            from deepface import DeepFace
+            if warmup:
+                DeepFace.analyze(np.zeros((100, 100, 3), dtype=np.uint8), actions=["emotion"], enforce_detection=False)
+            else:
+                try:
+                    DeepFace.build_model(task="facial_attribute", model_name="Emotion")
+                except TypeError:  # DeepFace < 0.0.90
+                    DeepFace.build_model("Emotion")
+            self._deepface = DeepFace
+            self.load_seconds = round(time.perf_counter() - t0, 3)
+            self.state = "ready"
+            print(f"✅ DeepFace model loaded in {self.load_seconds}s.")
+        except Exception as e:
+            self.error = str(e)
+            self.state = "failed"
+            print("⚠️ DeepFace model failed to load:", self.error)
+        finally:
+            self._done.set()
+
+    def get(self, timeout: float = None):
+        """
+        The DeepFace module, loading it first if nothing has yet. Raises
+        ModelUnavailable if loading failed or does not finish within `timeout`.
+        """
+        if self._deepface is None and self.state == "idle":
+            self.load()
+        if not self._done.wait(timeout):
+            raise ModelUnavailable("Emotion model is still loading")
+        if self._deepface is None:
+            raise ModelUnavailable(f"Emotion model failed to load: {self.error}")
+        return self._deepface
+
+    def ready(self) -> bool:
+        """
+        Whether inference can be served: loaded, or (lazy) not yet tried.
+        """
+        return self.state == "ready" or (self.mode == "lazy" and self.state == "idle")
+
+    def status(self) -> dict:
+        return {"mode": self.mode, "state": self.state, "load_seconds": self.load_seconds, "error": self.error}
+
+
+MODELS = ModelManager()
+MODEL_WAIT = 30.0  # seconds an inference waits for a model that is still loading
+
+
+def decode_image(data: bytes):
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+def _normalize(result) -> dict:
+    while isinstance(result, list):
+        result = result[0] if result else {}
+    dominant = result.get("dominant_emotion", "Unknown")
+    scores = {k: float(v) for k, v in (result.get("emotion") or {}).items()}
+    return {"emotion": str(dominant), "confidence": scores.get(dominant, 0.0), "scores": scores}
+
+
+def _analyze_one(frame) -> dict:
+    deepface = MODELS.get(MODEL_WAIT)
+    with span("deepface"):
+        return _normalize(deepface.analyze(frame, actions=["emotion"], enforce_detection=False))
+
+
+def analyze_batch(frames: list) -> list:
+    """
+    Emotion results for a list of BGR frames, in order.
+
+    Frames are resized to the first frame's shape and passed to DeepFace as
+    one (N, H, W, 3) array, which recent DeepFace releases run through the
+    emotion model as a single batch. Releases that reject 4-D input (a
+    TypeError or ValueError before any batch has succeeded) fall back to one
+    call per frame for the life of the process; any other failure falls back
+    for this call only.
+    """
+    global _batch_supported
+    if len(frames) == 1 or _batch_supported is False:
+        return [_analyze_one(f) for f in frames]
+
+    deepface = MODELS.get(MODEL_WAIT)
+    h, w = frames[0].shape[:2]
+    batch = np.stack([f if f.shape[:2] == (h, w) else cv2.resize(f, (w, h)) for f in frames])
+    try:
+        with span("deepface"):
+            results = deepface.analyze(batch, actions=["emotion"], enforce_detection=False)
+        if not isinstance(results, list) or len(results) != len(frames):
+            raise ValueError("unexpected batch output")
+        _batch_supported = True
+        return [_normalize(r) for r in results]
+    except (TypeError, ValueError):
+        if _batch_supported is None:
+            _batch_supported = False  # this release does not take batched input
+        return [_analyze_one(f) for f in frames]
+    except Exception as e:
+        print("⚠️ Batched inference failed, analyzing frames one by one:", str(e))
+        return [_analyze_one(f) for f in frames]
+
+
+def aggregate(results: list, alpha: float = 0.5) -> dict:
+    """
+    Smoothed reading over a sequence of per-frame results: an exponential
+    moving average of the emotion scores (later frames weigh more), plus the
+    plain mean for reference.
+    """
+    if not results:
+        return {"emotion": "Unknown", "confidence": 0.0, "scores": {}, "mean": {}}
+    ema, mean = {}, {}
+    for r in results:
+        for k, v in r["scores"].items():
+            ema[k] = v if k not in ema else alpha * v + (1 - alpha) * ema[k]
+            mean[k] = mean.get(k, 0.0) + v / len(results)
+    if not ema:
+        return {"emotion": results[-1]["emotion"], "confidence": results[-1]["confidence"], "scores": {}, "mean": {}}
+    dominant = max(ema, key=ema.get)
+    return {"emotion": dominant, "confidence": ema[dominant], "scores": ema, "mean": mean}
+
+
+class MicroBatcher:
+    """
+    Collects single items submitted from many request threads and runs them
+    through `fn(list) -> list` together: a batch closes when it holds
+    `max_batch` items or `max_wait` seconds after its first item arrived.
+    """
+
+    def __init__(self, fn, max_batch: int = 8, max_wait: float = 0.005, pool: str = "vision"):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.pool = pool
+        self.batches = self.items = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, item) -> Future:
+        self._ensure_started()
+        fut = Future()
+        self._queue.put((item, fut))
+        return fut
+
+    def __call__(self, item):
+        return self.submit(item).result()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            items = [item for item, _ in batch]
+            try:
+                results = run_blocking(self.pool, self.fn, items)
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, fut), result in zip(batch, results):
+                fut.set_result(result)
+
+    def stats(self) -> dict:
+        return {"batches": self.batches, "items": self.items,
+                "mean_batch": round(self.items / self.batches, 2) if self.batches else 0.0}
+
+
+class FrameGate:
+    """
+    Per-session sampling in front of the model.
+
+    Each frame is reduced to a small grayscale thumbnail; when its mean
+    absolute difference from the last analyzed frame is below `threshold`
+    (0-255 scale) the previous result is reused, as long as it is younger than
+    `max_age` seconds. Independently, full inference runs at most once every
+    `min_interval` seconds per session.
+    """
+
+    def __init__(self, threshold: float = 4.0, min_interval: float = 0.2, max_age: float = 2.0,
+                 thumb_size=(32, 24), max_sessions: int = 1000):
+        self.threshold = threshold
+        self.min_interval = min_interval
+        self.max_age = max_age
+        self.thumb_size = thumb_size
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # session_id -> (thumb, result, inferred_at)
+        self._lock = threading.Lock()
+        self.counts = {"frames": 0, "inferred": 0, "unchanged": 0, "rate_limited": 0}
+
+    def thumbnail(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        return cv2.resize(gray, self.thumb_size, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def check(self, session_id: str, frame):
+        """
+        (thumbnail, reusable result or None). Pass the thumbnail to store()
+        after running inference on a None.
+        """
+        thumb = self.thumbnail(frame)
+        now = time.monotonic()
+        with self._lock:
+            self.counts["frames"] += 1
+            state = self._sessions.get(session_id)
+            if state is not None:
+                self._sessions.move_to_end(session_id)
+                last_thumb, result, inferred_at = state
+                age = now - inferred_at
+                if age < self.min_interval:
+                    self.counts["rate_limited"] += 1
+                    return thumb, result
+                if age < self.max_age and float(np.abs(thumb - last_thumb).mean()) < self.threshold:
+                    self.counts["unchanged"] += 1
+                    return thumb, result
+            self.counts["inferred"] += 1
+            return thumb, None
+
+    def store(self, session_id: str, thumb, result):
+        with self._lock:
+            self._sessions[session_id] = (thumb, result, time.monotonic())
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts)
+        skipped = counts["unchanged"] + counts["rate_limited"]
+        counts["skip_ratio"] = round(skipped / counts["frames"], 3) if counts["frames"] else 0.0
+        counts["sessions"] = len(self._sessions)
+        return counts
@@ -5,10 +5,12 @@ export default function StartSession() {
   const navigate = useNavigate();
   const [sessionStarted, setSessionStarted] = useState(false);
   const [messages, setMessages] = useState([
-    { sender: 'ai', text: 'Hello! I am your AI assistant. How are you feeling today?' }
+    { sender: 'ai', text: "Hello! I am your AI assistant. Let's start with a few questions." }
   ]);
   const [input, setInput] = useState('');
   const [diagnosedIssue, setDiagnosedIssue] = useState(null);
+  // Server-held assessment: only the new answer is sent each turn
+  const [diagnosisSessionId, setDiagnosisSessionId] = useState(null);
 
   // -------------------------
   // Helper to parse options from AI message
@@ -23,6 +25,26 @@ export default function StartSession() {
     return options.length > 0 ? options : null;
   };
 
+  // Open the assessment with the seed message; its first question is cached server-side
+  const startAssessment = async () => {
+    setSessionStarted(true);
+    try {
+      const response = await fetch("http://127.0.0.1:8000/diagnosis", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify({}),
+      });
+
+      const data = await response.json();
+      if (data.session_id) setDiagnosisSessionId(data.session_id);
+      if (data.reply) {
+        setMessages(prev => [...prev, { sender: "ai", text: data.reply }]);
+      }
+    } catch (err) {
+      setMessages(prev => [...prev, { sender: "ai", text: "❌ Connection error" }]);
+    }
+  };
+
   const handleSend = async (e) => {
     e.preventDefault();
     if (!input.trim()) return;
@@ -47,14 +69,13 @@ export default function StartSession() {
           method: "POST",
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({
-            conversation: newMessages.map(m => ({
-              role: m.sender === "user" ? "user" : "assistant",
-              content: m.text
-            }))
+            session_id: diagnosisSessionId || undefined,
+            answer: text
           }),
         });
 
         const data = await response.json();
+        if (data.session_id) setDiagnosisSessionId(data.session_id);
         if (data.reply) {
           setMessages(prev => [...prev, { sender: "ai", text: data.reply }]);
 
@@ -69,7 +90,8 @@ export default function StartSession() {
           method: "POST",
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify({
-            conversation: newMessages.map(m => m.text),
+            session_id: diagnosisSessionId,
+            message: text,
             diagnosed_issue: diagnosedIssue,
           }),
         });
@@ -99,7 +121,7 @@ export default function StartSession() {
         {!sessionStarted ? (
           <>
             <button
-              onClick={() => setSessionStarted(true)}
+              onClick={startAssessment}
               className="bg-emerald-600 text-white py-3 px-8 rounded-full font-bold shadow-2xl hover:bg-emerald-700 hover:scale-105 transition-all duration-300 mb-4"
             >
               Start AI Assessment